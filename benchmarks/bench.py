@@ -0,0 +1,699 @@
+"""
+Offline benchmark harness for the Growthzi API.
+
+Drives the Flask app from create_app() in-process against a local MongoDB
+stand-in (mongomock by default, or a real mongod via --mongo-uri) and a fake
+AI model with configurable latency. Each scenario is run for every dataset
+size and concurrency level, and throughput plus p50/p95/p99 latency are
+written as JSON so results can be compared between commits:
+
+    python benchmarks/bench.py --sizes 100,1000 --concurrency 1,8 --output before.json
+    python benchmarks/bench.py --sizes 100,1000 --concurrency 1,8 --compare before.json
+
+--mode wsgi,asgi also runs the scenarios that have an async path through
+growthzi.asgi on an event loop, with concurrent clients as asyncio tasks.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import timeit
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Configuration must be in the environment before growthzi.config is imported.
+os.environ.setdefault('JWT_SECRET_KEY', 'benchmark-secret-key-that-is-long-enough-for-hs256')
+os.environ.setdefault('MONGO_URI', 'mongodb://localhost:27017/growthzi_bench')
+os.environ.setdefault('MONGO_TLS', 'false')
+os.environ.setdefault('LOG_LEVEL', 'ERROR')
+
+BENCH_PASSWORD = 'bench-password'
+
+
+# --- Sample data ---
+
+def sample_content(seed):
+    return {
+        "title": f"Company {seed}",
+        "hero": {
+            "headline": "Build something people want",
+            "subheading": "A short explanation of what this company does and why it matters to you.",
+            "cta_button_text": "Get started"
+        },
+        "about": {
+            "title": "About Us",
+            "text": "We are a team of people who care deeply about our customers. " * 4
+        },
+        "services": [
+            {"name": f"Service {i}", "description": "A brief description of the service offered to customers."}
+            for i in range(1, 4)
+        ]
+    }
+
+
+# --- Async MongoDB stand-in ---
+# For --mode asgi without --mongo-uri: the mongomock client behind the
+# interface of AsyncMongoClient, so the coroutine views can await it.
+
+class AsyncCollectionFacade:
+    def __init__(self, collection):
+        self._collection = collection
+
+    def __getattr__(self, name):
+        method = getattr(self._collection, name)
+
+        async def call(*args, **kwargs):
+            return method(*args, **kwargs)
+        return call
+
+
+class AsyncDatabaseFacade:
+    def __init__(self, database):
+        self._database = database
+
+    def __getitem__(self, name):
+        return AsyncCollectionFacade(self._database[name])
+
+    def __getattr__(self, name):
+        return self[name]
+
+
+class AsyncClientFacade:
+    def __init__(self, client):
+        self._client = client
+
+    def get_database(self, name=None):
+        return AsyncDatabaseFacade(self._client.get_database(name))
+
+    def close(self):
+        pass
+
+
+# --- Environment setup ---
+
+def build_app(args):
+    from growthzi import db as growthzi_db
+    if args.mongo_uri:
+        os.environ['MONGO_URI'] = args.mongo_uri
+        from growthzi.config import Config
+        Config.MONGO_URI = args.mongo_uri
+    else:
+        try:
+            import mongomock
+        except ImportError:
+            sys.exit("mongomock is not installed. Install it or pass --mongo-uri for a local mongod.")
+        mock_client = mongomock.MongoClient(os.environ['MONGO_URI'])
+        growthzi_db.set_client(mock_client)
+        growthzi_db.set_async_client(AsyncClientFacade(mock_client))
+        # mongomock has no change streams and cannot return RawBSONDocument.
+        from growthzi.config import Config
+        Config.INVALIDATION_MODE = 'poll'
+        Config.JSON_RAW_BSON = False
+
+    from growthzi.config import Config
+    # Keep rate limits and quotas in the request path, but far above the generated load.
+    Config.RATE_LIMIT_READ = Config.RATE_LIMIT_WRITE = Config.RATE_LIMIT_GENERATE = 'user=1000000/1,ip=1000000/1'
+    Config.GENERATION_DAILY_QUOTA = 10 ** 9
+
+    from growthzi import create_app, ai
+    app = create_app()
+    # The offline client behind AI_PROVIDER=fake, with the requested latency.
+    model = ai.FakeClient(args.ai_latency)
+    ai.set_model_client(app, model)
+    return app, model
+
+
+def seed_dataset(app, size):
+    """Resets websites and benchmark users, then inserts `size` websites."""
+    from werkzeug.security import generate_password_hash
+    from growthzi.db import get_db
+    with app.app_context():
+        database = get_db()
+        database.websites.delete_many({})
+        database.generation_jobs.delete_many({})
+        database.generation_cache.delete_many({})
+        database.users.delete_many({"email": {"$regex": "^bench"}})
+        editor_role = database.roles.find_one({"name": "Editor"})
+        password = generate_password_hash(BENCH_PASSWORD)
+        now = datetime.datetime.now(datetime.timezone.utc)
+        user_ids = database.users.insert_many([
+            {"email": f"bench{i}@example.com", "password": password, "role_id": editor_role['_id'], "created_at": now}
+            for i in range(20)
+        ]).inserted_ids
+        websites = []
+        for i in range(size):
+            created = now - datetime.timedelta(seconds=size - i)
+            websites.append({
+                "owner_id": user_ids[i % len(user_ids)],
+                "created_at": created,
+                "updated_at": created,
+                "version": 1,
+                "content": sample_content(i)
+            })
+        website_ids = database.websites.insert_many(websites).inserted_ids if websites else []
+    return user_ids, website_ids
+
+
+def drop_generated(app, website_ids):
+    """Removes what generation scenarios created, so every run starts from the seeded dataset."""
+    from growthzi.db import get_db
+    with app.app_context():
+        database = get_db()
+        database.websites.delete_many({"_id": {"$nin": list(website_ids)}})
+        database.generation_jobs.delete_many({})
+        database.generation_cache.delete_many({})
+
+
+def login_tokens(app, count):
+    client = app.test_client()
+    tokens = []
+    for i in range(count):
+        response = client.post('/api/auth/login', json={"email": f"bench{i}@example.com", "password": BENCH_PASSWORD})
+        tokens.append(response.get_json()['token'])
+    return tokens
+
+
+# --- Scenarios ---
+# Each scenario factory returns a callable(client, worker_index, iteration)
+# that performs one request and returns the HTTP status code.
+
+def scenario_login(ctx):
+    def run(client, worker, i):
+        user = (worker + i) % 20
+        return client.post('/api/auth/login', json={"email": f"bench{user}@example.com",
+                                                   "password": BENCH_PASSWORD}).status_code
+    return run
+
+
+def scenario_me(ctx):
+    def run(client, worker, i):
+        return client.get('/api/auth/me', headers=ctx.auth(worker)).status_code
+    return run
+
+
+def scenario_list(ctx):
+    def run(client, worker, i):
+        return client.get('/api/websites/?limit=50', headers=ctx.auth(worker)).status_code
+    return run
+
+
+def scenario_list_all(ctx):
+    def run(client, worker, i):
+        return client.get('/api/websites/', headers=ctx.auth(worker)).status_code
+    return run
+
+
+def scenario_get(ctx):
+    def run(client, worker, i):
+        return client.get(f'/api/websites/{ctx.random_website()}', headers=ctx.auth(worker)).status_code
+    return run
+
+
+def scenario_update(ctx):
+    def run(client, worker, i):
+        # Each worker edits its own user's sites so ownership checks pass.
+        website_id = ctx.owned_website(worker)
+        return client.put(f'/api/websites/{website_id}', headers=ctx.auth(worker),
+                          json={"content": sample_content(i)}).status_code
+    return run
+
+
+def scenario_preview(ctx):
+    def run(client, worker, i):
+        return client.get(f'/preview/{ctx.random_website()}').status_code
+    return run
+
+
+def scenario_preview_conditional(ctx):
+    etags = {}
+    lock = threading.Lock()
+
+    def run(client, worker, i):
+        website_id = ctx.random_website()
+        headers = {}
+        with lock:
+            if website_id in etags:
+                headers['If-None-Match'] = etags[website_id]
+        response = client.get(f'/preview/{website_id}', headers=headers)
+        if response.headers.get('ETag'):
+            with lock:
+                etags[website_id] = response.headers['ETag']
+        return response.status_code
+    return run
+
+
+def scenario_generate(ctx):
+    def run(client, worker, i):
+        response = client.post('/api/websites/generate', headers=ctx.auth(worker),
+                               json={"business_type": f"bench {worker}-{i}-{random.random()}",
+                                     "industry": "benchmarks", "fresh": True})
+        if response.status_code != 202:
+            return response.status_code
+        status_url = response.get_json()['status_url']
+        while True:
+            job = client.get(status_url, headers=ctx.auth(worker)).get_json()
+            if job['status'] in ('succeeded', 'failed'):
+                return 200 if job['status'] == 'succeeded' else 500
+            time.sleep(0.005)
+    return run
+
+
+def scenario_generate_batch(ctx):
+    # Ten profiles per request; compare with ten sequential "generate" runs.
+    def run(client, worker, i):
+        profiles = [{"business_type": f"bench {worker}-{i}-{n}-{random.random()}", "industry": "benchmarks"}
+                    for n in range(10)]
+        response = client.post('/api/websites/generate/batch', headers=ctx.auth(worker),
+                               json={"profiles": profiles, "fresh": True})
+        if response.status_code != 200:
+            return response.status_code
+        return 200 if response.get_json()['summary']['created'] == len(profiles) else 500
+    return run
+
+
+def scenario_generate_stream(ctx):
+    def run(client, worker, i):
+        response = client.post('/api/websites/generate/stream', headers=ctx.auth(worker),
+                               json={"business_type": f"bench {worker}-{i}-{random.random()}",
+                                     "industry": "benchmarks", "fresh": True})
+        if response.status_code != 200:
+            return response.status_code
+        return 200 if b'event: done' in response.data else 500
+    return run
+
+
+SCENARIOS = {
+    "login": scenario_login,
+    "me": scenario_me,
+    "list": scenario_list,
+    "list_all": scenario_list_all,
+    "get": scenario_get,
+    "update": scenario_update,
+    "preview": scenario_preview,
+    "preview_conditional": scenario_preview_conditional,
+    "generate": scenario_generate,
+    "generate_batch": scenario_generate_batch,
+    "generate_stream": scenario_generate_stream,
+}
+
+
+# --- ASGI mode ---
+# The same requests sent to growthzi.asgi by an in-process ASGI client. Only
+# scenarios with a coroutine view are run; the rest would only measure the
+# WSGI bridge.
+
+class ASGIResponse:
+    def __init__(self, status_code, headers, data):
+        self.status_code = status_code
+        self.headers = headers
+        self.data = data
+
+    def get_json(self):
+        return json.loads(self.data)
+
+
+class ASGIClient:
+    def __init__(self, asgi_app):
+        self.asgi_app = asgi_app
+
+    async def request(self, method, url, headers=None, json_body=None):
+        path, _, query = url.partition('?')
+        body = json.dumps(json_body).encode('utf-8') if json_body is not None else b''
+        raw_headers = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                       for name, value in (headers or {}).items()]
+        if json_body is not None:
+            raw_headers.append((b'content-type', b'application/json'))
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': method,
+            'scheme': 'http', 'path': path, 'root_path': '', 'query_string': query.encode('latin-1'),
+            'headers': raw_headers, 'server': ('localhost', 80), 'client': ('127.0.0.1', 50000),
+        }
+        messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+        response = {'status': None, 'headers': {}, 'chunks': []}
+
+        async def receive():
+            return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                response['status'] = message['status']
+                response['headers'] = {name.decode('latin-1'): value.decode('latin-1')
+                                       for name, value in message['headers']}
+            else:
+                response['chunks'].append(message.get('body', b''))
+
+        await self.asgi_app(scope, receive, send)
+        return ASGIResponse(response['status'], response['headers'], b''.join(response['chunks']))
+
+    async def get(self, url, headers=None):
+        return await self.request('GET', url, headers)
+
+    async def post(self, url, headers=None, json=None):
+        return await self.request('POST', url, headers, json)
+
+
+def async_scenario_me(ctx):
+    async def run(client, worker, i):
+        return (await client.get('/api/auth/me', headers=ctx.auth(worker))).status_code
+    return run
+
+
+def async_scenario_get(ctx):
+    async def run(client, worker, i):
+        return (await client.get(f'/api/websites/{ctx.random_website()}', headers=ctx.auth(worker))).status_code
+    return run
+
+
+def async_scenario_preview(ctx):
+    async def run(client, worker, i):
+        return (await client.get(f'/preview/{ctx.random_website()}')).status_code
+    return run
+
+
+def async_scenario_generate_stream(ctx):
+    async def run(client, worker, i):
+        response = await client.post('/api/websites/generate/stream', headers=ctx.auth(worker),
+                                     json={"business_type": f"bench {worker}-{i}-{random.random()}",
+                                           "industry": "benchmarks", "fresh": True})
+        if response.status_code != 200:
+            return response.status_code
+        return 200 if b'event: done' in response.data else 500
+    return run
+
+
+# "me" has no coroutine view and shows the cost of the WSGI bridge.
+ASYNC_SCENARIOS = {
+    "me": async_scenario_me,
+    "get": async_scenario_get,
+    "preview": async_scenario_preview,
+    "generate_stream": async_scenario_generate_stream,
+}
+
+
+class Context:
+    def __init__(self, app, tokens, user_ids, website_ids):
+        self.app = app
+        self.tokens = tokens
+        self.user_ids = user_ids
+        self.website_ids = [str(w) for w in website_ids]
+        self._owned = {}
+        for index, website_id in enumerate(self.website_ids):
+            self._owned.setdefault(index % len(user_ids), []).append(website_id)
+
+    def auth(self, worker):
+        return {"Authorization": f"Bearer {self.tokens[worker % len(self.tokens)]}"}
+
+    def random_website(self):
+        return random.choice(self.website_ids)
+
+    def owned_website(self, worker):
+        return random.choice(self._owned[worker % len(self.tokens)])
+
+
+# --- Runner ---
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+def _summary(latencies, errors, elapsed):
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 4),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+def run_scenario(app, run, concurrency, requests, warmup):
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    per_worker = max(1, requests // concurrency)
+
+    def worker(index):
+        nonlocal errors
+        client = app.test_client()
+        for i in range(warmup):
+            run(client, index, i)
+        local = []
+        local_errors = 0
+        for i in range(per_worker):
+            started = time.perf_counter()
+            status = run(client, index, i)
+            local.append(time.perf_counter() - started)
+            if status >= 400:
+                local_errors += 1
+        with lock:
+            latencies.extend(local)
+            errors += local_errors
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return _summary(latencies, errors, elapsed)
+
+
+async def run_scenario_async(asgi_app, run, concurrency, requests, warmup):
+    """run_scenario() with `concurrency` asyncio tasks sharing one event loop."""
+    latencies = []
+    errors = 0
+    per_worker = max(1, requests // concurrency)
+
+    async def worker(index):
+        nonlocal errors
+        client = ASGIClient(asgi_app)
+        for i in range(warmup):
+            await run(client, index, i)
+        for i in range(per_worker):
+            started = time.perf_counter()
+            status = await run(client, index, i)
+            latencies.append(time.perf_counter() - started)
+            if status >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(index) for index in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return _summary(latencies, errors, elapsed)
+
+
+# --- Micro-benchmarks ---
+# Hot functions timed in isolation, in microseconds per call.
+
+def run_micro(app, ctx, number):
+    from growthzi.db import get_db
+    from growthzi.utils import principals
+    results = {}
+    with app.test_request_context():
+        database = get_db()
+        user_id = ctx.user_ids[0]
+        principals.resolve_principal(database, user_id)
+        results["resolve_principal_cached_us"] = _time_us(lambda: principals.resolve_principal(database, user_id), number)
+
+        def uncached():
+            principals.invalidate_user(user_id)
+            principals.resolve_principal(database, user_id)
+        results["resolve_principal_uncached_us"] = _time_us(uncached, number)
+
+        from flask import g
+        from growthzi import ratelimit
+        g.current_user, g.current_user_role = principals.resolve_principal(database, user_id)
+        results["rate_limit_check_us"] = _time_us(lambda: ratelimit.check('read'), number)
+
+        website = database.websites.find_one({})
+        if website:
+            from flask import render_template
+            results["render_preview_template_us"] = _time_us(
+                lambda: render_template('index.html', website=website), number)
+            documents = list(database.websites.find({}).limit(200))
+            results.update(_json_micro(app, documents, max(1, number // 10)))
+    return results
+
+
+def _json_micro(app, documents, number):
+    """
+    Encodes a 200-website list response from BSON, as a cursor would return
+    it: decoded and encoded with Flask's stdlib provider, decoded and encoded
+    with the app's provider, and encoded from RawBSONDocument (fragment cache
+    warm). The _large variants use content sixteen times the seeded size.
+    """
+    import bson
+    from flask.json.provider import DefaultJSONProvider
+    from bson.raw_bson import RawBSONDocument
+    from growthzi import serialization
+    stdlib = DefaultJSONProvider(app)
+    dumps = app.json.dumps
+    serialization.init_cache(app)
+    large = [dict(d, content={f"section_{i}": d['content'] for i in range(16)}) for d in documents]
+    results = {}
+    for suffix, docs in (('', documents), ('_large', large)):
+        # Built locally (rather than read with RAW_CODEC_OPTIONS) so this also runs on mongomock.
+        encoded = [bson.encode(d) for d in docs]
+        dumps('[' + ','.join(dumps(RawBSONDocument(b)) for b in encoded) + ']')
+        results[f"json_encode_200_websites_stdlib{suffix}_us"] = _time_us(
+            lambda: stdlib.dumps([_stringify_ids(bson.decode(b)) for b in encoded]), number)
+        results[f"json_encode_200_websites{suffix}_us"] = _time_us(
+            lambda: dumps([bson.decode(b) for b in encoded]), number)
+        results[f"json_encode_200_websites_raw_bson{suffix}_us"] = _time_us(
+            lambda: '[' + ','.join(dumps(RawBSONDocument(b)) for b in encoded) + ']', number)
+    return results
+
+
+def _stringify_ids(doc):
+    doc['_id'] = str(doc['_id'])
+    doc['owner_id'] = str(doc['owner_id'])
+    return doc
+
+
+def _time_us(func, number):
+    return round(timeit.timeit(func, number=number) / number * 1e6, 2)
+
+
+# --- Reporting ---
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def compare(current, baseline_path):
+    with open(baseline_path) as handle:
+        baseline = json.load(handle)
+    key = lambda r: (r.get('mode', 'wsgi'), r['scenario'], r['dataset_size'], r['concurrency'])
+    previous = {key(r): r for r in baseline.get('results', [])}
+    print(f"\nComparison with {baseline_path} (commit {baseline.get('meta', {}).get('commit')}):")
+    print(f"{'mode':<6}{'scenario':<22}{'size':>7}{'conc':>6}{'rps':>12}{'Δ rps':>9}{'p95 ms':>10}{'Δ p95':>9}")
+    for result in current['results']:
+        before = previous.get(key(result))
+        if not before:
+            continue
+        rps_delta = (result['throughput_rps'] / before['throughput_rps'] - 1) * 100 if before['throughput_rps'] else 0
+        p95_delta = (result['p95_ms'] / before['p95_ms'] - 1) * 100 if before['p95_ms'] else 0
+        print(f"{result.get('mode', 'wsgi'):<6}{result['scenario']:<22}{result['dataset_size']:>7}{result['concurrency']:>6}"
+              f"{result['throughput_rps']:>12.1f}{rps_delta:>+8.1f}%{result['p95_ms']:>10.2f}{p95_delta:>+8.1f}%")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help=f"Comma-separated scenarios (default: all). Available: {', '.join(SCENARIOS)}")
+    parser.add_argument('--sizes', default='100,1000', help='Comma-separated website counts to seed.')
+    parser.add_argument('--mode', default='wsgi',
+                        help='Comma-separated serving modes: wsgi (Flask test client) and/or asgi (growthzi.asgi).')
+    parser.add_argument('--concurrency', default='1,8', help='Comma-separated numbers of concurrent clients.')
+    parser.add_argument('--requests', type=int, default=200, help='Measured requests per scenario run.')
+    parser.add_argument('--warmup', type=int, default=5, help='Unmeasured requests per client before timing.')
+    parser.add_argument('--ai-latency', type=float, default=0.05, help='Seconds the fake AI model sleeps per call.')
+    parser.add_argument('--hash-workers', type=int,
+                        help='Password hashing processes (PASSWORD_HASH_WORKERS); 0 hashes on the request thread.')
+    parser.add_argument('--mongo-uri', help='Use a real MongoDB (e.g. mongodb://localhost:27017/bench) instead of mongomock.')
+    parser.add_argument('--micro', type=int, default=200, help='Iterations per micro-benchmark (0 to skip).')
+    parser.add_argument('--seed', type=int, default=1234, help='Random seed for request selection.')
+    parser.add_argument('--output', help='Write results JSON to this file (default: stdout).')
+    parser.add_argument('--compare', help='Print the change against a previous results JSON file.')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    random.seed(args.seed)
+    scenarios = [s.strip() for s in args.scenarios.split(',') if s.strip()]
+    unknown = [s for s in scenarios if s not in SCENARIOS]
+    if unknown:
+        sys.exit(f"Unknown scenarios: {', '.join(unknown)}")
+    sizes = [int(s) for s in args.sizes.split(',')]
+    levels = [int(c) for c in args.concurrency.split(',')]
+    modes = [m.strip() for m in args.mode.split(',') if m.strip()]
+    if set(modes) - {'wsgi', 'asgi'}:
+        sys.exit("--mode must be wsgi, asgi or both")
+
+    if args.hash_workers is not None:
+        os.environ['PASSWORD_HASH_WORKERS'] = str(args.hash_workers)
+    app, model = build_app(args)
+    if 'asgi' in modes:
+        from growthzi.asgi import ASGIApp
+        asgi_app = ASGIApp(app)
+        loop = asyncio.new_event_loop()
+    hash_cores = min(app.config.get('PASSWORD_HASH_WORKERS') or 1, os.cpu_count() or 1)
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "backend": "mongod" if args.mongo_uri else "mongomock",
+            "ai_latency_s": args.ai_latency,
+            "requests": args.requests,
+            "password_hash_method": app.config.get('PASSWORD_HASH_METHOD'),
+            "password_hash_workers": app.config.get('PASSWORD_HASH_WORKERS'),
+        },
+        "results": [],
+        "micro": {},
+    }
+
+    for size in sizes:
+        user_ids, website_ids = seed_dataset(app, size)
+        ctx = Context(app, login_tokens(app, len(user_ids)), user_ids, website_ids)
+        for name in scenarios:
+            if not website_ids and name in ('get', 'update', 'preview', 'preview_conditional'):
+                continue
+            for mode, concurrency in [(m, c) for m in modes for c in levels]:
+                if name.startswith('generate'):
+                    drop_generated(app, website_ids)
+                if mode == 'asgi':
+                    if name not in ASYNC_SCENARIOS:
+                        continue
+                    result = loop.run_until_complete(run_scenario_async(
+                        asgi_app, ASYNC_SCENARIOS[name](ctx), concurrency, args.requests, args.warmup
+                    ))
+                else:
+                    result = run_scenario(app, SCENARIOS[name](ctx), concurrency, args.requests, args.warmup)
+                result.update({"mode": mode, "scenario": name, "dataset_size": size, "concurrency": concurrency})
+                if name == 'login':
+                    # Logins are bound by hashing, which uses at most this many cores.
+                    result["throughput_per_core_rps"] = round(result['throughput_rps'] / hash_cores, 2)
+                report["results"].append(result)
+                print(f"{mode:<5} {name:<22} size={size:<7} c={concurrency:<4} {result['throughput_rps']:>10.1f} rps  "
+                      f"p50={result['p50_ms']:.2f}ms p95={result['p95_ms']:.2f}ms p99={result['p99_ms']:.2f}ms "
+                      f"errors={result['errors']}", file=sys.stderr)
+        if args.micro:
+            report["micro"][str(size)] = run_micro(app, ctx, args.micro)
+    if 'asgi' in modes:
+        loop.close()
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as handle:
+            handle.write(output + '\n')
+    else:
+        print(output)
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,14 +2,50 @@ import apiClient from './axiosConfig'; // Import the centralized client
 
 const API_URL = '/api/websites/'; // The base path for all website-related endpoints
 
+const JOB_POLL_INTERVAL_MS = 1500;
+// Give up a little after the server's GENERATION_JOB_TIMEOUT (300 s by default).
+const JOB_POLL_TIMEOUT_MS = 330000;
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+// Returns the status of a background generation job.
+export const getGenerationJob = (jobId) => {
+    return apiClient.get(`${API_URL}jobs/${jobId}`);
+};
+
 // Calls the AI to generate content and create a new website document.
-export const generateWebsite = (business_type, industry) => {
-    return apiClient.post(`${API_URL}generate`, { business_type, industry });
+// Generation runs as a background job, so this polls until the job finishes.
+export const generateWebsite = async (business_type, industry) => {
+    const created = await apiClient.post(`${API_URL}generate`, { business_type, industry });
+    if (created.status === 201) {
+        // Served from the generation cache; the website already exists.
+        return created;
+    }
+    const jobId = created.data.job.job_id;
+    const deadline = Date.now() + JOB_POLL_TIMEOUT_MS;
+    while (Date.now() < deadline) {
+        await sleep(JOB_POLL_INTERVAL_MS);
+        const response = await getGenerationJob(jobId);
+        if (response.data.status === 'succeeded') {
+            return response;
+        }
+        if (response.data.status === 'failed') {
+            // Surface the job error the same way as an API error.
+            const error = new Error(response.data.error);
+            error.response = { data: { error: response.data.error } };
+            throw error;
+        }
+    }
+    const message = 'Website generation is taking too long. Please try again later.';
+    const error = new Error(message);
+    error.response = { data: { error: message } };
+    throw error;
 };
 
 // Retrieves a list of websites (Admins see all, others see their own).
 export const getWebsites = () => {
-    return apiClient.get(API_URL);
+    // The dashboard cards only need the summary fields.
+    return apiClient.get(API_URL, { params: { view: 'summary' } });
 };
 
 // Retrieves the data for a single website by its ID.
@@ -1,54 +1,69 @@
+import logging
 from flask import Flask
 from flask_cors import CORS
-from werkzeug.security import generate_password_hash
 from .config import Config
 from . import db
-
-def seed_database():
-    database = db.get_db()
-    roles_to_seed = [
-        {"name": "Admin", "permissions": ["users:manage", "roles:manage", "websites:create", "websites:read_all", "websites:edit_all", "websites:delete_all", "websites:read_own"]},
-        {"name": "Editor", "permissions": ["websites:create", "websites:read_own", "websites:edit_own", "websites:delete_own"]},
-        {"name": "Viewer", "permissions": ["websites:read_all", "websites:read_own"]}
-    ]
-    print("Ensuring default roles exist...")
-    for role_data in roles_to_seed:
-        db.get_db().roles.update_one({"name": role_data["name"]}, {"$setOnInsert": role_data}, upsert=True)
-    print("Default roles are present.")
-
-    admin_email = "admin@growthzi.com"
-    if database.users.find_one({"email": admin_email}) is None:
-        print(f"Creating default admin user: {admin_email}")
-        admin_role = database.roles.find_one({"name": "Admin"})
-        if admin_role:
-            hashed_password = generate_password_hash("admin123")
-            import datetime
-            database.users.insert_one({
-                "email": admin_email,
-                "password": hashed_password,
-                "role_id": admin_role['_id'],
-                "created_at": datetime.datetime.now(datetime.timezone.utc)
-            })
-            print("Default admin user created successfully.")
-        else:
-            print("CRITICAL ERROR: 'Admin' role not found. Cannot create admin user.")
+from . import jobs
+from . import ai_cache
+from . import migrations
+from . import metrics
+from . import invalidation
+from . import passwords
+from . import publish
+from . import quotas
+from . import ratelimit
+from . import serialization
+from .log import configure_logging
+from .utils import principals
 
 def create_app():
+    from .startup import StartupTimer, preload
+    timer = StartupTimer()
     app = Flask(__name__, static_folder='../static', template_folder='../templates')
     app.config.from_object(Config)
-    CORS(app, resources={r"/api/*": {"origins": "*"}})
-    db.init_app(app)
-    with app.app_context():
-        seed_database()
+    app.extensions['growthzi_startup'] = timer
+    configure_logging(app)
+    CORS(app, resources={r"/api/*": {"origins": "*"}}, expose_headers=[
+        "ETag", "Location", "Retry-After",
+        "RateLimit-Limit", "RateLimit-Remaining", "RateLimit-Reset", "RateLimit-Policy",
+    ])
+    for name, init in (
+        ('json', serialization.init_app),
+        ('db', db.init_app),
+        ('invalidation', invalidation.init_app),
+        ('metrics', metrics.init_app),
+        ('principals', principals.init_app),
+        ('ratelimit', ratelimit.init_app),
+        ('quotas', quotas.init_app),
+        ('passwords', passwords.init_app),
+        ('jobs', jobs.init_app),
+        ('ai_cache', ai_cache.init_app),
+        ('migrations', migrations.init_app),
+        ('publish', publish.init_app),
+    ):
+        with timer.timed(f"init {name}"):
+            init(app)
+    # Only reads the schema marker when the database is already current.
+    with timer.timed("ensure_schema"):
+        migrations.ensure_schema(app)
+
+    # Blueprints (and what they import) load only when an app is created.
+    with timer.timed("import blueprints"):
+        from .routes.auth import auth_bp
+        from .routes.admin import admin_bp
+        from .routes.websites import websites_bp
+        from .routes.preview import preview_bp, init_cache as init_preview_cache
 
-    from .routes.auth import auth_bp
-    from .routes.admin import admin_bp
-    from .routes.websites import websites_bp
-    from .routes.preview import preview_bp
+    with timer.timed("register blueprints"):
+        app.register_blueprint(auth_bp, url_prefix='/api/auth')
+        app.register_blueprint(admin_bp, url_prefix='/api/admin/')
+        app.register_blueprint(websites_bp, url_prefix='/api/websites/')
+        app.register_blueprint(preview_bp, url_prefix='/preview')
+        init_preview_cache(app)
 
-    app.register_blueprint(auth_bp, url_prefix='/api/auth')
-    app.register_blueprint(admin_bp, url_prefix='/api/admin/')
-    app.register_blueprint(websites_bp, url_prefix='/api/websites/')
-    app.register_blueprint(preview_bp, url_prefix='/preview')
+    if app.config.get('PRELOAD'):
+        with timer.timed("preload"):
+            preload(app)
 
+    logging.getLogger('growthzi.startup').info("app created", extra=timer.as_dict())
     return app
\ No newline at end of file
@@ -0,0 +1,482 @@
+import asyncio
+import os
+import json
+import logging
+import threading
+import time
+from flask import current_app
+from . import metrics
+
+logger = logging.getLogger('growthzi.ai')
+
+DEFAULT_MODEL_NAME = 'gemini-1.5-flash-latest'
+
+# Bump whenever the prompt below changes in a way that changes the output.
+PROMPT_VERSION = 1
+
+
+class GenerationError(Exception):
+    """
+    The AI service failed or returned content that could not be used.
+    retryable is set when the call itself failed (e.g. a timeout or quota
+    error), so trying again may succeed.
+    """
+
+    def __init__(self, message, raw_text=None, retryable=False):
+        super().__init__(message)
+        self.raw_text = raw_text
+        self.retryable = retryable
+
+
+# --- Google Gemini SDK ---
+# google.generativeai is slow to import, so it is loaded and configured on
+# first use (or up front by preload()) instead of when this module loads.
+
+_genai = None
+_genai_lock = threading.Lock()
+
+
+def _load_genai(api_key=None):
+    global _genai
+    if _genai is None:
+        with _genai_lock:
+            if _genai is None:
+                import google.generativeai as genai
+                # The API key is loaded from config, which reads from .env
+                # A check is added to prevent crashes if the key is missing.
+                try:
+                    genai.configure(api_key=api_key or os.environ.get("GOOGLE_API_KEY"))
+                except Exception as e:
+                    logger.warning("Google Gemini API could not be configured. Check GOOGLE_API_KEY.", extra={"error": str(e)})
+                _genai = genai
+    return _genai
+
+
+class GeminiClient:
+    """Model client backed by Google Gemini. Any object with a compatible
+    generate(prompt) -> str method can be used in its place."""
+
+    def __init__(self, model_name=DEFAULT_MODEL_NAME, api_key=None):
+        self.model_name = model_name
+        self.api_key = api_key
+        self._model = None
+
+    def preload(self):
+        """Imports and configures the SDK now rather than on the first request."""
+        self._get_model()
+
+    def _get_model(self):
+        if self._model is None:
+            self._model = _load_genai(self.api_key).GenerativeModel(self.model_name)
+        return self._model
+
+    def generate(self, prompt):
+        model = self._get_model()
+        response = model.generate_content(prompt)
+        usage = getattr(response, 'usage_metadata', None)
+        if usage is not None:
+            metrics.record_ai_tokens(
+                self.model_name,
+                getattr(usage, 'prompt_token_count', None),
+                getattr(usage, 'candidates_token_count', None)
+            )
+        return response.text
+
+    def generate_stream(self, prompt):
+        """Yields text chunks as the model produces them."""
+        model = self._get_model()
+        response = model.generate_content(prompt, stream=True)
+        for chunk in response:
+            text = getattr(chunk, 'text', None)
+            if text:
+                yield text
+        usage = getattr(response, 'usage_metadata', None)
+        if usage is not None:
+            metrics.record_ai_tokens(
+                self.model_name,
+                getattr(usage, 'prompt_token_count', None),
+                getattr(usage, 'candidates_token_count', None)
+            )
+
+    async def generate_stream_async(self, prompt):
+        """generate_stream() for the event loop (ASGI mode)."""
+        model = self._get_model()
+        response = await model.generate_content_async(prompt, stream=True)
+        async for chunk in response:
+            text = getattr(chunk, 'text', None)
+            if text:
+                yield text
+        usage = getattr(response, 'usage_metadata', None)
+        if usage is not None:
+            metrics.record_ai_tokens(
+                self.model_name,
+                getattr(usage, 'prompt_token_count', None),
+                getattr(usage, 'candidates_token_count', None)
+            )
+
+
+def build_prompt(business_type, industry):
+    return f"""
+        Generate website content for a company.
+        - Business Type: {business_type}
+        - Industry: {industry}
+
+        The output MUST be a single, valid JSON object. Do not include any text, notes, or markdown formatting like ```json before or after the JSON object.
+        The JSON structure should be exactly this:
+        {{
+          "title": "A short, catchy company name",
+          "hero": {{
+            "headline": "A powerful headline (max 10 words)",
+            "subheading": "An engaging subheading that explains more (max 20 words)",
+            "cta_button_text": "A call-to-action button text (max 4 words)"
+          }},
+          "about": {{
+            "title": "About Us",
+            "text": "A descriptive paragraph about the company's mission and values (around 50 words)."
+          }},
+          "services": [
+            {{ "name": "Service One Name", "description": "A brief description of the first service (around 20 words)." }},
+            {{ "name": "Service Two Name", "description": "A brief description of the second service (around 20 words)." }},
+            {{ "name": "Service Three Name", "description": "A brief description of the third service (around 20 words)." }}
+          ]
+        }}
+        """
+
+
+class FakeClient:
+    """
+    Offline model client (AI_PROVIDER=fake) for tests and local development:
+    waits `latency` seconds and returns valid content for the prompt's inputs.
+    """
+
+    model_name = 'fake'
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+
+    def generate(self, prompt):
+        if self.latency:
+            time.sleep(self.latency)
+        return self._content(prompt)
+
+    async def generate_async(self, prompt):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._content(prompt)
+
+    @staticmethod
+    def _content(prompt):
+        inputs = {}
+        for line in prompt.splitlines():
+            name, _, value = line.strip().lstrip('- ').partition(': ')
+            if name in ('Business Type', 'Industry'):
+                inputs[name] = value
+        name = f"{inputs.get('Business Type', 'Company')} {inputs.get('Industry', '')}".strip()
+        return json.dumps({
+            "title": name.title(),
+            "hero": {"headline": f"Welcome to {name}", "subheading": "Placeholder content", "cta_button_text": "Contact us"},
+            "about": {"title": "About Us", "text": f"{name} is placeholder content from the offline model."},
+            "services": [{"name": f"Service {i}", "description": "Placeholder service."} for i in range(1, 4)],
+        })
+
+
+# AI_PROVIDER name -> factory(config) returning a model client.
+PROVIDERS = {
+    'gemini': lambda config: GeminiClient(config.get('AI_MODEL_NAME', DEFAULT_MODEL_NAME), config.get('GOOGLE_API_KEY')),
+    'fake': lambda config: FakeClient(config.get('AI_FAKE_LATENCY_MS', 0) / 1000),
+}
+
+
+def get_model_client(app=None):
+    """
+    Returns the model client for the app, creating it on first use from
+    AI_PROVIDER. Tests and benchmarks can install a fake with
+    set_model_client(). Creating a client does not contact the provider.
+    """
+    app = app or current_app
+    client = app.extensions.get('growthzi_ai_client')
+    if client is None:
+        provider = app.config.get('AI_PROVIDER', 'gemini')
+        if provider not in PROVIDERS:
+            raise ValueError(f"Unknown AI_PROVIDER '{provider}'. Available: {', '.join(PROVIDERS)}")
+        client = PROVIDERS[provider](app.config)
+        app.extensions['growthzi_ai_client'] = client
+    return client
+
+
+def set_model_client(app, client):
+    """Replaces the model client used by the app (e.g. with a local fake)."""
+    app.extensions['growthzi_ai_client'] = client
+
+
+def _call(client, prompt):
+    model_name = getattr(client, 'model_name', None)
+    started = time.perf_counter()
+    try:
+        text = client.generate(prompt)
+    except Exception as e:
+        metrics.observe_ai_generation(model_name, time.perf_counter() - started, 'error')
+        logger.error("AI service call failed", extra={"model": model_name, "error": str(e)})
+        raise GenerationError(
+            "Failed to generate content from AI service. Check your API key and permissions.", retryable=True
+        )
+    metrics.observe_ai_generation(model_name, time.perf_counter() - started, 'success')
+    return text
+
+
+def generate_website_content(client, business_type, industry):
+    """Runs the model and returns the content dict or raises GenerationError."""
+    text = _call(client, build_prompt(business_type, industry))
+    return complete_content(client, business_type, industry, text)
+
+
+# --- Repair and re-prompting ---
+# Output that is not exactly the requested JSON is repaired locally (see
+# repair.py). Only sections that cannot be repaired are requested again, in
+# a much smaller prompt, instead of regenerating the whole site.
+
+SECTION_TEMPLATES = {
+    "title": '"title": "A short, catchy company name"',
+    "hero": '''"hero": {{
+            "headline": "A powerful headline (max 10 words)",
+            "subheading": "An engaging subheading that explains more (max 20 words)",
+            "cta_button_text": "A call-to-action button text (max 4 words)"
+          }}''',
+    "about": '''"about": {{
+            "title": "About Us",
+            "text": "A descriptive paragraph about the company's mission and values (around 50 words)."
+          }}''',
+    "services": '''"services": [
+            {count} objects like {{ "name": "Service Name", "description": "A brief description of the service (around 20 words)." }}
+          ]''',
+}
+
+
+def build_sections_prompt(business_type, industry, result):
+    """Asks for only the sections missing from a repair.Result."""
+    members = ',\n          '.join(
+        SECTION_TEMPLATES[name].format(count=result.services_needed()) for name in result.missing
+    )
+    existing = json.dumps(result.content, ensure_ascii=False)
+    return f"""
+        Complete the website content for a company.
+        - Business Type: {business_type}
+        - Industry: {industry}
+
+        This part of the content already exists; keep the new parts consistent with it and do not repeat it:
+        {existing}
+
+        The output MUST be a single, valid JSON object with only these members. Do not include any text, notes, or markdown formatting before or after the JSON object.
+        {{
+          {members}
+        }}
+        """
+
+
+def complete_content(client, business_type, industry, text):
+    """
+    Turns model output into valid content: repairs it locally and re-prompts
+    for any sections still missing (up to GENERATION_REPROMPT_ATTEMPTS
+    times). Raises GenerationError if that is not enough.
+    """
+    from . import repair
+    model_name = getattr(client, 'model_name', None)
+    result = repair.process(text)
+    reprompted = False
+    for _ in range(current_app.config.get('GENERATION_REPROMPT_ATTEMPTS', 1)):
+        if not result.missing:
+            break
+        if not result.content:
+            # Nothing usable: a re-prompt would be a full generation anyway.
+            break
+        reprompted = True
+        for name in result.missing:
+            metrics.record_ai_reprompt(name)
+        logger.info("re-prompting for missing sections", extra={"model": model_name, "sections": result.missing})
+        result = repair.process(_call(client, build_sections_prompt(business_type, industry, result)), result.content)
+
+    if result.missing:
+        metrics.record_ai_content('failed')
+        logger.warning("AI service returned unusable content", extra={
+            "model": model_name, "missing": result.missing, "repairs": result.repairs, "response": text
+        })
+        if not result.content:
+            raise GenerationError(
+                "Failed to parse content from AI service. The response was not valid JSON.", raw_text=text
+            )
+        raise GenerationError(
+            f"The AI service returned incomplete content (missing: {', '.join(result.missing)}).", raw_text=text
+        )
+    metrics.record_ai_content('reprompted' if reprompted else 'repaired' if result.repairs else 'valid')
+    return result.content
+
+
+# --- Streaming generation ---
+
+def stream_generation(client, business_type, industry):
+    """
+    Yields raw text chunks from the model. Clients without generate_stream()
+    produce a single chunk. Raises GenerationError if the call fails.
+    """
+    model_name = getattr(client, 'model_name', None)
+    prompt = build_prompt(business_type, industry)
+    started = time.perf_counter()
+    try:
+        if hasattr(client, 'generate_stream'):
+            for chunk in client.generate_stream(prompt):
+                yield chunk
+        else:
+            yield client.generate(prompt)
+    except Exception as e:
+        metrics.observe_ai_generation(model_name, time.perf_counter() - started, 'error')
+        logger.error("AI service streaming call failed", extra={"model": model_name, "error": str(e)})
+        raise GenerationError(
+            "Failed to generate content from AI service. Check your API key and permissions.", retryable=True
+        )
+    metrics.observe_ai_generation(model_name, time.perf_counter() - started, 'success')
+
+
+async def stream_generation_async(client, business_type, industry):
+    """
+    stream_generation() for the event loop. Uses the client's
+    generate_stream_async() or generate_async() if it has one; a client with
+    only blocking methods is called on a worker thread.
+    """
+    model_name = getattr(client, 'model_name', None)
+    prompt = build_prompt(business_type, industry)
+    started = time.perf_counter()
+    try:
+        if hasattr(client, 'generate_stream_async'):
+            async for chunk in client.generate_stream_async(prompt):
+                yield chunk
+        elif hasattr(client, 'generate_async'):
+            yield await client.generate_async(prompt)
+        else:
+            yield await asyncio.to_thread(client.generate, prompt)
+    except Exception as e:
+        metrics.observe_ai_generation(model_name, time.perf_counter() - started, 'error')
+        logger.error("AI service streaming call failed", extra={"model": model_name, "error": str(e)})
+        raise GenerationError(
+            "Failed to generate content from AI service. Check your API key and permissions.", retryable=True
+        )
+    metrics.observe_ai_generation(model_name, time.perf_counter() - started, 'success')
+
+
+class SectionParser:
+    """
+    Incrementally scans the model's JSON output and reports each top-level
+    member (title, hero, about, ...) as soon as its value is complete, and
+    each element of "services" individually. Text before the first "{" (such
+    as a markdown fence) is ignored.
+
+    feed(text) returns a list of (section, value) tuples, where section is the
+    member name, or ("services", index) for a single service.
+    """
+
+    def __init__(self):
+        self.buffer = ''
+        self.position = 0
+        self.started = False
+        self.finished = False
+        self.in_string = False
+        self.escaped = False
+        self.stack = []
+        self.member_start = None
+        self.current_key = None
+        self.element_start = None
+        self.element_index = 0
+        self.object_start = None
+        self.object_end = None
+
+    def feed(self, text):
+        self.buffer += text
+        events = []
+        buffer = self.buffer
+        index = self.position
+        while index < len(buffer) and not self.finished:
+            char = buffer[index]
+            if not self.started:
+                if char == '{':
+                    self.started = True
+                    self.object_start = index
+                    self.stack.append('{')
+                    self.member_start = index + 1
+                index += 1
+                continue
+
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == '\\':
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+                index += 1
+                continue
+
+            depth = len(self.stack)
+            if char == '"':
+                self.in_string = True
+            elif char == ':' and depth == 1 and self.current_key is None:
+                self.current_key = self._load(buffer[self.member_start:index])
+            elif char in '{[':
+                self.stack.append(char)
+                if depth == 1 and char == '[' and self.current_key == 'services':
+                    self.element_start = index + 1
+                    self.element_index = 0
+            elif char in '}]':
+                if depth == 2 and char == ']' and self.element_start is not None:
+                    self._emit_element(buffer[self.element_start:index], events)
+                    self.element_start = None
+                self.stack.pop()
+                if not self.stack:
+                    self._emit_member(buffer[self.member_start:index], events)
+                    self.finished = True
+                    self.object_end = index + 1
+            elif char == ',':
+                if depth == 1:
+                    self._emit_member(buffer[self.member_start:index], events)
+                    self.member_start = index + 1
+                    self.current_key = None
+                elif depth == 2 and self.element_start is not None:
+                    self._emit_element(buffer[self.element_start:index], events)
+                    self.element_start = index + 1
+            index += 1
+        self.position = index
+        return events
+
+    def document_text(self):
+        """The complete top-level JSON object text, or None if it has not closed."""
+        if self.object_end is None:
+            return None
+        return self.buffer[self.object_start:self.object_end]
+
+    def document(self):
+        """The parsed top-level object, or None if it is incomplete or invalid."""
+        text = self.document_text()
+        return self._load(text) if text is not None else None
+
+    @staticmethod
+    def _load(text):
+        try:
+            return json.loads(text)
+        except (json.JSONDecodeError, ValueError):
+            return None
+
+    def _emit_member(self, text, events):
+        if not text.strip():
+            return
+        member = self._load('{' + text + '}')
+        if not isinstance(member, dict) or len(member) != 1:
+            return
+        key, value = next(iter(member.items()))
+        if key != 'services':
+            events.append((key, value))
+
+    def _emit_element(self, text, events):
+        if not text.strip():
+            return
+        value = self._load(text)
+        if value is not None:
+            events.append((('services', self.element_index), value))
+            self.element_index += 1
@@ -0,0 +1,185 @@
+import copy
+import datetime
+import hashlib
+import json
+import logging
+import threading
+from flask import current_app
+from . import ai
+from .db import get_db
+from .utils.cache import TTLCache
+
+logger = logging.getLogger('growthzi.ai_cache')
+
+# --- Generation cache ---
+# Generated content is memoized by a hash of the normalized inputs, the
+# prompt version and the model name. Lookups go to a small in-process LRU
+# first, then to the `generation_cache` collection (expired by a TTL index on
+# expires_at, see migrations.py). Concurrent misses for the same key share
+# one upstream call.
+
+_local = TTLCache(maxsize=256, ttl=3600, name='generations')
+
+_counters_lock = threading.Lock()
+_counters = {"memory_hits": 0, "db_hits": 0, "misses": 0, "shared": 0, "bypassed": 0}
+
+_inflight_lock = threading.Lock()
+_inflight = {}
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def init_app(app):
+    _local.maxsize = app.config.get('GENERATION_CACHE_LOCAL_SIZE', _local.maxsize)
+    _local.ttl = app.config.get('GENERATION_CACHE_LOCAL_TTL', _local.ttl)
+    _local.clear()
+
+
+def _count(name):
+    with _counters_lock:
+        _counters[name] += 1
+
+
+def _normalize(value):
+    return " ".join(str(value).split()).casefold()
+
+
+def cache_key(business_type, industry, model_name):
+    material = json.dumps({
+        "business_type": _normalize(business_type),
+        "industry": _normalize(industry),
+        "prompt_version": ai.PROMPT_VERSION,
+        "model": model_name,
+    }, sort_keys=True)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+def _enabled():
+    return current_app.config.get('GENERATION_CACHE_ENABLED', True)
+
+
+def _model_name(client):
+    return getattr(client, 'model_name', None) or current_app.config.get('AI_MODEL_NAME', ai.DEFAULT_MODEL_NAME)
+
+
+def lookup(business_type, industry, client=None):
+    """Returns cached content for the inputs or None. Does not call the model."""
+    if not _enabled():
+        return None
+    client = client or ai.get_model_client()
+    key = cache_key(business_type, industry, _model_name(client))
+    content = _lookup_key(key)
+    return copy.deepcopy(content) if content is not None else None
+
+
+def _lookup_key(key):
+    content = _local.get(key)
+    if content is not None:
+        _count("memory_hits")
+        return content
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+    doc = get_db().generation_cache.find_one({"_id": key, "expires_at": {"$gt": now}}, {"content": 1})
+    if doc:
+        _local.set(key, doc["content"])
+        _count("db_hits")
+        return doc["content"]
+    return None
+
+
+def _store(key, business_type, industry, model_name, content):
+    collection = get_db().generation_cache
+    now = datetime.datetime.now(datetime.timezone.utc)
+    ttl = current_app.config.get('GENERATION_CACHE_TTL', 7 * 24 * 3600)
+    collection.replace_one(
+        {"_id": key},
+        {
+            "_id": key,
+            "business_type": _normalize(business_type),
+            "industry": _normalize(industry),
+            "prompt_version": ai.PROMPT_VERSION,
+            "model": model_name,
+            "content": content,
+            "created_at": now,
+            "expires_at": now + datetime.timedelta(seconds=ttl),
+        },
+        upsert=True
+    )
+    _local.set(key, content)
+
+
+def remember(business_type, industry, content, client=None):
+    """Stores content generated outside get_or_generate (e.g. by streaming)."""
+    if not _enabled():
+        return
+    client = client or ai.get_model_client()
+    model_name = _model_name(client)
+    try:
+        _store(cache_key(business_type, industry, model_name), business_type, industry, model_name, content)
+    except Exception as e:
+        logger.warning("could not store generation in cache", extra={"error": str(e)})
+
+
+def get_or_generate(client, business_type, industry, fresh=False):
+    """
+    Returns website content for the inputs, calling the model only when no
+    cached result exists (or fresh=True). Raises ai.GenerationError.
+    """
+    if not _enabled():
+        return ai.generate_website_content(client, business_type, industry)
+
+    model_name = _model_name(client)
+    key = cache_key(business_type, industry, model_name)
+    if fresh:
+        _count("bypassed")
+    else:
+        content = _lookup_key(key)
+        if content is not None:
+            return copy.deepcopy(content)
+
+    # Single-flight: the first caller for a key runs the model, the rest wait.
+    with _inflight_lock:
+        flight = _inflight.get(key)
+        leader = flight is None
+        if leader:
+            flight = _inflight[key] = _Flight()
+
+    if not leader:
+        _count("shared")
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return copy.deepcopy(flight.result)
+
+    try:
+        if not fresh:
+            _count("misses")
+        content = ai.generate_website_content(client, business_type, industry)
+        try:
+            _store(key, business_type, industry, model_name, content)
+        except Exception as e:
+            # A cache write failure must not lose a successful generation.
+            logger.warning("could not store generation in cache", extra={"error": str(e)})
+        flight.result = content
+        return copy.deepcopy(content)
+    except Exception as e:
+        flight.error = e
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+        flight.done.set()
+
+
+def stats():
+    with _counters_lock:
+        result = dict(_counters)
+    lookups = result["memory_hits"] + result["db_hits"] + result["misses"]
+    result["hit_ratio"] = round((result["memory_hits"] + result["db_hits"]) / lookups, 4) if lookups else 0.0
+    result["local"] = _local.stats()
+    return result
@@ -0,0 +1,202 @@
+import asyncio
+import io
+import logging
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from flask import request, request_started
+from werkzeug.exceptions import HTTPException
+from . import create_app
+from . import db
+
+logger = logging.getLogger('growthzi.asgi')
+
+# --- ASGI serving mode ---
+# `uvicorn growthzi.asgi:app` serves the same Flask app from an event loop.
+# Endpoints listed in routes.async_views.ASYNC_VIEWS (preview, website and
+# job reads, streamed generation) run as coroutines: their MongoDB queries
+# and model calls are awaited, so thousands of slow requests can be in
+# flight in one worker without a thread each. Every other request is run by
+# the unchanged Flask app on a small thread pool (ASGI_WSGI_THREADS). Both
+# paths share the URL map, before/after_request hooks (metrics, CORS),
+# error handlers and JSON provider, so responses are identical to WSGI mode.
+
+
+def _environ(scope, body):
+    """A WSGI environ for an ASGI HTTP scope."""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1] or 80),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', ()):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_LENGTH':
+            continue
+        key = name if name == 'CONTENT_TYPE' else f"HTTP_{name}"
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+async def _read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body', False):
+            break
+    return b''.join(chunks)
+
+
+def _start_message(status, headers):
+    return {
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers],
+    }
+
+
+class ASGIApp:
+    """ASGI application wrapping a Flask app created by create_app()."""
+
+    def __init__(self, flask_app=None):
+        from .routes.async_views import ASYNC_VIEWS
+        self.flask_app = flask_app or create_app()
+        self.async_views = ASYNC_VIEWS
+        self.wsgi_pool = ThreadPoolExecutor(
+            max_workers=self.flask_app.config.get('ASGI_WSGI_THREADS', 32), thread_name_prefix='asgi-wsgi'
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            body = await _read_body(receive)
+            environ = _environ(scope, body)
+            view = self._async_view(environ)
+            if view is not None:
+                await self._run_async(view, environ, send)
+            else:
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(self.wsgi_pool, self._run_wsgi, environ, loop, send)
+        else:
+            raise ValueError(f"Unsupported ASGI scope type '{scope['type']}'")
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await db.close_async_client()
+                self.wsgi_pool.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def _async_view(self, environ):
+        # Preflight requests get Flask's automatic OPTIONS response.
+        if environ['REQUEST_METHOD'] == 'OPTIONS':
+            return None
+        try:
+            endpoint, _ = self.flask_app.url_map.bind_to_environ(environ).match()
+        except HTTPException:
+            # 404, 405 and redirects are answered by Flask itself.
+            return None
+        return self.async_views.get(endpoint)
+
+    # --- Coroutine views ---
+
+    async def _run_async(self, view, environ, send):
+        app = self.flask_app
+        # Mirrors Flask.full_dispatch_request, awaiting the view.
+        ctx = app.request_context(environ)
+        ctx.push()
+        try:
+            try:
+                request_started.send(app, _async_wrapper=app.ensure_sync)
+                rv = app.preprocess_request()
+                if rv is None:
+                    rv = await view(**request.view_args)
+            except Exception as e:
+                rv = app.handle_user_exception(e)
+            response = app.finalize_request(rv)
+        except Exception as e:
+            response = app.handle_exception(e)
+        try:
+            await self._send_response(response, environ, send)
+        finally:
+            response.close()
+            ctx.pop()
+
+    async def _send_response(self, response, environ, send):
+        await send(_start_message(response.status_code, response.headers.to_wsgi_list()))
+        if environ['REQUEST_METHOD'] != 'HEAD':
+            chunks = getattr(response, 'async_body', None)
+            if chunks is not None:
+                try:
+                    async for chunk in chunks:
+                        if isinstance(chunk, str):
+                            chunk = chunk.encode('utf-8')
+                        await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                except Exception:
+                    # Headers are already sent; end the stream.
+                    logger.exception("async response stream failed", extra={"path": environ['PATH_INFO']})
+            else:
+                for chunk in response.iter_encoded():
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+
+    # --- Everything else: the Flask app on a worker thread ---
+
+    def _run_wsgi(self, environ, loop, send):
+        def emit(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        started = []
+
+        def start_response(status, headers, exc_info=None):
+            started[:] = [int(status.split(' ', 1)[0]), headers]
+
+        body = self.flask_app(environ, start_response)
+        try:
+            emit(_start_message(*started))
+            if environ['REQUEST_METHOD'] != 'HEAD':
+                for chunk in body:
+                    if chunk:
+                        emit({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        finally:
+            if hasattr(body, 'close'):
+                body.close()
+        emit({'type': 'http.response.body', 'body': b'', 'more_body': False})
+
+
+def create_asgi_app(flask_app=None):
+    return ASGIApp(flask_app)
+
+
+def __getattr__(name):
+    # `growthzi.asgi:app` is created on first access, so importing the
+    # module (e.g. for ASGIApp) does not build an app.
+    global app
+    if name == 'app':
+        app = create_asgi_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,152 @@
+import datetime
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pymongo.errors import BulkWriteError
+from . import ai
+from . import ai_cache
+from . import publish
+from .db import get_db
+
+logger = logging.getLogger('growthzi.batch')
+
+# --- Batch generation ---
+# POST /api/websites/generate/batch creates a website for each of many
+# business profiles in one request. Model calls fan out to a thread pool
+# shared by every batch request in the worker process, so at most
+# GENERATION_BATCH_CONCURRENCY calls are in flight however many batches
+# arrive. Calls that fail (timeouts, quota or network errors) are retried
+# with exponential backoff and jitter; content that does not validate fails
+# its item. The successful sites are stored with a single insert_many and
+# every profile gets its own status, so one bad item never fails the batch.
+
+ITEM_CREATED = 'created'
+ITEM_FAILED = 'failed'
+ITEM_INVALID = 'invalid'
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+class BatchError(ValueError):
+    """The batch request as a whole is malformed."""
+
+
+def _get_pool(workers):
+    global _pool, _pool_pid
+    with _pool_lock:
+        # Threads do not survive a fork, so create the pool in the serving process.
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='generation-batch')
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def parse_profiles(data, max_items):
+    """Returns the list of profiles from a request body or raises BatchError."""
+    profiles = data.get('profiles') if isinstance(data, dict) else None
+    if not isinstance(profiles, list) or not profiles:
+        raise BatchError("Request body must contain a non-empty 'profiles' list")
+    if len(profiles) > max_items:
+        raise BatchError(f"At most {max_items} profiles are allowed per request")
+    return profiles
+
+
+def _check_profile(profile):
+    if not isinstance(profile, dict):
+        return "each profile must be an object"
+    for field in ('business_type', 'industry'):
+        value = profile.get(field)
+        if not isinstance(value, str) or not value.strip():
+            return f"{field} is required"
+    return None
+
+
+def _backoff(config, attempt):
+    """Seconds to wait before retry number `attempt` (full jitter, capped)."""
+    base = config.get('GENERATION_BATCH_BACKOFF_MS', 500) / 1000
+    cap = config.get('GENERATION_BATCH_MAX_BACKOFF_MS', 8000) / 1000
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+def _generate(app, client, index, business_type, industry, fresh):
+    """Runs one profile on a pool thread. Returns (result, content or None)."""
+    with app.app_context():
+        retries = app.config.get('GENERATION_BATCH_RETRIES', 2)
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                content = ai_cache.get_or_generate(client, business_type, industry, fresh=fresh)
+                return {"index": index, "status": ITEM_CREATED, "attempts": attempt}, content
+            except ai.GenerationError as e:
+                if not e.retryable or attempt > retries:
+                    return {"index": index, "status": ITEM_FAILED, "error": str(e), "attempts": attempt}, None
+            except Exception:
+                logger.exception("batch generation item crashed", extra={"index": index})
+                return {"index": index, "status": ITEM_FAILED, "error": "Internal error", "attempts": attempt}, None
+            time.sleep(_backoff(app.config, attempt))
+
+
+def generate_batch(app, owner_id, profiles, fresh=False):
+    """
+    Generates and stores a website per profile. Returns one result per
+    profile, in order: {"index", "status", "attempts", "website" | "error"}.
+    """
+    client = ai.get_model_client(app)
+    pool = _get_pool(app.config.get('GENERATION_BATCH_CONCURRENCY', 8))
+    results = [None] * len(profiles)
+    futures = []
+    for index, profile in enumerate(profiles):
+        problem = _check_profile(profile)
+        if problem:
+            results[index] = {"index": index, "status": ITEM_INVALID, "error": problem}
+            continue
+        futures.append(pool.submit(
+            _generate, app, client, index, profile['business_type'], profile['industry'], fresh
+        ))
+
+    documents = []  # (index, website document)
+    for future in futures:
+        result, content = future.result()
+        results[result["index"]] = result
+        if content is not None:
+            now = datetime.datetime.now(datetime.timezone.utc)
+            documents.append((result["index"], {
+                "owner_id": owner_id,
+                "created_at": now,
+                "updated_at": now,
+                "version": 1,
+                "content": content
+            }))
+
+    if documents:
+        _store(documents, results)
+    return results
+
+
+def _store(documents, results):
+    failed = set()
+    try:
+        get_db().websites.insert_many([doc for _, doc in documents], ordered=False)
+    except BulkWriteError as e:
+        failed = {error['index'] for error in e.details.get('writeErrors', [])}
+    stored = []
+    for position, (index, doc) in enumerate(documents):
+        if position in failed:
+            results[index].update(status=ITEM_FAILED, error="The website could not be stored")
+        else:
+            results[index]["website"] = doc
+            stored.append(doc['_id'])
+    publish.schedule(*stored)
+
+
+def summarize(results):
+    summary = {ITEM_CREATED: 0, ITEM_FAILED: 0, ITEM_INVALID: 0}
+    for result in results:
+        summary[result["status"]] += 1
+    return summary
@@ -4,8 +4,175 @@ from dotenv import load_dotenv
 # Load environment variables from .env file
 load_dotenv()
 
+
+def _env_int(name, default=None):
+    value = os.environ.get(name)
+    return int(value) if value not in (None, '') else default
+
+
+def _env_bool(name, default=False):
+    value = os.environ.get(name)
+    if value in (None, ''):
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
 class Config:
     """Base configuration."""
     SECRET_KEY = os.environ.get('JWT_SECRET_KEY')
     MONGO_URI = os.environ.get('MONGO_URI')
-    OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY') 
+    OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
+
+    # --- MongoDB client / connection pool ---
+    # One client is shared per worker process; size the pool against the
+    # number of threads per worker.
+    MONGO_TLS = _env_bool('MONGO_TLS', True)
+    MONGO_MAX_POOL_SIZE = _env_int('MONGO_MAX_POOL_SIZE', 50)
+    MONGO_MIN_POOL_SIZE = _env_int('MONGO_MIN_POOL_SIZE', 0)
+    MONGO_MAX_IDLE_TIME_MS = _env_int('MONGO_MAX_IDLE_TIME_MS', 300000)
+    MONGO_WAIT_QUEUE_TIMEOUT_MS = _env_int('MONGO_WAIT_QUEUE_TIMEOUT_MS', 5000)
+    MONGO_CONNECT_TIMEOUT_MS = _env_int('MONGO_CONNECT_TIMEOUT_MS', 5000)
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = _env_int('MONGO_SERVER_SELECTION_TIMEOUT_MS', 10000)
+    MONGO_SOCKET_TIMEOUT_MS = _env_int('MONGO_SOCKET_TIMEOUT_MS')
+    # e.g. "primary", "primaryPreferred", "secondaryPreferred", "nearest"
+    MONGO_READ_PREFERENCE = os.environ.get('MONGO_READ_PREFERENCE', 'primary')
+    # Comma-separated list, e.g. "zstd,snappy,zlib"
+    MONGO_COMPRESSORS = os.environ.get('MONGO_COMPRESSORS')
+
+    # --- Principal (user + role) cache used by permission_required ---
+    PRINCIPAL_CACHE_SIZE = _env_int('PRINCIPAL_CACHE_SIZE', 10000)
+    PRINCIPAL_CACHE_TTL = _env_int('PRINCIPAL_CACHE_TTL', 60)
+    ROLE_CACHE_TTL = _env_int('ROLE_CACHE_TTL', 300)
+    # Embed role and permissions in issued JWTs so most requests skip the
+    # database. Role changes then apply on the user's next login.
+    JWT_EMBED_PERMISSIONS = _env_bool('JWT_EMBED_PERMISSIONS', False)
+
+    # --- Password hashing and login throttling ---
+    # Werkzeug hash method, e.g. "scrypt:32768:8:1" or "pbkdf2:sha256:600000".
+    # Existing hashes are upgraded on the user's next successful login.
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    # Processes hashing passwords per worker; 0 hashes on the request thread.
+    PASSWORD_HASH_WORKERS = _env_int('PASSWORD_HASH_WORKERS', 2)
+    # Hashes allowed to wait or run per worker before logins get 503.
+    PASSWORD_HASH_MAX_PENDING = _env_int('PASSWORD_HASH_MAX_PENDING', 32)
+    PASSWORD_HASH_TIMEOUT = _env_int('PASSWORD_HASH_TIMEOUT', 30)
+    PASSWORD_HASH_RETRY_AFTER = _env_int('PASSWORD_HASH_RETRY_AFTER', 2)
+    LOGIN_THROTTLE_WINDOW = _env_int('LOGIN_THROTTLE_WINDOW', 900)
+    LOGIN_MAX_FAILURES_PER_EMAIL = _env_int('LOGIN_MAX_FAILURES_PER_EMAIL', 10)
+    LOGIN_MAX_FAILURES_PER_IP = _env_int('LOGIN_MAX_FAILURES_PER_IP', 100)
+
+    # --- Rendered /preview/<id> page cache ---
+    PREVIEW_CACHE_MAX_ENTRIES = _env_int('PREVIEW_CACHE_MAX_ENTRIES', 2048)
+    PREVIEW_CACHE_MAX_BYTES = _env_int('PREVIEW_CACHE_MAX_BYTES', 64 * 1024 * 1024)
+    PREVIEW_CACHE_CONTROL = os.environ.get('PREVIEW_CACHE_CONTROL', 'public, max-age=0, must-revalidate')
+
+    # --- Background AI generation jobs ---
+    # The provider SDK is imported on the first generation (or at startup with PRELOAD).
+    AI_PROVIDER = os.environ.get('AI_PROVIDER', 'gemini')
+    GOOGLE_API_KEY = os.environ.get('GOOGLE_API_KEY')
+    AI_MODEL_NAME = os.environ.get('AI_MODEL_NAME', 'gemini-1.5-flash-latest')
+    # AI_PROVIDER=fake answers locally after this delay (tests, offline development).
+    AI_FAKE_LATENCY_MS = _env_int('AI_FAKE_LATENCY_MS', 0)
+    GENERATION_WORKERS = _env_int('GENERATION_WORKERS', 4)
+    GENERATION_QUEUE_SIZE = _env_int('GENERATION_QUEUE_SIZE', 100)
+    GENERATION_MAX_JOBS_PER_USER = _env_int('GENERATION_MAX_JOBS_PER_USER', 2)
+    # Seconds after which an unfinished job is failed and no longer counts against the user.
+    GENERATION_JOB_TIMEOUT = _env_int('GENERATION_JOB_TIMEOUT', 300)
+    GENERATION_RETRY_AFTER = _env_int('GENERATION_RETRY_AFTER', 5)
+    # Rounds of asking the model for just the sections it left out or got
+    # wrong, after local repairs (0 fails such generations instead).
+    GENERATION_REPROMPT_ATTEMPTS = _env_int('GENERATION_REPROMPT_ATTEMPTS', 1)
+
+    # --- Batch generation ---
+    # Model calls run on a pool shared by all batch requests of a worker;
+    # failed calls are retried with exponential backoff and jitter.
+    GENERATION_BATCH_MAX_ITEMS = _env_int('GENERATION_BATCH_MAX_ITEMS', 50)
+    GENERATION_BATCH_CONCURRENCY = _env_int('GENERATION_BATCH_CONCURRENCY', 8)
+    GENERATION_BATCH_RETRIES = _env_int('GENERATION_BATCH_RETRIES', 2)
+    GENERATION_BATCH_BACKOFF_MS = _env_int('GENERATION_BATCH_BACKOFF_MS', 500)
+    GENERATION_BATCH_MAX_BACKOFF_MS = _env_int('GENERATION_BATCH_MAX_BACKOFF_MS', 8000)
+
+    # --- Memoized AI generations ---
+    GENERATION_CACHE_ENABLED = _env_bool('GENERATION_CACHE_ENABLED', True)
+    GENERATION_CACHE_TTL = _env_int('GENERATION_CACHE_TTL', 7 * 24 * 3600)
+    GENERATION_CACHE_LOCAL_SIZE = _env_int('GENERATION_CACHE_LOCAL_SIZE', 256)
+    GENERATION_CACHE_LOCAL_TTL = _env_int('GENERATION_CACHE_LOCAL_TTL', 3600)
+
+    # --- Rate limiting ---
+    # Token buckets per route group as "<scope>=<requests>/<seconds>" for the
+    # scopes user, role (shared by all users with the role) and ip. Buckets
+    # are per worker process. An empty value disables a group.
+    RATE_LIMIT_ENABLED = _env_bool('RATE_LIMIT_ENABLED', True)
+    RATE_LIMIT_EXEMPT_ROLES = os.environ.get('RATE_LIMIT_EXEMPT_ROLES', 'Admin')
+    RATE_LIMIT_MAX_KEYS = _env_int('RATE_LIMIT_MAX_KEYS', 100000)
+    RATE_LIMIT_READ = os.environ.get('RATE_LIMIT_READ', 'user=300/60,ip=600/60')
+    RATE_LIMIT_WRITE = os.environ.get('RATE_LIMIT_WRITE', 'user=60/60,ip=120/60')
+    RATE_LIMIT_GENERATE = os.environ.get('RATE_LIMIT_GENERATE', 'user=10/60,role=200/60,ip=30/60')
+
+    # --- Daily AI generation quotas ---
+    # Generations per user per UTC day, shared by all workers. Admins can set
+    # per-user limits with PUT /api/admin/users/<id>/quota.
+    GENERATION_QUOTA_ENABLED = _env_bool('GENERATION_QUOTA_ENABLED', True)
+    GENERATION_DAILY_QUOTA = _env_int('GENERATION_DAILY_QUOTA', 50)
+    GENERATION_QUOTA_EXEMPT_ROLES = os.environ.get('GENERATION_QUOTA_EXEMPT_ROLES', 'Admin')
+    GENERATION_QUOTA_CACHE_TTL = _env_int('GENERATION_QUOTA_CACHE_TTL', 60)
+
+    # --- List endpoint pagination ---
+    PAGINATION_DEFAULT_LIMIT = _env_int('PAGINATION_DEFAULT_LIMIT', 50)
+    PAGINATION_MAX_LIMIT = _env_int('PAGINATION_MAX_LIMIT', 500)
+
+    # --- Bulk operations and export ---
+    BULK_MAX_OPERATIONS = _env_int('BULK_MAX_OPERATIONS', 500)
+    EXPORT_BATCH_SIZE = _env_int('EXPORT_BATCH_SIZE', 500)
+
+    # --- JSON responses ---
+    # Datetimes are written as HTTP dates ("http", Flask's format) or ISO 8601
+    # ("iso"). With JSON_RAW_BSON, list and export responses are encoded from
+    # raw BSON and each website's content is encoded once per version.
+    JSON_DATETIME_FORMAT = os.environ.get('JSON_DATETIME_FORMAT', 'http')
+    JSON_RAW_BSON = _env_bool('JSON_RAW_BSON', True)
+    JSON_FRAGMENT_CACHE_ENTRIES = _env_int('JSON_FRAGMENT_CACHE_ENTRIES', 8192)
+    JSON_FRAGMENT_CACHE_BYTES = _env_int('JSON_FRAGMENT_CACHE_BYTES', 32 * 1024 * 1024)
+
+    # --- Static publishing ---
+    # When set, sites are rendered to this directory on every save so a
+    # static server can serve them (see `flask --app run.py publish all`).
+    PUBLISH_DIR = os.environ.get('PUBLISH_DIR')
+    PUBLISH_ON_SAVE = _env_bool('PUBLISH_ON_SAVE', True)
+    PUBLISH_WORKERS = _env_int('PUBLISH_WORKERS', os.cpu_count() or 1)
+    PUBLISH_GZIP_LEVEL = _env_int('PUBLISH_GZIP_LEVEL', 9)
+    # Brotli quality for publishing on save (in the web worker) and for the
+    # `publish` CLI commands, which can afford the slowest, smallest output.
+    PUBLISH_BROTLI_QUALITY = _env_int('PUBLISH_BROTLI_QUALITY', 5)
+    PUBLISH_CLI_BROTLI_QUALITY = _env_int('PUBLISH_CLI_BROTLI_QUALITY', 11)
+
+    # --- Observability ---
+    # Application logs are JSON lines; DEBUG shows per-request auth decisions.
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'WARNING')
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')
+    METRICS_ENABLED = _env_bool('METRICS_ENABLED', True)
+    # If set, /metrics requires "Authorization: Bearer <token>".
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+    # --- Cross-process cache invalidation ---
+    # "auto" follows change streams and falls back to polling updated_at
+    # when the deployment does not support them; or force "change_stream"/"poll".
+    INVALIDATION_ENABLED = _env_bool('INVALIDATION_ENABLED', True)
+    INVALIDATION_MODE = os.environ.get('INVALIDATION_MODE', 'auto')
+    INVALIDATION_POLL_INTERVAL = _env_int('INVALIDATION_POLL_INTERVAL', 2)
+    INVALIDATION_POLL_OVERLAP = _env_int('INVALIDATION_POLL_OVERLAP', 5)
+
+    # --- ASGI serving mode (growthzi.asgi) ---
+    # Threads per worker running the endpoints that have no coroutine version.
+    ASGI_WSGI_THREADS = _env_int('ASGI_WSGI_THREADS', 32)
+
+    # --- Startup ---
+    # Build shared read-only state (AI SDK, compiled templates, role table)
+    # in create_app. Use with `gunicorn --preload` so workers inherit it.
+    PRELOAD = _env_bool('PRELOAD', False)
+
+    # --- Schema migrations ---
+    # Apply pending migrations when a worker starts. Disable in production and
+    # run `flask --app run.py db upgrade` as a deploy step instead.
+    AUTO_MIGRATE = _env_bool('AUTO_MIGRATE', True)
+    MIGRATION_WAIT_SECONDS = _env_int('MIGRATION_WAIT_SECONDS', 30)
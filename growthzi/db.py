@@ -1,33 +1,247 @@
+import os
+import threading
 from pymongo import MongoClient
+from pymongo import monitoring
 from flask import current_app, g
 import certifi
 
+# --- Process-wide client ---
+# A MongoClient is thread-safe and owns its own connection pool, so one
+# client per worker process is shared by every request. It is created lazily
+# on first use and re-created in a forked child (e.g. gunicorn workers),
+# because sockets and monitor threads must never be shared across a fork.
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """Keeps running counters of connection pool activity for this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.pools = 0
+            self.open = 0
+            self.in_use = 0
+            self.created = 0
+            self.closed = 0
+            self.checkouts = 0
+            self.checkout_failures = 0
+
+    def _bump(self, **deltas):
+        with self._lock:
+            for name, delta in deltas.items():
+                setattr(self, name, getattr(self, name) + delta)
+
+    def pool_created(self, event):
+        self._bump(pools=1)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        self._bump(pools=-1)
+
+    def connection_created(self, event):
+        self._bump(open=1, created=1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._bump(open=-1, closed=1)
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self._bump(checkout_failures=1)
+
+    def connection_checked_out(self, event):
+        self._bump(in_use=1, checkouts=1)
+
+    def connection_checked_in(self, event):
+        self._bump(in_use=-1)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "pools": self.pools,
+                "open_connections": self.open,
+                "in_use_connections": self.in_use,
+                "idle_connections": max(self.open - self.in_use, 0),
+                "connections_created": self.created,
+                "connections_closed": self.closed,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+            }
+
+
+pool_stats = PoolStatsListener()
+_event_listeners = [pool_stats]
+
+
+def register_listener(listener):
+    """Adds a pymongo event listener; must be called before the client is created."""
+    if not any(type(existing) is type(listener) for existing in _event_listeners):
+        _event_listeners.append(listener)
+
+
+def _client_options(config):
+    """Builds MongoClient keyword arguments from the app config."""
+    options = {
+        "maxPoolSize": config.get('MONGO_MAX_POOL_SIZE'),
+        "minPoolSize": config.get('MONGO_MIN_POOL_SIZE'),
+        "maxIdleTimeMS": config.get('MONGO_MAX_IDLE_TIME_MS'),
+        "waitQueueTimeoutMS": config.get('MONGO_WAIT_QUEUE_TIMEOUT_MS'),
+        "connectTimeoutMS": config.get('MONGO_CONNECT_TIMEOUT_MS'),
+        "serverSelectionTimeoutMS": config.get('MONGO_SERVER_SELECTION_TIMEOUT_MS'),
+        "socketTimeoutMS": config.get('MONGO_SOCKET_TIMEOUT_MS'),
+        "readPreference": config.get('MONGO_READ_PREFERENCE'),
+        "compressors": config.get('MONGO_COMPRESSORS'),
+    }
+    # Drop anything left unset so the driver defaults apply.
+    options = {key: value for key, value in options.items() if value not in (None, '')}
+
+    if config.get('MONGO_TLS', True):
+        # Use the trusted certificate authorities from certifi.
+        options["tls"] = True
+        options["tlsCAFile"] = certifi.where()
+    return options
+
+
+def get_client():
+    """
+    Returns the MongoClient for this process, creating it on first use.
+    The client is rebuilt if the process has forked since it was created.
+    """
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is not None and _client_pid == pid:
+        return _client
+
+    with _client_lock:
+        if _client is None or _client_pid != pid:
+            if _client is not None:
+                # Inherited from the parent: drop it without closing, the
+                # parent still owns those sockets.
+                pool_stats.reset()
+            config = current_app.config
+            _client = MongoClient(
+                config['MONGO_URI'],
+                event_listeners=list(_event_listeners),
+                **_client_options(config)
+            )
+            _client_pid = pid
+    return _client
+
+
+def set_client(client):
+    """
+    Installs a ready-made client for this process (e.g. mongomock in
+    benchmarks). It is used instead of building one from MONGO_URI.
+    """
+    global _client, _client_pid
+    with _client_lock:
+        _client = client
+        _client_pid = os.getpid()
+
+
+def close_client():
+    """Closes the process-wide client, e.g. on worker shutdown."""
+    global _client, _client_pid
+    with _client_lock:
+        if _client is not None and _client_pid == os.getpid():
+            _client.close()
+        _client = None
+        _client_pid = None
+        pool_stats.reset()
+
+
+def get_pool_stats():
+    """Returns connection pool counters and the configured limits."""
+    stats = pool_stats.snapshot()
+    stats["pid"] = os.getpid()
+    stats["client_initialized"] = _client is not None and _client_pid == os.getpid()
+    if stats["client_initialized"] and isinstance(_client, MongoClient):
+        pool_options = _client.options.pool_options
+        stats["max_pool_size"] = pool_options.max_pool_size
+        stats["min_pool_size"] = pool_options.min_pool_size
+    return stats
+
+
 def get_db():
     """
-    Connects to the database for the current request.
-    If a connection is already established for this request, returns it.
+    Returns the default database for the current request.
+    The handle is cheap; all requests share the process-wide client and its pool.
     """
-    if 'db_client' not in g:
-        # Get the path to the trusted certificate authorities from certifi.
-        ca = certifi.where()
-        
-        # Connect using the URI and the certifi CA file.
-        # This is the most common and robust configuration for cloud deployments.
-        g.db_client = MongoClient(
-            current_app.config['MONGO_URI'],
-            tls=True,
-            tlsCAFile=ca
-        )
-        
-        g.db = g.db_client.get_database()
+    if 'db' not in g:
+        g.db = get_client().get_database()
     return g.db
 
 def close_db(e=None):
-    """Closes the database connection at the end of the request."""
-    client = g.pop('db_client', None)
-    if client is not None:
-        client.close()
+    """Releases the request's database handle. The shared client stays open."""
+    g.pop('db', None)
+
+# --- Async client (ASGI mode) ---
+# Coroutine views served by growthzi.asgi use an async driver with the same
+# options: PyMongo's AsyncMongoClient when available, otherwise Motor. Like
+# the sync client there is one per process, created on first use.
+_async_client = None
+_async_client_pid = None
+
+
+def _async_client_class():
+    try:
+        from pymongo import AsyncMongoClient
+    except ImportError:
+        from motor.motor_asyncio import AsyncIOMotorClient as AsyncMongoClient
+    return AsyncMongoClient
+
+
+def get_async_client():
+    global _async_client, _async_client_pid
+    if _async_client is None or _async_client_pid != os.getpid():
+        config = current_app.config
+        _async_client = _async_client_class()(
+            config['MONGO_URI'],
+            event_listeners=list(_event_listeners),
+            **_client_options(config)
+        )
+        _async_client_pid = os.getpid()
+    return _async_client
+
+
+def set_async_client(client):
+    """Installs a ready-made async client for this process (e.g. in benchmarks)."""
+    global _async_client, _async_client_pid
+    _async_client = client
+    _async_client_pid = os.getpid()
+
+
+async def close_async_client():
+    global _async_client, _async_client_pid
+    client, _async_client = _async_client, None
+    if client is not None and _async_client_pid == os.getpid():
+        # AsyncMongoClient.close() is a coroutine, Motor's is not.
+        result = client.close()
+        if hasattr(result, '__await__'):
+            await result
+    _async_client_pid = None
+
+
+def get_async_db():
+    """The default database on the process-wide async client."""
+    return get_async_client().get_database()
+
 
 def init_app(app):
     """Register database functions with the Flask app."""
-    app.teardown_appcontext(close_db)
\ No newline at end of file
+    app.teardown_appcontext(close_db)
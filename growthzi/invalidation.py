@@ -0,0 +1,237 @@
+import datetime
+import logging
+import os
+import threading
+import time
+from flask import current_app
+from pymongo.errors import OperationFailure
+from .db import get_db
+
+logger = logging.getLogger('growthzi.invalidation')
+
+# --- Cross-process cache invalidation ---
+# Local caches (principals, roles, rendered previews) are per process, so a
+# write served by another worker or host would leave them stale until their
+# TTL runs out. A background thread in every worker follows MongoDB change
+# streams on the watched collections and evicts the changed ids from every
+# cache registered here. The stream's resume token is kept, so when the
+# stream is interrupted the watcher continues where it stopped instead of
+# missing events.
+#
+# Change streams need a replica set or sharded cluster. Without one the
+# watcher polls each collection for documents whose updated_at is newer
+# than the last one seen. Polling cannot see deletes; readers that need to
+# notice a deleted document (the preview route) already check for it.
+
+MODE_AUTO = 'auto'
+MODE_CHANGE_STREAM = 'change_stream'
+MODE_POLL = 'poll'
+
+WATCHED_OPERATIONS = ['insert', 'update', 'replace', 'delete']
+# Events after which the ids of changed documents are unknown.
+CLEAR_OPERATIONS = ('drop', 'rename', 'dropDatabase', 'invalidate')
+
+# "$changeStream is only supported on replica sets"
+_CHANGE_STREAMS_UNSUPPORTED = (40573, 40324)
+# The resume token is older than the oplog.
+_HISTORY_LOST = (136, 280, 286)
+
+_handlers = {}  # collection -> [(evict(doc_id), clear())]
+_handlers_lock = threading.Lock()
+
+
+def register(collection, evict, clear=None):
+    """
+    Registers a local cache for a collection. evict(doc_id) is called for
+    every changed document, clear() (if given) when individual ids are
+    unknown, e.g. after the collection was dropped or events were lost.
+    """
+    with _handlers_lock:
+        handlers = _handlers.setdefault(collection, [])
+        if (evict, clear) not in handlers:
+            handlers.append((evict, clear))
+
+
+def dispatch(collection, doc_id):
+    for evict, _ in _handlers.get(collection, ()):
+        try:
+            evict(doc_id)
+        except Exception as e:
+            logger.warning("cache eviction failed", extra={"collection": collection, "error": str(e)})
+
+
+def clear_all(collection=None):
+    for name, handlers in list(_handlers.items()):
+        if collection is not None and name != collection:
+            continue
+        for _, clear in handlers:
+            if clear is not None:
+                clear()
+
+
+class InvalidationWatcher:
+    """
+    Runs the change stream (or polling) loop in a daemon thread. The thread
+    is started lazily in the serving process, so forking after create_app()
+    (e.g. gunicorn --preload) is safe.
+    """
+
+    def __init__(self, app, mode=MODE_AUTO, poll_interval=2.0, poll_overlap=5.0):
+        self.app = app
+        self.mode = mode
+        self.poll_interval = poll_interval
+        self.poll_overlap = datetime.timedelta(seconds=poll_overlap)
+        self.active_mode = None
+        self.resume_token = None
+        self.watermarks = {}
+        self.events = 0
+        self.errors = 0
+        self.last_event_at = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def collections(self):
+        return sorted(_handlers)
+
+    def ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # Anything inherited from a parent process is stale here.
+            self.resume_token = None
+            self.watermarks = {}
+            thread = threading.Thread(target=self._run, name='cache-invalidation', daemon=True)
+            thread.start()
+            self._pid = os.getpid()
+
+    def _record(self, collection, doc_id):
+        self.events += 1
+        self.last_event_at = time.time()
+        dispatch(collection, doc_id)
+
+    def _run(self):
+        backoff = 1.0
+        while True:
+            try:
+                with self.app.app_context():
+                    if self.mode == MODE_POLL or self.active_mode == MODE_POLL:
+                        self._poll_forever()
+                    else:
+                        self._watch()
+                backoff = 1.0
+            except Exception as e:
+                self.errors += 1
+                if self._should_fall_back(e):
+                    logger.warning("change streams unavailable, polling updated_at instead", extra={"error": str(e)})
+                    self.active_mode = MODE_POLL
+                    continue
+                if isinstance(e, OperationFailure) and e.code in _HISTORY_LOST:
+                    # Events were missed; nothing cached can be trusted.
+                    logger.warning("change stream history lost, clearing caches", extra={"error": str(e)})
+                    self.resume_token = None
+                    clear_all()
+                else:
+                    logger.warning("cache invalidation watcher failed, retrying", extra={"error": str(e)})
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+
+    def _should_fall_back(self, error):
+        if self.mode != MODE_AUTO or self.active_mode == MODE_CHANGE_STREAM:
+            return False
+        if isinstance(error, NotImplementedError):
+            return True
+        return isinstance(error, OperationFailure) and error.code in _CHANGE_STREAMS_UNSUPPORTED
+
+    # --- Change streams ---
+
+    def _watch(self):
+        pipeline = [
+            {"$match": {
+                "$or": [
+                    {"ns.coll": {"$in": self.collections()}, "operationType": {"$in": WATCHED_OPERATIONS}},
+                    {"operationType": {"$in": list(CLEAR_OPERATIONS)}},
+                ]
+            }},
+            {"$project": {"ns": 1, "documentKey": 1, "operationType": 1}},
+        ]
+        with get_db().watch(pipeline, resume_after=self.resume_token) as stream:
+            self.active_mode = MODE_CHANGE_STREAM
+            for change in stream:
+                operation = change.get('operationType')
+                collection = change.get('ns', {}).get('coll')
+                if operation == 'invalidate':
+                    # The stream is closed and cannot be resumed after this event.
+                    self.resume_token = None
+                    clear_all()
+                    return
+                if operation in CLEAR_OPERATIONS:
+                    clear_all(collection)
+                else:
+                    self._record(collection, change['documentKey']['_id'])
+                self.resume_token = stream.resume_token
+
+    # --- Polling fallback ---
+
+    def _poll_forever(self):
+        self.active_mode = MODE_POLL
+        database = get_db()
+        now = datetime.datetime.now(datetime.timezone.utc)
+        for collection in self.collections():
+            self.watermarks.setdefault(collection, now)
+        while True:
+            for collection in self.collections():
+                self._poll(database, collection)
+            time.sleep(self.poll_interval)
+
+    def _poll(self, database, collection):
+        # Look back by poll_overlap to tolerate clock skew between writers;
+        # evicting an entry twice is harmless.
+        since = self.watermarks.get(collection) or datetime.datetime.now(datetime.timezone.utc)
+        cursor = database[collection].find(
+            {"updated_at": {"$gt": since - self.poll_overlap}}, {"_id": 1, "updated_at": 1}
+        )
+        newest = since
+        for doc in cursor:
+            self._record(collection, doc['_id'])
+            updated_at = doc['updated_at']
+            if updated_at.tzinfo is None:
+                # PyMongo returns naive datetimes that are in UTC.
+                updated_at = updated_at.replace(tzinfo=datetime.timezone.utc)
+            newest = max(newest, updated_at)
+        self.watermarks[collection] = newest
+
+    def stats(self):
+        return {
+            "mode": self.active_mode or self.mode,
+            "collections": self.collections(),
+            "events": self.events,
+            "errors": self.errors,
+            "last_event_at": self.last_event_at,
+            "resumable": self.resume_token is not None,
+        }
+
+
+def _start_watcher():
+    watcher = current_app.extensions.get('growthzi_invalidation')
+    if watcher is not None:
+        watcher.ensure_started()
+
+
+def init_app(app):
+    """Creates the watcher; its thread starts with the first request in each process."""
+    if not app.config.get('INVALIDATION_ENABLED', True):
+        return
+    app.extensions['growthzi_invalidation'] = InvalidationWatcher(
+        app,
+        mode=app.config.get('INVALIDATION_MODE', MODE_AUTO),
+        poll_interval=app.config.get('INVALIDATION_POLL_INTERVAL', 2.0),
+        poll_overlap=app.config.get('INVALIDATION_POLL_OVERLAP', 5.0),
+    )
+    app.before_request(_start_watcher)
+
+
+def stats(app):
+    watcher = app.extensions.get('growthzi_invalidation')
+    return watcher.stats() if watcher is not None else {"mode": "disabled"}
@@ -0,0 +1,282 @@
+import datetime
+import logging
+import os
+import queue
+import threading
+from bson import ObjectId
+from flask import current_app
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from . import ai
+from . import ai_cache
+from . import publish
+from . import quotas
+from .db import get_db
+
+logger = logging.getLogger('growthzi.jobs')
+
+# --- Asynchronous website generation ---
+# POST /api/websites/generate records a job in the `generation_jobs`
+# collection and hands it to a bounded in-process worker pool, so model
+# latency never holds a request thread. Job state lives in MongoDB, so the
+# status endpoint can be answered by any worker.
+#
+# Each user may have GENERATION_MAX_JOBS_PER_USER jobs in flight. The jobs
+# are listed in the user's `generation_slots` document, which a conditional
+# $push extends only while it has room, so concurrent requests on any worker
+# cannot exceed the limit. A job that has not finished GENERATION_JOB_TIMEOUT
+# seconds after it was created (e.g. its worker was restarted) is marked
+# failed the next time it or its owner's slots are looked at, and its quota
+# is refunded.
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_SUCCEEDED = 'succeeded'
+JOB_FAILED = 'failed'
+ACTIVE_STATES = (JOB_QUEUED, JOB_RUNNING)
+
+
+class QueueFullError(Exception):
+    """The job queue is at capacity; the client should retry later."""
+
+
+class UserLimitError(Exception):
+    """The user already has the maximum number of jobs in flight."""
+
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def _stale_before(config):
+    return _now() - datetime.timedelta(seconds=config.get('GENERATION_JOB_TIMEOUT', 300))
+
+
+class GenerationJobQueue:
+    """
+    A fixed pool of worker threads fed by a bounded queue.
+    - workers: Number of generations that run concurrently in this process.
+    - max_queue: Jobs waiting beyond this are rejected with QueueFullError.
+    """
+
+    def __init__(self, app, workers=4, max_queue=100):
+        self.app = app
+        self.workers = workers
+        self.max_queue = max_queue
+        self._queue = None
+        self._threads = []
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        # Threads do not survive a fork, so start them in the serving process.
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=self.max_queue)
+            self._threads = []
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"generation-worker-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            self._pid = os.getpid()
+
+    def submit(self, job_id):
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(job_id)
+        except queue.Full:
+            raise QueueFullError("Generation queue is full")
+
+    def depth(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def _run(self):
+        while True:
+            job_id = self._queue.get()
+            try:
+                with self.app.app_context():
+                    run_job(job_id)
+            except Exception:
+                logger.exception("generation job crashed", extra={"job_id": str(job_id)})
+            finally:
+                self._queue.task_done()
+
+
+def init_app(app):
+    """Creates the app's job queue; worker threads start on first submit."""
+    app.extensions['growthzi_jobs'] = GenerationJobQueue(
+        app,
+        workers=app.config.get('GENERATION_WORKERS', 4),
+        max_queue=app.config.get('GENERATION_QUEUE_SIZE', 100),
+    )
+
+
+def get_job_queue(app):
+    return app.extensions['growthzi_jobs']
+
+
+def enqueue_generation(app, owner_id, business_type, industry, fresh=False, quota_day=None):
+    """
+    Records a generation job and queues it. Returns the job document.
+    Raises UserLimitError or QueueFullError when the request must be refused.
+    quota_day is the quota day the generation was charged to (see
+    quotas.consume); it is refunded if the generation fails.
+    """
+    db = get_db()
+    config = app.config
+    expire_stale_jobs(owner_id)
+
+    job = {
+        "_id": ObjectId(),
+        "owner_id": owner_id,
+        "status": JOB_QUEUED,
+        "params": {"business_type": business_type, "industry": industry, "fresh": bool(fresh)},
+        "website_id": None,
+        "error": None,
+        "quota_day": quota_day,
+        "created_at": _now(),
+        "started_at": None,
+        "finished_at": None,
+    }
+    _acquire_slot(db, job, config.get('GENERATION_MAX_JOBS_PER_USER', 2), _stale_before(config))
+    db.generation_jobs.insert_one(job)
+
+    try:
+        get_job_queue(app).submit(job["_id"])
+    except QueueFullError:
+        db.generation_jobs.delete_one({"_id": job["_id"]})
+        _release_slot(db, job)
+        raise
+    return job
+
+
+def _acquire_slot(db, job, limit, stale_before):
+    """Lists the job in its owner's slots, or raises UserLimitError if they are all taken."""
+    if limit < 1:
+        raise UserLimitError("Too many generation jobs in progress")
+    slots = db.generation_slots
+    # Slots of jobs that were lost with their worker free themselves.
+    slots.update_one({"_id": job["owner_id"]}, {"$pull": {"jobs": {"created_at": {"$lt": stale_before}}}})
+    try:
+        # Matches only while fewer than `limit` jobs are listed; otherwise the
+        # upsert collides with the owner's document and raises DuplicateKeyError.
+        slots.update_one(
+            {"_id": job["owner_id"], f"jobs.{limit - 1}": {"$exists": False}},
+            {"$push": {"jobs": {"job_id": job["_id"], "created_at": job["created_at"]}}},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        raise UserLimitError("Too many generation jobs in progress")
+
+
+def _release_slot(db, job):
+    db.generation_slots.update_one({"_id": job["owner_id"]}, {"$pull": {"jobs": {"job_id": job["_id"]}}})
+
+
+def _fail_job(db, job, error, query=None):
+    """
+    Marks an unfinished job failed, frees its slot and refunds its quota.
+    Returns the updated job, or None if it had already finished.
+    """
+    failed = db.generation_jobs.find_one_and_update(
+        {"_id": job["_id"], "status": {"$in": list(ACTIVE_STATES)}, **(query or {})},
+        {"$set": {"status": JOB_FAILED, "error": error, "finished_at": _now()}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if failed is not None:
+        _release_slot(db, failed)
+        quotas.refund(failed["owner_id"], failed.get("quota_day"))
+    return failed
+
+
+def expire_stale_jobs(owner_id):
+    """Fails the owner's jobs that are still unfinished after GENERATION_JOB_TIMEOUT."""
+    db = get_db()
+    stale = db.generation_jobs.find({
+        "owner_id": owner_id,
+        "status": {"$in": list(ACTIVE_STATES)},
+        "created_at": {"$lt": _stale_before(current_app.config)},
+    }, {"owner_id": 1})
+    for job in list(stale):
+        _fail_job(db, job, "Generation timed out")
+
+
+def expire_if_stale(job):
+    """Returns the job, marked failed if it is still unfinished after GENERATION_JOB_TIMEOUT."""
+    if job is None or job["status"] not in ACTIVE_STATES:
+        return job
+    expired = _fail_job(
+        get_db(), job, "Generation timed out",
+        {"created_at": {"$lt": _stale_before(current_app.config)}},
+    )
+    return expired or job
+
+
+def run_job(job_id):
+    """Runs one queued job to completion. Must be called inside an app context."""
+    db = get_db()
+    job = db.generation_jobs.find_one_and_update(
+        {"_id": job_id, "status": JOB_QUEUED},
+        {"$set": {"status": JOB_RUNNING, "started_at": _now()}},
+    )
+    if not job:
+        return
+
+    params = job["params"]
+    try:
+        content = ai_cache.get_or_generate(
+            ai.get_model_client(), params["business_type"], params["industry"], fresh=params.get("fresh", False)
+        )
+        website_doc = {
+            "owner_id": job["owner_id"],
+            "created_at": _now(),
+            "updated_at": _now(),
+            "version": 1,
+            "content": content
+        }
+        website_id = db.websites.insert_one(website_doc).inserted_id
+    except ai.GenerationError as e:
+        _fail_job(db, job, str(e))
+        return
+    except Exception:
+        # Anything else (a database error, an unexpected model response)
+        # must not leave the job running or the quota spent.
+        logger.exception("generation job failed", extra={"job_id": str(job_id)})
+        _fail_job(db, job, "Website generation failed")
+        return
+
+    finished = db.generation_jobs.update_one(
+        {"_id": job_id, "status": JOB_RUNNING},
+        {"$set": {"status": JOB_SUCCEEDED, "website_id": website_id, "finished_at": _now()}}
+    )
+    if not finished.matched_count:
+        # The job was expired while the model ran: it has already been
+        # failed and refunded, so the website must not be kept either.
+        logger.warning("generation job expired before it finished", extra={"job_id": str(job_id)})
+        db.websites.delete_one({"_id": website_id})
+        return
+    publish.schedule(website_id)
+    _release_slot(db, job)
+
+
+def get_job(job_id, ownership_filter=None):
+    """Returns a job by id, optionally restricted by an ownership filter."""
+    job = get_db().generation_jobs.find_one({"_id": ObjectId(job_id), **(ownership_filter or {})})
+    return expire_if_stale(job)
+
+
+def serialize_job(job):
+    result = {
+        "job_id": str(job["_id"]),
+        "status": job["status"],
+        "params": job.get("params"),
+        "website_id": str(job["website_id"]) if job.get("website_id") else None,
+        "error": job.get("error"),
+    }
+    for field in ("created_at", "started_at", "finished_at"):
+        value = job.get(field)
+        result[field] = value.isoformat() if value else None
+    return result
@@ -0,0 +1,45 @@
+import json
+import logging
+import time
+
+# --- Structured logging ---
+# Application loggers live under the "growthzi" namespace. Records are
+# emitted as one JSON object per line, including any `extra={...}` fields.
+# The default level is WARNING, so debug/info calls on hot paths are
+# filtered out before any formatting happens.
+
+_STANDARD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(app):
+    """Sets up the "growthzi" logger from LOG_LEVEL and LOG_FORMAT."""
+    logger = logging.getLogger('growthzi')
+    logger.setLevel(app.config.get('LOG_LEVEL', 'WARNING').upper())
+    if not any(getattr(handler, '_growthzi', False) for handler in logger.handlers):
+        handler = logging.StreamHandler()
+        handler._growthzi = True
+        logger.addHandler(handler)
+        logger.propagate = False
+    for handler in logger.handlers:
+        if getattr(handler, '_growthzi', False):
+            if app.config.get('LOG_FORMAT', 'json') == 'json':
+                handler.setFormatter(JsonFormatter())
+            else:
+                handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+    return logger
@@ -0,0 +1,330 @@
+import bisect
+import threading
+import time
+from flask import Response, current_app, g, request
+from pymongo import monitoring
+
+# --- In-process metrics ---
+# A minimal registry rendered in the Prometheus text exposition format at
+# /metrics. Recording is a dict lookup and a few integer updates under a
+# lock; values that already live elsewhere (cache and pool counters) are
+# read by callback gauges only when /metrics is scraped. Each worker process
+# keeps its own registry, so scrape every worker (or aggregate by pid).
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+AI_BUCKETS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return repr(value)
+    return str(value)
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, *labelvalues):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = list(self._values.items())
+        for labelvalues, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                # Per-bucket counts (last slot is +Inf), sum, count.
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(labels, (list(s[0]), s[1], s[2])) for labels, s in self._series.items()]
+        for labelvalues, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(float(bound))}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labelvalues, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, labelvalues)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class CallbackGauge:
+    """A gauge whose samples are produced by a callback at scrape time.
+    The callback returns an iterable of (labelvalues tuple, value)."""
+
+    type = 'gauge'
+
+    def __init__(self, name, documentation, labelnames, callback):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        try:
+            samples = list(self.callback())
+        except Exception:
+            samples = []
+        for labelvalues, value in samples:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}")
+        return lines
+
+
+class CallbackCounter(CallbackGauge):
+    """A counter read at scrape time from totals kept elsewhere (e.g. a limiter's rejections)."""
+
+    type = 'counter'
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._names = set()
+
+    def register(self, metric):
+        if metric.name not in self._names:
+            self._metrics.append(metric)
+            self._names.add(metric.name)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+REQUEST_LATENCY = registry.register(Histogram(
+    'growthzi_http_request_duration_seconds', 'HTTP request latency until the response is returned.',
+    ('blueprint', 'endpoint', 'method', 'status')))
+MONGO_COMMAND_LATENCY = registry.register(Histogram(
+    'growthzi_mongo_command_duration_seconds', 'MongoDB command round-trip time.', ('command', 'outcome')))
+AI_GENERATION_LATENCY = registry.register(Histogram(
+    'growthzi_ai_generation_duration_seconds', 'AI model call latency.', ('model', 'outcome'), buckets=AI_BUCKETS))
+AI_TOKENS = registry.register(Counter(
+    'growthzi_ai_tokens_total', 'Tokens reported by the AI service.', ('model', 'kind')))
+AI_CONTENT_OUTCOMES = registry.register(Counter(
+    'growthzi_ai_content_total',
+    'Generated responses by what it took to use them: valid, repaired locally, re-prompted or failed.',
+    ('outcome',)))
+AI_REPAIRS = registry.register(Counter(
+    'growthzi_ai_repairs_total', 'Local repairs applied to generated content.', ('kind',)))
+AI_REPROMPTED_SECTIONS = registry.register(Counter(
+    'growthzi_ai_reprompted_sections_total', 'Sections requested again from the model.', ('section',)))
+QUOTA_REJECTIONS = registry.register(Counter(
+    'growthzi_generation_quota_rejected_total',
+    'Generations refused by the daily quota, by whether the local cache or MongoDB decided.', ('source',)))
+
+
+def observe_ai_generation(model, seconds, outcome):
+    AI_GENERATION_LATENCY.observe(seconds, model or 'unknown', outcome)
+
+
+def record_ai_content(outcome):
+    AI_CONTENT_OUTCOMES.inc(1, outcome)
+
+
+def record_ai_repair(kind):
+    AI_REPAIRS.inc(1, kind)
+
+
+def record_ai_reprompt(section):
+    AI_REPROMPTED_SECTIONS.inc(1, section)
+
+
+def record_quota_rejection(source):
+    QUOTA_REJECTIONS.inc(1, source)
+
+
+def record_ai_tokens(model, prompt_tokens=None, output_tokens=None):
+    if prompt_tokens:
+        AI_TOKENS.inc(prompt_tokens, model or 'unknown', 'prompt')
+    if output_tokens:
+        AI_TOKENS.inc(output_tokens, model or 'unknown', 'output')
+
+
+class CommandTimingListener(monitoring.CommandListener):
+    """Feeds MongoDB command durations into MONGO_COMMAND_LATENCY."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_COMMAND_LATENCY.observe(event.duration_micros / 1e6, event.command_name, 'success')
+
+    def failed(self, event):
+        MONGO_COMMAND_LATENCY.observe(event.duration_micros / 1e6, event.command_name, 'failure')
+
+
+# --- Scrape-time gauges ---
+
+def _pool_samples():
+    from .db import get_pool_stats
+    stats = get_pool_stats()
+    for key in ('open_connections', 'in_use_connections', 'idle_connections', 'max_pool_size'):
+        if isinstance(stats.get(key), (int, float)):
+            yield (key,), stats[key]
+
+
+def _cache_stats():
+    from .utils import principals
+    from .routes import preview
+    from . import ai_cache
+    return {
+        'principals': principals.cache_stats(),
+        'preview': preview.cache_stats(),
+        'generations_local': ai_cache.stats()['local'],
+    }
+
+
+def _cache_event_samples():
+    from . import ai_cache
+    for cache, stats in _cache_stats().items():
+        yield (cache, 'hits'), stats['hits']
+        yield (cache, 'misses'), stats['misses']
+    generations = ai_cache.stats()
+    for key in ('memory_hits', 'db_hits', 'misses', 'shared', 'bypassed'):
+        yield ('generations', key), generations[key]
+
+
+def _cache_size_samples():
+    for cache, stats in _cache_stats().items():
+        yield (cache,), stats['size']
+
+
+def _cache_ratio_samples():
+    from .utils import principals
+    from .routes import preview
+    from . import ai_cache
+    for cache, stats in (('principals', principals.cache_stats()), ('preview', preview.cache_stats())):
+        lookups = stats['hits'] + stats['misses']
+        yield (cache,), round(stats['hits'] / lookups, 4) if lookups else 0.0
+    yield ('generations',), ai_cache.stats()['hit_ratio']
+
+
+def _job_samples():
+    jobs = current_app.extensions.get('growthzi_jobs')
+    if jobs is not None:
+        yield (), jobs.depth()
+
+
+def _password_samples():
+    from . import passwords
+    yield (), passwords.pending()
+
+
+registry.register(CallbackGauge(
+    'growthzi_mongo_pool_connections', 'MongoDB connection pool state for this worker.', ('state',), _pool_samples))
+registry.register(CallbackCounter(
+    'growthzi_cache_events_total', 'Cache lookups by outcome (hits, misses) since the worker started.',
+    ('cache', 'kind'), _cache_event_samples))
+registry.register(CallbackGauge(
+    'growthzi_cache_size', 'Entries held in each cache of this worker.', ('cache',), _cache_size_samples))
+registry.register(CallbackGauge(
+    'growthzi_cache_hit_ratio', 'Cache hit ratio since the worker started.', ('cache',), _cache_ratio_samples))
+registry.register(CallbackGauge(
+    'growthzi_generation_queue_depth', 'Generation jobs waiting in this worker.', (), _job_samples))
+registry.register(CallbackGauge(
+    'growthzi_password_hashes_pending', 'Password hashes queued or running in this worker.', (), _password_samples))
+
+
+def _rate_limit_samples():
+    from . import ratelimit
+    for group, limiters in ratelimit.stats().items():
+        for scope, stats in limiters.items():
+            yield (group, scope), stats['rejected']
+
+
+def _throttle_samples():
+    from . import passwords
+    stats = passwords.stats()
+    yield ('email',), stats['email_throttle']['rejected']
+    yield ('ip',), stats['ip_throttle']['rejected']
+
+
+registry.register(CallbackCounter(
+    'growthzi_rate_limited_total', 'Requests refused by rate limiting since the worker started.',
+    ('group', 'scope'), _rate_limit_samples))
+registry.register(CallbackCounter(
+    'growthzi_login_throttled_total', 'Logins rejected by failed-attempt throttling since the worker started.',
+    ('key',), _throttle_samples))
+
+
+# --- Flask integration ---
+
+def _start_timer():
+    g._metrics_started = time.perf_counter()
+
+
+def _record_request(response):
+    started = g.pop('_metrics_started', None)
+    if started is not None:
+        REQUEST_LATENCY.observe(
+            time.perf_counter() - started,
+            request.blueprint or '', request.endpoint or 'unmatched', request.method, response.status_code
+        )
+    return response
+
+
+def metrics_view():
+    token = current_app.config.get('METRICS_TOKEN')
+    if token and request.headers.get('Authorization') != f"Bearer {token}":
+        return Response("Unauthorized\n", status=401, mimetype='text/plain')
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+
+def init_app(app):
+    """Registers request timing hooks, the Mongo listener and /metrics."""
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+    from . import db
+    db.register_listener(CommandTimingListener())
+    app.before_request(_start_timer)
+    app.after_request(_record_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_view, methods=['GET'])
@@ -0,0 +1,208 @@
+import datetime
+import logging
+import os
+import socket
+import time
+import click
+from flask.cli import AppGroup
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import DuplicateKeyError
+from werkzeug.security import generate_password_hash
+from .db import get_db
+
+logger = logging.getLogger('growthzi.migrations')
+
+# --- Versioned schema migrations ---
+# Each migration runs once per database; the applied version is recorded in
+# the `schema_migrations` collection. On startup a worker only reads that
+# marker, so booting against a current database costs a single query.
+# Run pending migrations explicitly with `flask --app run.py db upgrade`.
+
+MARKER_ID = 'schema'
+LOCK_ID = 'lock'
+LOCK_TIMEOUT = datetime.timedelta(minutes=5)
+
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def seed_database(database):
+    """Ensures the default roles and the default admin user exist."""
+    roles_to_seed = [
+        {"name": "Admin", "permissions": ["users:manage", "roles:manage", "websites:create", "websites:read_all", "websites:edit_all", "websites:delete_all", "websites:read_own"]},
+        {"name": "Editor", "permissions": ["websites:create", "websites:read_own", "websites:edit_own", "websites:delete_own"]},
+        {"name": "Viewer", "permissions": ["websites:read_all", "websites:read_own"]}
+    ]
+    logger.info("ensuring default roles exist")
+    for role_data in roles_to_seed:
+        database.roles.update_one({"name": role_data["name"]}, {"$setOnInsert": role_data}, upsert=True)
+    logger.info("default roles are present")
+
+    admin_email = "admin@growthzi.com"
+    if database.users.find_one({"email": admin_email}) is None:
+        logger.info("creating default admin user", extra={"email": admin_email})
+        admin_role = database.roles.find_one({"name": "Admin"})
+        if admin_role:
+            hashed_password = generate_password_hash("admin123")
+            database.users.insert_one({
+                "email": admin_email,
+                "password": hashed_password,
+                "role_id": admin_role['_id'],
+                "created_at": _now()
+            })
+            logger.info("default admin user created", extra={"email": admin_email})
+        else:
+            logger.critical("'Admin' role not found, cannot create the default admin user")
+
+
+def create_indexes(database):
+    """Creates the indexes the API queries rely on."""
+    database.users.create_index([("email", ASCENDING)], unique=True)
+    database.users.create_index([("created_at", DESCENDING), ("_id", DESCENDING)])
+    database.users.create_index([("role_id", ASCENDING)])
+    database.roles.create_index([("name", ASCENDING)], unique=True)
+    database.websites.create_index([("owner_id", ASCENDING), ("created_at", DESCENDING)])
+    database.websites.create_index([("created_at", DESCENDING), ("_id", DESCENDING)])
+    database.generation_jobs.create_index(
+        [("owner_id", ASCENDING), ("status", ASCENDING), ("created_at", DESCENDING)]
+    )
+    # TTL indexes: MongoDB deletes documents once the indexed date has passed.
+    database.generation_cache.create_index([("expires_at", ASCENDING)], expireAfterSeconds=0)
+    database.generation_jobs.create_index(
+        [("created_at", ASCENDING)], expireAfterSeconds=7 * 24 * 3600
+    )
+
+
+def create_updated_at_indexes(database):
+    """Supports the updated_at polling fallback of the invalidation watcher."""
+    database.users.create_index([("updated_at", ASCENDING)], sparse=True)
+    database.websites.create_index([("updated_at", ASCENDING)])
+
+
+def create_quota_indexes(database):
+    """Supports daily generation quotas (growthzi.quotas)."""
+    # Daily counters are removed once expires_at has passed.
+    database.generation_usage.create_index([("expires_at", ASCENDING)], expireAfterSeconds=0)
+    database.generation_usage.create_index([("day", ASCENDING), ("count", DESCENDING)])
+    # Lets the invalidation watcher's polling fallback see limit changes.
+    database.generation_quotas.create_index([("updated_at", ASCENDING)])
+
+
+# (version, description, function) in the order they must be applied.
+MIGRATIONS = [
+    (1, "Seed default roles and admin user", seed_database),
+    (2, "Create indexes", create_indexes),
+    (3, "Index updated_at for cache invalidation polling", create_updated_at_indexes),
+    (4, "Create generation quota indexes", create_quota_indexes),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(database):
+    marker = database.schema_migrations.find_one({"_id": MARKER_ID}, {"version": 1})
+    return marker["version"] if marker else 0
+
+
+def _acquire_lock(database):
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+    now = _now()
+    try:
+        database.schema_migrations.find_one_and_update(
+            {"_id": LOCK_ID, "expires_at": {"$lt": now}},
+            {"$set": {"owner": owner, "expires_at": now + LOCK_TIMEOUT}},
+            upsert=True
+        )
+        return owner
+    except DuplicateKeyError:
+        # Another process holds an unexpired lock.
+        return None
+
+
+def _release_lock(database, owner):
+    database.schema_migrations.delete_one({"_id": LOCK_ID, "owner": owner})
+
+
+def upgrade(database, target=SCHEMA_VERSION):
+    """
+    Applies pending migrations up to target. Returns the list of versions
+    applied, or None if another process is already migrating.
+    """
+    owner = _acquire_lock(database)
+    if owner is None:
+        return None
+    applied = []
+    try:
+        version = current_version(database)
+        for number, description, migration in MIGRATIONS:
+            if number <= version or number > target:
+                continue
+            logger.info("applying migration", extra={"version": number, "description": description})
+            migration(database)
+            database.schema_migrations.update_one(
+                {"_id": MARKER_ID},
+                {"$set": {"version": number, "applied_at": _now()}},
+                upsert=True
+            )
+            applied.append(number)
+    finally:
+        _release_lock(database, owner)
+    return applied
+
+
+def ensure_schema(app):
+    """
+    Called from create_app. Does nothing beyond one marker read when the
+    schema is current. Otherwise applies migrations if AUTO_MIGRATE is on,
+    letting only one process do the work while the others wait briefly.
+    """
+    with app.app_context():
+        database = get_db()
+        version = current_version(database)
+        if version >= SCHEMA_VERSION:
+            return
+        if not app.config.get('AUTO_MIGRATE', True):
+            logger.warning(
+                "database schema is behind, run 'flask db upgrade'",
+                extra={"version": version, "expected_version": SCHEMA_VERSION},
+            )
+            return
+        deadline = time.monotonic() + app.config.get('MIGRATION_WAIT_SECONDS', 30)
+        while upgrade(database) is None:
+            if time.monotonic() >= deadline or current_version(database) >= SCHEMA_VERSION:
+                break
+            time.sleep(0.5)
+
+
+def init_app(app):
+    """Registers the `flask db` CLI commands."""
+    app.cli.add_command(db_cli)
+
+
+# AppGroup runs each command inside an application context.
+db_cli = AppGroup('db', help='Database schema commands.')
+
+
+@db_cli.command('upgrade')
+@click.option('--target', type=int, default=SCHEMA_VERSION, show_default=True, help='Schema version to migrate to.')
+def upgrade_command(target):
+    """Apply pending migrations and create indexes."""
+    applied = upgrade(get_db(), target)
+    if applied is None:
+        raise click.ClickException("Another process is running migrations. Try again shortly.")
+    if applied:
+        click.echo(f"Applied migrations: {', '.join(str(v) for v in applied)}")
+    else:
+        click.echo("Schema is up to date.")
+
+
+@db_cli.command('status')
+def status_command():
+    """Show the applied and expected schema versions."""
+    version = current_version(get_db())
+    click.echo(f"Applied schema version: {version}")
+    click.echo(f"Latest schema version: {SCHEMA_VERSION}")
+    for number, description, _ in MIGRATIONS:
+        state = "applied" if number <= version else "pending"
+        click.echo(f"  {number}: {description} [{state}]")
@@ -0,0 +1,145 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeoutError
+from flask import current_app
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, generate_password_hash, check_password_hash
+from .utils.throttle import AttemptLimiter
+
+# --- Password hashing off the request thread ---
+# Password hashes are deliberately slow KDFs (scrypt by default). Running
+# them inline blocks a worker for the whole computation, so they run on a
+# small process pool instead. At most PASSWORD_HASH_MAX_PENDING hashes may be
+# queued or running per worker process; beyond that callers get
+# HashingBusyError and should answer 503 rather than pile up.
+
+DEFAULT_HASH_METHOD = 'scrypt:32768:8:1'
+
+
+class HashingBusyError(Exception):
+    """Too many password hashes are already queued in this worker."""
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+_slots = None
+_pending = 0
+_pending_lock = threading.Lock()
+
+# Failed logins are counted per email and per client IP; over the limit a
+# login is rejected before any database lookup or hashing.
+_email_failures = AttemptLimiter(limit=10, window=900, name='login_email')
+_ip_failures = AttemptLimiter(limit=100, window=900, name='login_ip')
+
+
+def init_app(app):
+    global _slots
+    _slots = threading.BoundedSemaphore(app.config.get('PASSWORD_HASH_MAX_PENDING', 32))
+    _email_failures.limit = app.config.get('LOGIN_MAX_FAILURES_PER_EMAIL', _email_failures.limit)
+    _ip_failures.limit = app.config.get('LOGIN_MAX_FAILURES_PER_IP', _ip_failures.limit)
+    _email_failures.window = _ip_failures.window = app.config.get('LOGIN_THROTTLE_WINDOW', 900)
+    _email_failures.clear()
+    _ip_failures.clear()
+
+
+def _get_pool(workers):
+    global _pool, _pool_pid
+    with _pool_lock:
+        # A pool inherited through fork belongs to the parent process.
+        if _pool is None or _pool_pid != os.getpid():
+            # Spawned workers do not inherit the server's threads or sockets.
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def _track(delta):
+    global _pending
+    with _pending_lock:
+        _pending += delta
+
+
+def _release():
+    _track(-1)
+    _slots.release()
+
+
+def _run(func, *args):
+    workers = current_app.config.get('PASSWORD_HASH_WORKERS', 2)
+    if not workers:
+        return func(*args)
+    if not _slots.acquire(blocking=False):
+        raise HashingBusyError()
+    _track(1)
+    try:
+        future = _get_pool(workers).submit(func, *args)
+    except Exception:
+        _release()
+        raise
+    future.add_done_callback(lambda _: _release())
+    try:
+        return future.result(timeout=current_app.config.get('PASSWORD_HASH_TIMEOUT', 30))
+    except FuturesTimeoutError:
+        raise HashingBusyError()
+
+
+def hash_method():
+    return current_app.config.get('PASSWORD_HASH_METHOD') or DEFAULT_HASH_METHOD
+
+
+def hash_password(password):
+    """Hashes password with the configured method. Raises HashingBusyError."""
+    return _run(generate_password_hash, password, hash_method())
+
+
+def verify_password(password_hash, password):
+    """Checks password against a stored hash. Raises HashingBusyError."""
+    return _run(check_password_hash, password_hash, password)
+
+
+def _canonical_method(method):
+    # "scrypt" and "scrypt:32768:8:1" produce the same hashes; compare the
+    # fully expanded prefix Werkzeug writes into the hash.
+    name, *params = method.split(':')
+    if name == 'scrypt':
+        defaults = ['32768', '8', '1']
+    elif name == 'pbkdf2':
+        defaults = ['sha256', str(DEFAULT_PBKDF2_ITERATIONS)]
+    else:
+        return method
+    return ':'.join([name] + params + defaults[len(params):])
+
+
+def needs_rehash(password_hash):
+    """True if the stored hash was made with different parameters than configured."""
+    return password_hash.split('$', 1)[0] != _canonical_method(hash_method())
+
+
+# --- Login throttling ---
+
+def login_retry_after(email, ip):
+    """Seconds the client must wait before trying to log in again, or 0."""
+    return max(_email_failures.retry_after(email.casefold()), _ip_failures.retry_after(ip))
+
+
+def record_login_failure(email, ip):
+    _email_failures.hit(email.casefold())
+    _ip_failures.hit(ip)
+
+
+def record_login_success(email):
+    _email_failures.reset(email.casefold())
+
+
+def pending():
+    """Hashes queued or running in this worker."""
+    return _pending
+
+
+def stats():
+    return {
+        "pending": pending(),
+        "email_throttle": _email_failures.stats(),
+        "ip_throttle": _ip_failures.stats(),
+    }
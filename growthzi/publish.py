@@ -0,0 +1,277 @@
+import gzip
+import hashlib
+import itertools
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import click
+from bson import ObjectId
+from flask import current_app, render_template, url_for
+from flask.cli import AppGroup
+from .db import get_db
+
+try:
+    import brotli
+except ImportError:  # Optional: without it only gzip variants are written.
+    brotli = None
+
+logger = logging.getLogger('growthzi.publish')
+
+# --- Static publishing ---
+# A published site is a plain directory that any static server can serve
+# without reaching the Python workers:
+#
+#   PUBLISH_DIR/assets/main.<hash>.css (+ .gz, .br)
+#   PUBLISH_DIR/assets/main.<hash>.js  (+ .gz, .br)
+#   PUBLISH_DIR/sites/<website_id>/index.html (+ .gz, .br)
+#
+# Asset names carry a content hash, so they can be cached forever. Pages are
+# republished in a background thread whenever a website is saved, and the
+# whole collection can be rebuilt with `flask --app run.py publish all`.
+#
+# Publishing on save shares the web worker's CPU, so its brotli quality
+# (PUBLISH_BROTLI_QUALITY) is kept low; the CLI commands compress with
+# PUBLISH_CLI_BROTLI_QUALITY instead.
+
+TEMPLATE_NAME = 'index.html'
+ASSETS = ('assets/css/main.css', 'assets/js/main.js')
+SITES_DIR = 'sites'
+ASSETS_DIR = 'assets'
+
+# (output_dir, asset mtimes) -> {logical path: published path}
+_manifests = {}
+_manifest_lock = threading.Lock()
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def asset_url(filename):
+    """Template helper for static assets. Published pages override it."""
+    return url_for('static', filename=filename)
+
+
+def init_app(app):
+    """Registers asset_url for templates and the `flask publish` commands."""
+    app.jinja_env.globals['asset_url'] = asset_url
+    app.cli.add_command(publish_cli)
+
+
+def output_dir(app=None):
+    app = app or current_app
+    return app.config.get('PUBLISH_DIR')
+
+
+def _write_atomic(path, data):
+    """Readers never see a half-written file: write a temp file, then rename."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def _write_variants(path, data, config, brotli_quality=None):
+    """Writes the file with precompressed .gz and (if available) .br siblings."""
+    _write_atomic(path, data)
+    _write_atomic(path + '.gz', gzip.compress(data, compresslevel=config.get('PUBLISH_GZIP_LEVEL', 9), mtime=0))
+    if brotli is not None:
+        if brotli_quality is None:
+            brotli_quality = config.get('PUBLISH_BROTLI_QUALITY', 5)
+        _write_atomic(path + '.br', brotli.compress(data, quality=brotli_quality))
+
+
+def publish_assets(directory, brotli_quality=None):
+    """
+    Copies the site assets to directory under fingerprinted names and returns
+    {logical path: published path}. Assets are only rewritten when their
+    content changes, which gives them a new name.
+    """
+    static_folder = current_app.static_folder
+    sources = [os.path.join(static_folder, name) for name in ASSETS]
+    key = (directory, tuple(os.stat(source).st_mtime_ns for source in sources))
+    with _manifest_lock:
+        manifest = _manifests.get(key)
+    if manifest is not None:
+        return manifest
+
+    manifest = {}
+    for name, source in zip(ASSETS, sources):
+        with open(source, 'rb') as f:
+            data = f.read()
+        stem, ext = os.path.splitext(os.path.basename(name))
+        digest = hashlib.sha256(data).hexdigest()[:12]
+        published = f"{ASSETS_DIR}/{stem}.{digest}{ext}"
+        target = os.path.join(directory, published)
+        if not os.path.exists(target):
+            _write_variants(target, data, current_app.config, brotli_quality)
+        manifest[name] = published
+    with _manifest_lock:
+        _manifests[key] = manifest
+    return manifest
+
+
+def _site_path(directory, website_id):
+    return os.path.join(directory, SITES_DIR, str(website_id), 'index.html')
+
+
+def render_page(website, manifest):
+    """Renders a website with links to the fingerprinted assets."""
+    # Pages live at sites/<id>/index.html, two levels below the assets.
+    return render_template(
+        TEMPLATE_NAME, website=website,
+        asset_url=lambda filename: '../../' + manifest.get(filename, filename)
+    ).encode('utf-8')
+
+
+def publish_website(website, directory=None, brotli_quality=None):
+    """Renders one website document into the publish directory. Returns the page path."""
+    directory = directory or output_dir()
+    manifest = publish_assets(directory, brotli_quality)
+    path = _site_path(directory, website['_id'])
+    _write_variants(path, render_page(website, manifest), current_app.config, brotli_quality)
+    return path
+
+
+def unpublish_website(website_id, directory=None):
+    directory = directory or output_dir()
+    shutil.rmtree(os.path.dirname(_site_path(directory, website_id)), ignore_errors=True)
+
+
+def publish_ids(website_ids, directory=None, brotli_quality=None):
+    """Publishes the given websites and removes pages of ids that no longer exist."""
+    directory = directory or output_dir()
+    remaining = {ObjectId(website_id) for website_id in website_ids}
+    published = 0
+    for website in get_db().websites.find({"_id": {"$in": list(remaining)}}):
+        publish_website(website, directory, brotli_quality)
+        remaining.discard(website['_id'])
+        published += 1
+    for website_id in remaining:
+        unpublish_website(website_id, directory)
+    return published
+
+
+# --- Publishing on save ---
+
+def _get_executor():
+    global _executor, _executor_pid
+    with _executor_lock:
+        # Threads do not survive a fork; start a fresh executor per process.
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='growthzi-publish')
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def _publish_in_background(app, website_ids):
+    with app.app_context():
+        try:
+            publish_ids(website_ids)
+        except Exception as e:
+            logger.error("publishing failed", extra={"website_ids": [str(i) for i in website_ids], "error": str(e)})
+
+
+def schedule(*website_ids):
+    """
+    Republishes websites after they were created, changed or deleted. Does
+    nothing unless PUBLISH_DIR is set. Rendering and compression run in a
+    background thread so the request is not delayed.
+    """
+    app = current_app._get_current_object()
+    if not website_ids or not output_dir(app) or not app.config.get('PUBLISH_ON_SAVE', True):
+        return
+    _get_executor().submit(_publish_in_background, app, list(website_ids))
+
+
+# --- Bulk publishing (CLI) ---
+
+_worker_app = None
+
+
+def _init_worker():
+    # Each process builds its own app and MongoClient.
+    global _worker_app
+    from . import create_app
+    _worker_app = create_app()
+
+
+def _publish_batch(website_ids, directory, brotli_quality):
+    with _worker_app.app_context():
+        return publish_ids(website_ids, directory, brotli_quality)
+
+
+def _batches(cursor, size):
+    batch = []
+    for doc in cursor:
+        batch.append(doc['_id'])
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# AppGroup runs each command inside an application context.
+publish_cli = AppGroup('publish', help='Static site publishing commands.')
+
+
+@publish_cli.command('all')
+@click.option('--output', 'directory', default=None, help='Publish directory (defaults to PUBLISH_DIR).')
+@click.option('--workers', type=int, default=None, help='Worker processes (defaults to PUBLISH_WORKERS).')
+@click.option('--batch-size', type=int, default=200, show_default=True, help='Websites per task.')
+def publish_all_command(directory, workers, batch_size):
+    """Render every website to static files using a process pool."""
+    directory = directory or output_dir()
+    if not directory:
+        raise click.ClickException("Set PUBLISH_DIR or pass --output.")
+    directory = os.path.abspath(directory)
+    workers = workers or current_app.config.get('PUBLISH_WORKERS') or os.cpu_count() or 1
+    quality = current_app.config.get('PUBLISH_CLI_BROTLI_QUALITY', 11)
+
+    # Write the assets once up front so workers only render pages.
+    publish_assets(directory, quality)
+    ids = get_db().websites.find({}, {"_id": 1}).sort("_id", 1).batch_size(1000)
+
+    total = 0
+    # Spawned, not forked: this process already holds a MongoClient (with its
+    # monitor threads) and an open cursor, neither of which survives a fork.
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker) as pool:
+        batches = _batches(ids, batch_size)
+        for count in pool.map(_publish_batch, batches, itertools.repeat(directory), itertools.repeat(quality)):
+            total += count
+    click.echo(f"Published {total} websites to {directory} with {workers} workers.")
+    if brotli is None:
+        click.echo("brotli is not installed; only gzip variants were written.")
+
+
+@publish_cli.command('site')
+@click.argument('website_id')
+@click.option('--output', 'directory', default=None, help='Publish directory (defaults to PUBLISH_DIR).')
+def publish_site_command(website_id, directory):
+    """Render one website to static files."""
+    directory = directory or output_dir()
+    if not directory:
+        raise click.ClickException("Set PUBLISH_DIR or pass --output.")
+    try:
+        oid = ObjectId(website_id)
+    except Exception:
+        raise click.ClickException("Invalid website id.")
+    website = get_db().websites.find_one({"_id": oid})
+    if not website:
+        raise click.ClickException("Website not found.")
+    quality = current_app.config.get('PUBLISH_CLI_BROTLI_QUALITY', 11)
+    click.echo(publish_website(website, os.path.abspath(directory), quality))
@@ -0,0 +1,221 @@
+import datetime
+from bson import ObjectId
+from flask import current_app
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from .db import get_db
+from .utils.cache import TTLCache
+from . import invalidation
+from . import metrics
+
+# --- Daily AI generation quotas ---
+# Each user may start GENERATION_DAILY_QUOTA generations per UTC day, unless
+# their role is exempt or an admin set a per-user limit (generation_quotas
+# collection, see routes/admin.py). Usage is one counter document per user
+# and day in generation_usage, taken with a conditional $inc upsert, so
+# concurrent requests on any number of workers can never exceed the limit.
+# Counters expire through a TTL index.
+#
+# Every worker remembers each user's limit and the last count it saw. A user
+# who has used up the quota is therefore refused without a query; only
+# requests that may succeed reach MongoDB. Admin changes evict these entries
+# in every process through the invalidation watcher; a refund made by another
+# worker is seen once the entry expires (GENERATION_QUOTA_CACHE_TTL).
+
+_MISSING = object()
+
+_limits = TTLCache(maxsize=10000, ttl=60, name='quota_limits')  # user id -> per-user limit or None
+_usage = TTLCache(maxsize=10000, ttl=60, name='quota_usage')  # user id -> (day, count)
+
+# Counters are kept a little past their day for the admin view.
+USAGE_RETENTION = datetime.timedelta(days=2)
+
+
+class QuotaExceeded(Exception):
+    """The user's daily generation quota does not cover the request."""
+
+    def __init__(self, limit, used, retry_after):
+        super().__init__("Daily generation quota exceeded")
+        self.limit = limit
+        self.used = used
+        self.retry_after = retry_after
+
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def today():
+    return _now().strftime('%Y-%m-%d')
+
+
+def seconds_until_reset():
+    now = _now()
+    midnight = (now + datetime.timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return max(1, int((midnight - now).total_seconds() + 0.999))
+
+
+def _usage_id(user_id, day):
+    return f"{user_id}:{day}"
+
+
+def exempt_roles():
+    names = current_app.config.get('GENERATION_QUOTA_EXEMPT_ROLES', '')
+    return {name.strip() for name in names.split(',') if name.strip()}
+
+
+def user_limit(user_id):
+    """The per-user limit set by an admin, or None to use the default."""
+    key = str(user_id)
+    cached = _limits.get(key, _MISSING)
+    if cached is not _MISSING:
+        return cached
+    doc = get_db().generation_quotas.find_one({"_id": ObjectId(user_id)}, {"daily_limit": 1})
+    limit = doc.get('daily_limit') if doc else None
+    _limits.set(key, limit)
+    return limit
+
+
+def limit_for(user, role):
+    """The user's daily limit, or None when generations are not limited."""
+    config = current_app.config
+    if not config.get('GENERATION_QUOTA_ENABLED', True):
+        return None
+    override = user_limit(user['_id'])
+    if override is not None:
+        return override
+    if role is not None and role['name'] in exempt_roles():
+        return None
+    return config.get('GENERATION_DAILY_QUOTA', 50)
+
+
+def consume(user, role, amount=1):
+    """
+    Counts `amount` generations against the user's quota for today.
+    Returns the day charged (pass it to refund()), or None if the user has
+    no limit. Raises QuotaExceeded when the quota does not cover `amount`.
+    """
+    limit = limit_for(user, role)
+    if limit is None:
+        return None
+    user_id = str(user['_id'])
+    day = today()
+
+    known = _usage.get(user_id)
+    used = known[1] if known is not None and known[0] == day else 0
+    if used + amount > limit:
+        metrics.record_quota_rejection('cache')
+        raise QuotaExceeded(limit, used, seconds_until_reset())
+
+    usage = get_db().generation_usage
+    for _ in range(2):
+        try:
+            # Matches only while the quota covers the request; otherwise the
+            # upsert collides with today's document and raises DuplicateKeyError.
+            doc = usage.find_one_and_update(
+                {"_id": _usage_id(user_id, day), "count": {"$lte": limit - amount}},
+                {
+                    "$inc": {"count": amount},
+                    "$setOnInsert": {
+                        "user_id": user['_id'],
+                        "day": day,
+                        "expires_at": _now() + USAGE_RETENTION,
+                    },
+                },
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            used = _count(user_id, day)
+            _usage.set(user_id, (day, used))
+            if used + amount > limit:
+                metrics.record_quota_rejection('database')
+                raise QuotaExceeded(limit, used, seconds_until_reset())
+            # Another request created today's document at the same time; try again.
+            continue
+        _usage.set(user_id, (day, doc['count']))
+        return day
+    raise QuotaExceeded(limit, used, seconds_until_reset())
+
+
+def refund(user_id, day, amount=1):
+    """Returns generations that did not produce a website to the quota of `day`."""
+    if day is None or amount <= 0:
+        return
+    user_id = str(user_id)
+    doc = get_db().generation_usage.find_one_and_update(
+        {"_id": _usage_id(user_id, day), "count": {"$gte": amount}},
+        {"$inc": {"count": -amount}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if doc is not None and day == today():
+        _usage.set(user_id, (day, doc['count']))
+
+
+def _count(user_id, day):
+    doc = get_db().generation_usage.find_one({"_id": _usage_id(user_id, day)}, {"count": 1})
+    return doc['count'] if doc else 0
+
+
+def status(user, role):
+    """The user's quota and today's usage, as returned by the admin API."""
+    user_id = str(user['_id'])
+    day = today()
+    limit = limit_for(user, role)
+    used = _count(user_id, day)
+    return {
+        "user_id": user_id,
+        "day": day,
+        "daily_limit": limit,
+        "override": user_limit(user_id),
+        "used": used,
+        "remaining": None if limit is None else max(0, limit - used),
+        "resets_in": seconds_until_reset(),
+    }
+
+
+def set_limit(user_id, daily_limit, reset_usage=False, updated_by=None):
+    """
+    Replaces the user's own daily limit (None falls back to the default)
+    and optionally clears today's usage. Other workers pick the change up through the
+    invalidation watcher.
+    """
+    db = get_db()
+    if reset_usage:
+        db.generation_usage.delete_one({"_id": _usage_id(user_id, today())})
+    # The document is also written when only usage was reset, so that its
+    # updated_at evicts cached counts in other processes.
+    db.generation_quotas.update_one(
+        {"_id": ObjectId(user_id)},
+        {"$set": {"daily_limit": daily_limit, "updated_at": _now(), "updated_by": updated_by}},
+        upsert=True,
+    )
+    invalidate_user(user_id)
+
+
+def usage_today(limit=100):
+    """Today's heaviest users: [{"user_id", "used"}], most used first."""
+    cursor = get_db().generation_usage.find({"day": today()}, {"user_id": 1, "count": 1}).sort("count", -1).limit(limit)
+    return [{"user_id": str(doc['user_id']), "used": doc['count']} for doc in cursor]
+
+
+def invalidate_user(user_id):
+    _limits.pop(str(user_id), None)
+    _usage.pop(str(user_id), None)
+
+
+def _clear():
+    _limits.clear()
+    _usage.clear()
+
+
+def cache_stats():
+    return {"limits": _limits.stats(), "usage": _usage.stats()}
+
+
+def init_app(app):
+    ttl = app.config.get('GENERATION_QUOTA_CACHE_TTL', 60)
+    _limits.ttl = ttl
+    _usage.ttl = ttl
+    _clear()
+    invalidation.register('generation_quotas', invalidate_user, _clear)
@@ -0,0 +1,165 @@
+import threading
+from flask import current_app, g, jsonify, request
+from .utils.throttle import TokenBucketLimiter
+
+# --- Request rate limiting ---
+# Routes opt in with @rate_limit(group) (see utils.decorators), placed under
+# @permission_required. Each group is configured as RATE_LIMIT_<GROUP>, e.g.
+# "user=10/60,role=100/60,ip=30/60": a token bucket of 10 requests refilled
+# over 60 seconds for each user, one of 100 shared by everyone with the same
+# role, and one of 30 per client IP. A request is admitted only when every
+# bucket has a token, and then takes one from each. Responses carry the
+# RateLimit-* headers of the bucket closest to running out; refused requests
+# get 429 with Retry-After.
+#
+# Buckets are per worker process: with N workers a client can reach up to N
+# times the configured rate. Daily generation quotas (growthzi.quotas) are
+# shared through MongoDB instead.
+
+SCOPE_USER = 'user'
+SCOPE_ROLE = 'role'
+SCOPE_IP = 'ip'
+SCOPES = (SCOPE_USER, SCOPE_ROLE, SCOPE_IP)
+
+# Settings that share the RATE_LIMIT_ prefix but are not groups.
+_SETTINGS = ('RATE_LIMIT_ENABLED', 'RATE_LIMIT_EXEMPT_ROLES', 'RATE_LIMIT_MAX_KEYS')
+
+_limiters = {}  # group -> {scope: TokenBucketLimiter}
+_limiters_lock = threading.Lock()
+
+
+class RateLimitConfigError(ValueError):
+    """A RATE_LIMIT_<GROUP> setting cannot be parsed."""
+
+
+def parse_spec(text):
+    """Parses "user=10/60,ip=30/60" into {scope: (capacity, period)}."""
+    limits = {}
+    for part in (text or '').split(','):
+        if not part.strip():
+            continue
+        scope, _, rate = part.partition('=')
+        scope = scope.strip()
+        capacity, _, period = rate.partition('/')
+        try:
+            capacity, period = int(capacity), float(period or 1)
+        except ValueError:
+            raise RateLimitConfigError(f"Invalid rate limit '{part.strip()}', expected <scope>=<requests>/<seconds>")
+        if scope not in SCOPES or capacity < 1 or period <= 0:
+            raise RateLimitConfigError(f"Invalid rate limit '{part.strip()}'")
+        limits[scope] = (capacity, period)
+    return limits
+
+
+def _group_limiters(app, group):
+    limiters = _limiters.get(group)
+    if limiters is None:
+        with _limiters_lock:
+            limiters = _limiters.get(group)
+            if limiters is None:
+                spec = parse_spec(app.config.get(f'RATE_LIMIT_{group.upper()}'))
+                maxsize = app.config.get('RATE_LIMIT_MAX_KEYS', 100000)
+                limiters = {
+                    scope: TokenBucketLimiter(capacity, period, maxsize=maxsize, name=f'{group}_{scope}')
+                    for scope, (capacity, period) in spec.items()
+                }
+                _limiters[group] = limiters
+    return limiters
+
+
+def _keys():
+    """The bucket key for each scope for the current request."""
+    keys = {SCOPE_IP: request.remote_addr or ''}
+    user = g.get('current_user')
+    if user is not None:
+        keys[SCOPE_USER] = str(user['_id'])
+    role = g.get('current_user_role')
+    if role is not None:
+        keys[SCOPE_ROLE] = role['name']
+    return keys
+
+
+def _exempt():
+    role = g.get('current_user_role')
+    exempt = current_app.config.get('RATE_LIMIT_EXEMPT_ROLES', '')
+    return role is not None and role['name'] in {name.strip() for name in exempt.split(',') if name.strip()}
+
+
+def _headers(limiter, remaining, reset):
+    return {
+        'RateLimit-Limit': str(limiter.capacity),
+        'RateLimit-Remaining': str(remaining),
+        'RateLimit-Reset': str(reset),
+        'RateLimit-Policy': f"{limiter.capacity};w={int(limiter.period)}",
+    }
+
+
+def check(group, cost=1):
+    """
+    Applies the group's limits to the current request, which counts as
+    `cost` requests. Returns None when it may proceed (its headers are added
+    to the response later), or the 429 response to send instead.
+    """
+    app = current_app
+    if not app.config.get('RATE_LIMIT_ENABLED', True) or _exempt():
+        return None
+    keys = _keys()
+    buckets = [(limiter, keys[scope]) for scope, limiter in _group_limiters(app, group).items() if scope in keys]
+    if not buckets:
+        return None
+
+    # Each take() checks and takes under the bucket's lock. If a bucket
+    # refuses, the tokens already taken from the others are put back, so a
+    # request refused by one scope does not use up the others.
+    taken = []
+    for limiter, key in buckets:
+        if cost > limiter.capacity:
+            # Waiting would not help: the bucket never holds this many tokens.
+            for earlier, earlier_key, _, _ in taken:
+                earlier.put_back(earlier_key, cost)
+            limiter.rejected += 1
+            response = jsonify({
+                "error": f"This request counts as {cost} requests, more than the limit of {limiter.capacity}."
+            })
+            response.headers.update(_headers(limiter, 0, 0))
+            return response, 429
+        allowed, remaining, reset = limiter.take(key, cost)
+        if not allowed:
+            for earlier, earlier_key, _, _ in taken:
+                earlier.put_back(earlier_key, cost)
+            # When refused, reset is the wait until the bucket has enough tokens.
+            response = jsonify({"error": "Rate limit exceeded. Please retry later."})
+            response.headers.update(_headers(limiter, 0, reset))
+            response.headers['Retry-After'] = str(reset)
+            return response, 429
+        taken.append((limiter, key, remaining, reset))
+
+    limiter, _, remaining, reset = min(taken, key=lambda item: item[2])
+    g.rate_limit_headers = _headers(limiter, remaining, reset)
+    return None
+
+
+def _add_headers(response):
+    headers = g.pop('rate_limit_headers', None)
+    if headers:
+        for name, value in headers.items():
+            response.headers.setdefault(name, value)
+    return response
+
+
+def stats():
+    return {
+        group: {scope: limiter.stats() for scope, limiter in limiters.items()}
+        for group, limiters in list(_limiters.items())
+    }
+
+
+def init_app(app):
+    """Rebuilds the buckets from the app config and adds the RateLimit-* response headers."""
+    with _limiters_lock:
+        _limiters.clear()
+    # Fail at startup on a malformed setting rather than on the first request.
+    for name in app.config:
+        if name.startswith('RATE_LIMIT_') and name not in _SETTINGS:
+            parse_spec(app.config[name])
+    app.after_request(_add_headers)
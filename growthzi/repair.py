@@ -0,0 +1,223 @@
+import re
+from . import metrics
+
+# --- Post-processing of generated content ---
+# Model output is not always the bare JSON object the prompt asks for: it
+# may be wrapped in a markdown fence or prose, nested under an extra key,
+# carry trailing commas or camelCase keys, or be cut off part way. Rather
+# than failing the generation (and paying for a new one when the user
+# retries), the output is extracted and repaired here, section by section,
+# against SCHEMA. Sections that cannot be repaired are reported as missing
+# so the caller can ask the model for just those (see ai.complete_content).
+
+SERVICE_COUNT = 3
+
+# Mirrors the structure requested by ai.build_prompt().
+SCHEMA = {
+    "title": str,
+    "hero": {"headline": str, "subheading": str, "cta_button_text": str},
+    "about": {"title": str, "text": str},
+    "services": [{"name": str, "description": str}],
+}
+SECTIONS = tuple(SCHEMA)
+
+# Fields with a sensible fixed value; filled in rather than re-prompted.
+DEFAULTS = {
+    ("hero", "cta_button_text"): "Learn More",
+    ("about", "title"): "About Us",
+}
+
+_FENCE = re.compile(r"```[a-zA-Z]*\s*(.*?)(?:```|$)", re.DOTALL)
+_CAMEL = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+
+
+class Result:
+    """
+    Usable sections of generated content, the sections still missing and
+    the repairs applied to get there.
+    """
+
+    def __init__(self, content=None):
+        self.content = dict(content or {})
+        self.missing = []
+        self.repairs = []
+
+    def services_needed(self):
+        return SERVICE_COUNT - len(self.content.get("services", []))
+
+    def _repaired(self, kind):
+        self.repairs.append(kind)
+        metrics.record_ai_repair(kind)
+
+
+def process(text, existing=None):
+    """
+    Extracts and repairs content from model output. Sections already in
+    `existing` (from an earlier response) are kept; services are appended.
+    """
+    from .ai import SectionParser
+    result = Result(existing)
+    document = _extract(text, result, SectionParser)
+    if isinstance(document, dict):
+        document = _unwrap(_normalize_keys(document, result), result)
+        for name in SECTIONS:
+            if name in document:
+                _merge_section(name, document[name], result)
+    result.missing = [name for name in SECTIONS if not _complete(name, result.content)]
+    return result
+
+
+# --- Extraction ---
+
+def _extract(text, result, parser_class):
+    if not isinstance(text, str):
+        return None
+    fenced = _FENCE.search(text)
+    if fenced:
+        text = fenced.group(1)
+        result._repaired("fence")
+
+    parser = parser_class()
+    events = parser.feed(text)
+    document = parser.document()
+    if isinstance(document, dict):
+        if text.strip() != parser.document_text():
+            result._repaired("surrounding_text")
+        return document
+
+    object_text = parser.document_text()
+    if object_text is not None:
+        retry = parser_class()
+        retry.feed(_strip_trailing_commas(object_text))
+        document = retry.document()
+        if isinstance(document, dict):
+            result._repaired("trailing_comma")
+            return document
+
+    # Truncated or otherwise broken: keep every member that was complete.
+    partial = {}
+    for section, value in events:
+        if isinstance(section, tuple):
+            partial.setdefault(section[0], []).append(value)
+        else:
+            partial[section] = value
+    if partial:
+        result._repaired("partial")
+        return partial
+    return None
+
+
+def _strip_trailing_commas(text):
+    """Removes commas directly before a closing bracket, outside strings."""
+    output = []
+    in_string = escaped = False
+    pending_comma = None
+    for char in text:
+        if in_string:
+            output.append(char)
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+        if pending_comma is not None:
+            if char.isspace():
+                pending_comma.append(char)
+                continue
+            if char not in '}]':
+                output.append(',')
+            output.extend(pending_comma)
+            pending_comma = None
+        if char == ',':
+            pending_comma = []
+            continue
+        if char == '"':
+            in_string = True
+        output.append(char)
+    return ''.join(output)
+
+
+# --- Repair ---
+
+def _normalize_key(key):
+    return _CAMEL.sub('_', str(key)).strip().lower().replace(' ', '_').replace('-', '_')
+
+
+def _normalize_keys(document, result):
+    normalized = {}
+    for key, value in document.items():
+        name = _normalize_key(key)
+        if name != key:
+            result._repaired("key_names")
+        normalized[name] = _normalize_keys(value, result) if isinstance(value, dict) else value
+    return normalized
+
+
+def _unwrap(document, result):
+    # e.g. {"website": {"title": ..., "hero": ...}}
+    if not any(name in document for name in SECTIONS) and len(document) == 1:
+        inner = next(iter(document.values()))
+        if isinstance(inner, dict) and any(name in inner for name in SECTIONS):
+            result._repaired("wrapper")
+            return inner
+    return document
+
+
+def _string(value, result):
+    if isinstance(value, str):
+        return value.strip() or None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        result._repaired("coerced")
+        return str(value)
+    return None
+
+
+def _object(section, value, spec, result):
+    """A repaired copy of value with exactly spec's fields, or None."""
+    if not isinstance(value, dict):
+        return None
+    # Also match fields spelled without underscores ("subheading" / "sub_heading").
+    loose = {key.replace('_', ''): item for key, item in value.items()}
+    repaired = {}
+    for field in spec:
+        text = _string(value[field] if field in value else loose.get(field.replace('_', '')), result)
+        if text is None and (section, field) in DEFAULTS:
+            text = DEFAULTS[(section, field)]
+            result._repaired("default")
+        if text is None:
+            return None
+        repaired[field] = text
+    return repaired
+
+
+def _merge_section(name, value, result):
+    spec = SCHEMA[name]
+    if name == "services":
+        if isinstance(value, dict):
+            value = [value]
+            result._repaired("coerced")
+        if not isinstance(value, list):
+            return
+        services = list(result.content.get("services", []))
+        for item in value:
+            service = _object(name, item, spec[0], result)
+            if service is None:
+                result._repaired("dropped_service")
+            elif len(services) < SERVICE_COUNT:
+                services.append(service)
+            else:
+                result._repaired("extra_service")
+        result.content["services"] = services
+    elif name not in result.content:
+        repaired = _string(value, result) if spec is str else _object(name, value, spec, result)
+        if repaired is not None:
+            result.content[name] = repaired
+
+
+def _complete(name, content):
+    if name == "services":
+        return len(content.get("services", [])) == SERVICE_COUNT
+    return name in content
+
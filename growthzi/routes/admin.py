@@ -1,7 +1,19 @@
-from flask import Blueprint, request, jsonify
+import datetime
+from flask import Blueprint, request, jsonify, current_app, g
 from bson import ObjectId
-from ..db import get_db
+from ..db import get_db, get_pool_stats
 from ..utils.decorators import permission_required
+from ..utils.pagination import (
+    PaginationError, DEFAULT_PAGE_SIZE, parse_limit, parse_datetime, decode_cursor,
+    keyset_filter, sort_spec, combine_filters, stream_json_array, stream_json_page,
+)
+from ..utils import principals
+from .. import ai_cache
+from .. import invalidation
+from .. import quotas
+from .. import ratelimit
+from .. import serialization
+from . import preview
 
 admin_bp = Blueprint('admin_bp', __name__)
 
@@ -13,12 +25,7 @@ admin_bp = Blueprint('admin_bp', __name__)
 def get_roles():
     """Returns a list of all roles."""
     db = get_db()
-    roles_cursor = db.roles.find({})
-    roles_list = []
-    for role in roles_cursor:
-        role['_id'] = str(role['_id'])
-        roles_list.append(role)
-    return jsonify(roles_list), 200
+    return jsonify(list(db.roles.find({}))), 200
 
 # ... (create_role function is unchanged)
 
@@ -31,10 +38,49 @@ def get_users():
     """
     Returns a list of all users, including their role name.
     This is an admin-only endpoint.
+    Query parameters (all optional):
+    - limit / cursor: Keyset pagination, newest first. The response becomes
+      {"items": [...], "next_cursor": ...}.
+    - role: Only users with this role name.
+    - created_after / created_before: ISO 8601 bounds on created_at.
     """
     db = get_db()
-    # Use an aggregation pipeline to join users with roles collection
+    args = request.args
+
+    try:
+        limit = parse_limit(args.get('limit'))
+        cursor_key = decode_cursor(args.get('cursor'))
+        if cursor_key is not None and limit is None:
+            limit = current_app.config.get('PAGINATION_DEFAULT_LIMIT', DEFAULT_PAGE_SIZE)
+
+        filters = {}
+        role_name = args.get('role')
+        if role_name:
+            role = db.roles.find_one({"name": role_name}, {"_id": 1})
+            if not role:
+                return jsonify({"error": f"Role '{role_name}' not found"}), 404
+            filters["role_id"] = role['_id']
+        created_range = {}
+        created_after = parse_datetime(args.get('created_after'), 'created_after')
+        created_before = parse_datetime(args.get('created_before'), 'created_before')
+        if created_after:
+            created_range["$gte"] = created_after
+        if created_before:
+            created_range["$lt"] = created_before
+        if created_range:
+            filters["created_at"] = created_range
+    except PaginationError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Filter, order and cut the page before joining, so $lookup only runs
+    # for the users that are actually returned.
     users_pipeline = [
+        {"$match": combine_filters(filters, keyset_filter(cursor_key))},
+        {"$sort": dict(sort_spec())},
+    ]
+    if limit is not None:
+        users_pipeline.append({"$limit": limit})
+    users_pipeline += [
         {
             "$lookup": {
                 "from": "roles", # The collection to join with
@@ -60,15 +106,16 @@ def get_users():
     ]
     
     users_cursor = db.users.aggregate(users_pipeline)
-    users_list = []
-    for user in users_cursor:
-        user['_id'] = str(user['_id'])
-        # Ensure a user with a missing role doesn't break the frontend
-        if 'role' not in user:
-            user['role'] = 'N/A' 
-        users_list.append(user)
-        
-    return jsonify(users_list), 200
+    if limit is not None:
+        return stream_json_page(users_cursor, serialize_user, limit)
+    return stream_json_array(users_cursor, serialize_user)
+
+
+def serialize_user(user):
+    # Ensure a user with a missing role doesn't break the frontend
+    if 'role' not in user:
+        user['role'] = 'N/A'
+    return user
 # ----------------------------------------------------
 
 @admin_bp.route('/users/<user_id>/assign-role', methods=['PUT'])
@@ -95,10 +142,110 @@ def assign_role(user_id):
 
     result = db.users.update_one(
         {"_id": ObjectId(user_id)},
-        {"$set": {"role_id": role['_id']}}
+        {"$set": {"role_id": role['_id'], "updated_at": datetime.datetime.now(datetime.timezone.utc)}}
     )
+    # Drop the cached principal so the new role applies on the next request.
+    principals.invalidate_user(user_id)
 
     if result.modified_count == 0:
         return jsonify({"message": "User already has this role or user not found"}), 200
 
-    return jsonify({"message": f"User {user_id} assigned role '{role_name}'"}), 200
\ No newline at end of file
+    return jsonify({"message": f"User {user_id} assigned role '{role_name}'"}), 200
+
+# --- Generation quotas and rate limits ---
+
+def _quota_target(user_id):
+    """Returns (user, role) for a quota request, or raises ValueError/LookupError."""
+    db = get_db()
+    user = db.users.find_one({"_id": ObjectId(user_id)}, principals.USER_PROJECTION)
+    if not user:
+        raise LookupError("User not found")
+    return user, principals.get_role(db, user.get('role_id'))
+
+
+@admin_bp.route('/quotas', methods=['GET'])
+@permission_required('users:manage')
+def get_quotas():
+    """
+    Returns the quota defaults, today's heaviest generation users and this
+    worker's rate limit counters.
+    """
+    config = current_app.config
+    try:
+        limit = min(int(request.args.get('limit', 100)), 1000)
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    return jsonify({
+        "day": quotas.today(),
+        "enabled": config.get('GENERATION_QUOTA_ENABLED', True),
+        "default_daily_limit": config.get('GENERATION_DAILY_QUOTA', 50),
+        "exempt_roles": sorted(quotas.exempt_roles()),
+        "resets_in": quotas.seconds_until_reset(),
+        "usage": quotas.usage_today(limit),
+        "rate_limits": ratelimit.stats(),
+    }), 200
+
+
+@admin_bp.route('/users/<user_id>/quota', methods=['GET'])
+@permission_required('users:manage')
+def get_user_quota(user_id):
+    """Returns a user's daily generation limit and today's usage."""
+    try:
+        user, role = _quota_target(user_id)
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 404
+    except Exception:
+        return jsonify({"error": "Invalid user_id format"}), 400
+    return jsonify(quotas.status(user, role)), 200
+
+
+@admin_bp.route('/users/<user_id>/quota', methods=['PUT'])
+@permission_required('users:manage')
+def set_user_quota(user_id):
+    """
+    Adjusts a user's daily generation quota. Body (both optional):
+    - daily_limit: Generations per day for this user (0 blocks generation),
+      or null to fall back to the default for their role.
+    - reset_usage: true to clear today's usage.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not ('daily_limit' in data or 'reset_usage' in data):
+        return jsonify({"error": "daily_limit or reset_usage is required"}), 400
+    daily_limit = data.get('daily_limit')
+    if daily_limit is not None and (isinstance(daily_limit, bool) or not isinstance(daily_limit, int) or daily_limit < 0):
+        return jsonify({"error": "daily_limit must be a non-negative integer or null"}), 400
+
+    try:
+        user, role = _quota_target(user_id)
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 404
+    except Exception:
+        return jsonify({"error": "Invalid user_id format"}), 400
+
+    if 'daily_limit' not in data:
+        daily_limit = quotas.user_limit(user_id)
+    quotas.set_limit(user_id, daily_limit, reset_usage=bool(data.get('reset_usage')),
+                     updated_by=g.current_user['_id'])
+    return jsonify(quotas.status(user, role)), 200
+
+# --- Database connection pool stats ---
+@admin_bp.route('/db/pool-stats', methods=['GET'])
+@permission_required('users:manage')
+def db_pool_stats():
+    """Returns this worker's MongoDB connection pool counters."""
+    return jsonify(get_pool_stats()), 200
+
+
+# --- Cache statistics ---
+@admin_bp.route('/cache-stats', methods=['GET'])
+@permission_required('users:manage')
+def cache_stats():
+    """Returns hit/miss counters for this worker's caches."""
+    return jsonify({
+        "principals": principals.cache_stats(),
+        "preview": preview.cache_stats(),
+        "generations": ai_cache.stats(),
+        "json_fragments": serialization.cache_stats(),
+        "quotas": quotas.cache_stats(),
+        "invalidation": invalidation.stats(current_app),
+    }), 200
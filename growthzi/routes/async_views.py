@@ -0,0 +1,140 @@
+import asyncio
+from bson import ObjectId
+from flask import Response, g, jsonify, request
+from ..db import get_async_db
+from .. import ai
+from .. import ai_cache
+from .. import jobs
+from .. import publish
+from .. import quotas
+from ..utils.decorators import async_permission_required, rate_limit
+from . import preview
+from .websites import (
+    READ_POLICY, serialize_website, with_version_etag, new_website, quota_exceeded,
+    section_event, content_events, stream_done, stream_failed, event_stream,
+)
+
+# --- Coroutine views for the ASGI serving mode ---
+# growthzi.asgi serves these endpoints on the event loop instead of the
+# Flask views of the same name; everything else still goes to Flask. They
+# answer exactly like their sync counterparts, but MongoDB is reached through
+# the async driver and the model through the client's async API, so a slow
+# query or generation holds a coroutine rather than a thread.
+
+
+class StreamingResponse(Response):
+    """A response whose body is an async iterator of str or bytes chunks."""
+
+    def __init__(self, chunks, **kwargs):
+        super().__init__(**kwargs)
+        self.async_body = chunks
+
+
+async def render_website_preview(website_id):
+    """Async preview_bp.render_website_preview."""
+    db = get_async_db()
+
+    try:
+        meta = await db.websites.find_one({"_id": ObjectId(website_id)}, preview.META_PROJECTION)
+    except Exception:
+        return "Invalid Website ID format.", 400
+
+    if not meta:
+        preview.invalidate_preview(website_id)
+        return "Website not found.", 404
+
+    response = preview.cached_preview(website_id, meta)
+    if response is not None:
+        return response
+
+    website_data = await db.websites.find_one({"_id": ObjectId(website_id)})
+    if not website_data:
+        preview.invalidate_preview(website_id)
+        return "Website not found.", 404
+    return preview.render_preview(website_id, website_data)
+
+
+@async_permission_required('websites:read_all', 'websites:read_own')
+@rate_limit('read')
+async def get_website_by_id(website_id):
+    """Async websites_bp.get_website_by_id."""
+    try:
+        website = await get_async_db().websites.find_one({"_id": ObjectId(website_id)})
+        if not website:
+            return jsonify({"error": "Website not found"}), 404
+        return with_version_etag(jsonify(serialize_website(website)), website), 200
+    except Exception:
+        return jsonify({"error": "Invalid website_id format"}), 400
+
+
+@async_permission_required('websites:create', ownership=READ_POLICY)
+async def get_generation_job(job_id):
+    """Async websites_bp.get_generation_job."""
+    try:
+        job = await get_async_db().generation_jobs.find_one({"_id": ObjectId(job_id), **g.ownership_filter})
+    except Exception:
+        return jsonify({"error": "Invalid job_id format"}), 400
+
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    job = await asyncio.to_thread(jobs.expire_if_stale, job)
+    return jsonify(jobs.serialize_job(job)), 200
+
+
+@async_permission_required('websites:create')
+@rate_limit('generate')
+async def generate_website_stream():
+    """Async websites_bp.generate_website_stream: the same events, produced on the event loop."""
+    data = request.get_json(silent=True)
+
+    if not data or not data.get('business_type') or not data.get('industry'):
+        return jsonify({"error": "business_type and industry are required"}), 400
+
+    business_type = data.get('business_type')
+    industry = data.get('industry')
+    fresh = bool(data.get('fresh', False))
+    owner_id = g.current_user['_id']
+    client = ai.get_model_client()
+
+    try:
+        quota_day = await asyncio.to_thread(quotas.consume, g.current_user, g.current_user_role)
+    except quotas.QuotaExceeded as e:
+        return quota_exceeded(e)
+
+    async def store(content):
+        website_doc = new_website(owner_id, content)
+        await get_async_db().websites.insert_one(website_doc)
+        publish.schedule(website_doc['_id'])
+        return website_doc
+
+    async def events():
+        # The generation cache, the repair step and refunds may block, so they run on worker threads.
+        cached_content = None if fresh else await asyncio.to_thread(ai_cache.lookup, business_type, industry, client)
+        if cached_content is not None:
+            for event in content_events(cached_content):
+                yield event
+            yield stream_done(await store(cached_content), cached=True)
+            return
+
+        parser = ai.SectionParser()
+        try:
+            async for chunk in ai.stream_generation_async(client, business_type, industry):
+                for section, value in parser.feed(chunk):
+                    yield section_event(section, value)
+            content = await asyncio.to_thread(ai.complete_content, client, business_type, industry, parser.buffer)
+        except ai.GenerationError as e:
+            yield await asyncio.to_thread(stream_failed, owner_id, quota_day, e)
+            return
+        await asyncio.to_thread(ai_cache.remember, business_type, industry, content, client)
+        yield stream_done(await store(content), cached=False)
+
+    return event_stream(StreamingResponse(events(), mimetype='text/event-stream'))
+
+
+# Flask endpoint -> coroutine view served in its place by growthzi.asgi.
+ASYNC_VIEWS = {
+    'preview_bp.render_website_preview': render_website_preview,
+    'websites_bp.get_website_by_id': get_website_by_id,
+    'websites_bp.get_generation_job': get_generation_job,
+    'websites_bp.generate_website_stream': generate_website_stream,
+}
@@ -1,13 +1,26 @@
 import jwt
 import datetime
 from flask import Blueprint, request, jsonify, current_app, g
-from werkzeug.security import generate_password_hash, check_password_hash
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 from ..db import get_db
+from .. import passwords
 from ..utils.decorators import permission_required
+from ..utils.principals import get_role, permission_claims
 
 auth_bp = Blueprint('auth_bp', __name__)
 
+
+def _busy():
+    response = jsonify({"error": "The server is busy. Please retry shortly."})
+    response.headers['Retry-After'] = str(current_app.config.get('PASSWORD_HASH_RETRY_AFTER', 2))
+    return response, 503
+
+
+def _email_taken():
+    return jsonify({"error": "User with this email already exists"}), 409
+
+
 @auth_bp.route('/signup', methods=['POST'])
 def signup():
     db = get_db()
@@ -20,7 +33,7 @@ def signup():
     password = data.get('password')
 
     if db.users.find_one({"email": email}):
-        return jsonify({"error": "User with this email already exists"}), 409
+        return _email_taken()
 
     # --- CHANGE: Default role is now 'Viewer' ---
     default_role = db.roles.find_one({"name": "Viewer"})
@@ -29,14 +42,21 @@ def signup():
         return jsonify({"error": "Default 'Viewer' role not found in the system."}), 500
     # -------------------------------------------
 
-    hashed_password = generate_password_hash(password)
-
-    user_id = db.users.insert_one({
-        "email": email,
-        "password": hashed_password,
-        "role_id": default_role['_id'], # Assign the 'Viewer' role_id
-        "created_at": datetime.datetime.now(datetime.timezone.utc)
-    }).inserted_id
+    try:
+        hashed_password = passwords.hash_password(password)
+    except passwords.HashingBusyError:
+        return _busy()
+
+    try:
+        user_id = db.users.insert_one({
+            "email": email,
+            "password": hashed_password,
+            "role_id": default_role['_id'], # Assign the 'Viewer' role_id
+            "created_at": datetime.datetime.now(datetime.timezone.utc)
+        }).inserted_id
+    except DuplicateKeyError:
+        # A concurrent signup with the same email got there first (unique index).
+        return _email_taken()
 
     return jsonify({"message": "User created successfully", "user_id": str(user_id)}), 201
 
@@ -51,16 +71,47 @@ def login():
 
     email = data.get('email')
     password = data.get('password')
+    client_ip = request.remote_addr or ''
+
+    # Reject throttled clients before spending a database query or a hash.
+    retry_after = passwords.login_retry_after(email, client_ip)
+    if retry_after:
+        response = jsonify({"error": "Too many failed login attempts. Please try again later."})
+        response.headers['Retry-After'] = str(retry_after)
+        return response, 429
 
     user = db.users.find_one({"email": email})
 
-    if not user or not check_password_hash(user['password'], password):
+    try:
+        valid = user is not None and passwords.verify_password(user['password'], password)
+    except passwords.HashingBusyError:
+        return _busy()
+    if not valid:
+        passwords.record_login_failure(email, client_ip)
         return jsonify({"error": "Invalid credentials"}), 401
-
-    token = jwt.encode({
+    passwords.record_login_success(email)
+
+    # Upgrade hashes made with older parameters while we have the plaintext.
+    if passwords.needs_rehash(user['password']):
+        try:
+            db.users.update_one(
+                {"_id": user['_id'], "password": user['password']},
+                {"$set": {"password": passwords.hash_password(password)}}
+            )
+        except passwords.HashingBusyError:
+            pass  # Try again on the next login.
+
+    claims = {
         'user_id': str(user['_id']),
         'exp': datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(hours=24)
-    }, current_app.config['SECRET_KEY'], algorithm="HS256")
+    }
+    # Optionally embed the role so permission checks can skip the database.
+    if current_app.config.get('JWT_EMBED_PERMISSIONS'):
+        role = get_role(db, user.get('role_id'))
+        if role:
+            claims.update(permission_claims(user, role))
+
+    token = jwt.encode(claims, current_app.config['SECRET_KEY'], algorithm="HS256")
 
     return jsonify({"message": "Login successful", "token": token})
 
@@ -1,25 +1,145 @@
-from flask import Blueprint, jsonify, render_template
+import datetime
+import hashlib
+import os
+from flask import Blueprint, current_app, render_template, request, make_response
 from bson import ObjectId
 from ..db import get_db
+from ..utils.cache import SizedLRUCache
+from .. import invalidation
 
 preview_bp = Blueprint('preview_bp', __name__)
 
+TEMPLATE_NAME = 'index.html'
+
+# --- Rendered page cache ---
+# Maps website_id -> (version, etag, last_modified, html bytes). The version
+# is the document's updated_at, so an entry is only served while it matches
+# what is stored in MongoDB. Sized from the app config in init_cache().
+_rendered_pages = SizedLRUCache(maxsize=2048, max_bytes=64 * 1024 * 1024,
+                                sizeof=lambda entry: len(entry[3]), name='preview')
+
+
+def init_cache(app):
+    """Applies cache bounds from the app config."""
+    _rendered_pages.maxsize = app.config.get('PREVIEW_CACHE_MAX_ENTRIES', _rendered_pages.maxsize)
+    _rendered_pages.max_bytes = app.config.get('PREVIEW_CACHE_MAX_BYTES', _rendered_pages.max_bytes)
+    _rendered_pages.clear()
+    invalidation.register('websites', invalidate_preview, _rendered_pages.clear)
+
+
+def invalidate_preview(website_id):
+    """Drops the cached rendering of a website after it was changed or deleted."""
+    _rendered_pages.pop(str(website_id))
+
+
+def cache_stats():
+    return _rendered_pages.stats()
+
+
+def _template_version():
+    """Changes whenever templates/index.html is edited, so stale renders are not reused."""
+    path = os.path.join(current_app.template_folder, TEMPLATE_NAME)
+    try:
+        return os.stat(os.path.join(current_app.root_path, path)).st_mtime_ns
+    except OSError:
+        return 0
+
+
+def _as_utc(value):
+    # PyMongo returns naive datetimes that are in UTC.
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return value.replace(microsecond=0)
+
+
+def _make_etag(website_id, version, template_version):
+    digest = hashlib.sha1(f"{website_id}:{version}:{template_version}".encode()).hexdigest()
+    return digest[:32]
+
+
+def _is_not_modified(etag, last_modified):
+    # If-None-Match takes precedence over If-Modified-Since (RFC 9110).
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if last_modified is not None and request.if_modified_since is not None:
+        return last_modified <= request.if_modified_since
+    return False
+
+
+def _build_response(body, etag, last_modified, status=200):
+    response = make_response(body if status == 200 else '', status)
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = current_app.config.get(
+        'PREVIEW_CACHE_CONTROL', 'public, max-age=0, must-revalidate')
+    return response
+
+
+# Only the timestamps are needed to validate caches.
+META_PROJECTION = {"updated_at": 1, "created_at": 1}
+
+
+def cached_preview(website_id, meta):
+    """
+    Answers a preview from the website's timestamps (read with
+    META_PROJECTION) when possible: 304 for a matching conditional request,
+    or the cached render of this version. Returns None when the page has to
+    be rendered with render_preview().
+    """
+    version = meta.get('updated_at') or meta.get('created_at')
+    last_modified = _as_utc(version)
+    etag = _make_etag(website_id, version, _template_version())
+
+    if _is_not_modified(etag, last_modified):
+        return _build_response(None, etag, last_modified, status=304)
+
+    cached = _rendered_pages.get(website_id)
+    if cached is not None and cached[0] == version and cached[1] == etag:
+        return _build_response(cached[3], etag, last_modified)
+    return None
+
+
+def render_preview(website_id, website_data):
+    """Renders the website, caches the page and returns the response."""
+    # The document may have changed since the metadata read; describe what we render.
+    version = website_data.get('updated_at') or website_data.get('created_at')
+    last_modified = _as_utc(version)
+    etag = _make_etag(website_id, version, _template_version())
+
+    # The render_template function looks in the 'templates' folder.
+    # We pass the fetched data to the template under the variable name 'website'.
+    body = render_template(TEMPLATE_NAME, website=website_data).encode('utf-8')
+    _rendered_pages.set(website_id, (version, etag, last_modified, body))
+    return _build_response(body, etag, last_modified)
+
+
 @preview_bp.route('/<website_id>', methods=['GET'])
 def render_website_preview(website_id):
     """
     Fetches website data by ID and renders it using an HTML template.
     This route is public and does not require authentication.
+    Renders are cached per website version and conditional GETs get a 304.
     """
     db = get_db()
-    
+
     try:
-        website_data = db.websites.find_one({"_id": ObjectId(website_id)})
+        meta = db.websites.find_one({"_id": ObjectId(website_id)}, META_PROJECTION)
     except Exception:
         return "Invalid Website ID format.", 400
 
+    if not meta:
+        invalidate_preview(website_id)
+        return "Website not found.", 404
+
+    response = cached_preview(website_id, meta)
+    if response is not None:
+        return response
+
+    website_data = db.websites.find_one({"_id": ObjectId(website_id)})
     if not website_data:
+        invalidate_preview(website_id)
         return "Website not found.", 404
-        
-    # The render_template function looks in the 'templates' folder.
-    # We pass the fetched data to the template under the variable name 'website'.
-    return render_template('index.html', website=website_data)
\ No newline at end of file
+    return render_preview(website_id, website_data)
@@ -1,25 +1,41 @@
 import datetime
-import os
-import json
-from flask import Blueprint, request, jsonify, g
+from flask import Blueprint, request, jsonify, g, current_app, url_for, Response, stream_with_context
 from bson import ObjectId
-import google.generativeai as genai
+from bson.raw_bson import RawBSONDocument
+from pymongo import ReturnDocument, InsertOne, UpdateOne, DeleteOne
+from pymongo.errors import OperationFailure, BulkWriteError
 from ..db import get_db
-from ..utils.decorators import permission_required
+from ..serialization import raw_collection
+from .. import jobs
+from .. import ai
+from .. import ai_cache
+from .. import batch
+from .. import publish
+from .. import quotas
+from .. import ratelimit
+from ..utils.decorators import permission_required, rate_limit
+from ..utils import permissions
+from ..utils.permissions import Ownership
+from ..utils.pagination import (
+    PaginationError, DEFAULT_PAGE_SIZE, parse_limit, parse_datetime, parse_object_id,
+    decode_cursor, keyset_filter, sort_spec, combine_filters, stream_json_array, stream_json_page,
+)
+from .preview import invalidate_preview
 
 websites_bp = Blueprint('websites_bp', __name__)
 
-# --- Configure Google Gemini API ---
-# The API key is loaded from config, which reads from .env
-# A check is added to prevent crashes if the key is missing.
-try:
-    genai.configure(api_key=os.environ.get("GOOGLE_API_KEY"))
-except Exception as e:
-    print(f"Warning: Google Gemini API could not be configured. Check GOOGLE_API_KEY. Error: {e}")
-
+# Ownership policies: holders of the *_all permission may act on every
+# website (or job), everyone else only on their own. Routes declare them in
+# permission_required, which leaves the resulting filter in g.ownership_filter.
+READ_POLICY = Ownership('websites:read_all', 'websites:read_own')
+EDIT_POLICY = Ownership('websites:edit_all', 'websites:edit_own')
+DELETE_POLICY = Ownership('websites:delete_all', 'websites:delete_own')
 
 # Helper to serialize BSON ObjectId to string
 def serialize_website(doc):
+    if isinstance(doc, RawBSONDocument):
+        # Read-only; the JSON provider encodes raw documents as they are.
+        return doc
     if doc.get('_id'): doc['_id'] = str(doc['_id'])
     if doc.get('owner_id'): doc['owner_id'] = str(doc['owner_id'])
     return doc
@@ -28,8 +44,15 @@ def serialize_website(doc):
 # --- AI Content Generation (with Gemini) ---
 @websites_bp.route('/generate', methods=['POST'])
 @permission_required('websites:create') # Only Admin and Editor can access
+@rate_limit('generate')
 def generate_website():
-    db = get_db()
+    """
+    Queues an AI generation and returns 202 with a job id. The website is
+    created by a background worker; poll the status URL for the result.
+    If identical inputs were generated before, the site is created from the
+    cached content right away (201). Send "fresh": true to skip the cache.
+    Each request counts against the caller's daily generation quota.
+    """
     data = request.get_json()
     
     if not data or not data.get('business_type') or not data.get('industry'):
@@ -37,130 +60,419 @@ def generate_website():
 
     business_type = data.get('business_type')
     industry = data.get('industry')
-    
+    fresh = bool(data.get('fresh', False))
+
     try:
-        model = genai.GenerativeModel('gemini-1.5-flash-latest')
-        
-        prompt = f"""
-        Generate website content for a company.
-        - Business Type: {business_type}
-        - Industry: {industry}
-        
-        The output MUST be a single, valid JSON object. Do not include any text, notes, or markdown formatting like ```json before or after the JSON object.
-        The JSON structure should be exactly this:
-        {{
-          "title": "A short, catchy company name",
-          "hero": {{
-            "headline": "A powerful headline (max 10 words)",
-            "subheading": "An engaging subheading that explains more (max 20 words)",
-            "cta_button_text": "A call-to-action button text (max 4 words)"
-          }},
-          "about": {{
-            "title": "About Us",
-            "text": "A descriptive paragraph about the company's mission and values (around 50 words)."
-          }},
-          "services": [
-            {{ "name": "Service One Name", "description": "A brief description of the first service (around 20 words)." }},
-            {{ "name": "Service Two Name", "description": "A brief description of the second service (around 20 words)." }},
-            {{ "name": "Service Three Name", "description": "A brief description of the third service (around 20 words)." }}
-          ]
-        }}
-        """
-        
-        response = model.generate_content(prompt)
-        generated_content = json.loads(response.text)
-
-    except json.JSONDecodeError:
-        print(f"Gemini API did not return valid JSON. Response:\n{response.text}")
-        return jsonify({"error": "Failed to parse content from AI service. The response was not valid JSON."}), 500
-    except Exception as e:
-        print(f"Google Gemini API Error: {e}")
-        return jsonify({"error": "Failed to generate content from AI service. Check your API key and permissions."}), 500
-
-    # Store in Database
-    website_doc = {
-        "owner_id": g.current_user['_id'],
-        "created_at": datetime.datetime.now(datetime.timezone.utc),
-        "updated_at": datetime.datetime.now(datetime.timezone.utc),
-        "content": generated_content
-    }
-    
-    db.websites.insert_one(website_doc)
-    
-    return jsonify({
-        "message": "Website generated and created successfully", 
-        "website": serialize_website(website_doc)
-    }), 201
+        quota_day = quotas.consume(g.current_user, g.current_user_role)
+    except quotas.QuotaExceeded as e:
+        return quota_exceeded(e)
+
+    if not fresh:
+        cached_content = ai_cache.lookup(business_type, industry)
+        if cached_content is not None:
+            website_doc = new_website(g.current_user['_id'], cached_content)
+            get_db().websites.insert_one(website_doc)
+            publish.schedule(website_doc['_id'])
+            return jsonify({
+                "message": "Website generated and created successfully",
+                "website": serialize_website(website_doc)
+            }), 201
+
+    try:
+        job = jobs.enqueue_generation(
+            current_app._get_current_object(), g.current_user['_id'], business_type, industry,
+            fresh=fresh, quota_day=quota_day
+        )
+    except jobs.UserLimitError:
+        quotas.refund(g.current_user['_id'], quota_day)
+        return jsonify({"error": "You already have the maximum number of generations in progress"}), 429
+    except jobs.QueueFullError:
+        quotas.refund(g.current_user['_id'], quota_day)
+        response = jsonify({"error": "The generation service is busy. Please retry shortly."})
+        response.headers['Retry-After'] = str(current_app.config.get('GENERATION_RETRY_AFTER', 5))
+        return response, 503
+
+    status_url = url_for('websites_bp.get_generation_job', job_id=str(job['_id']))
+    response = jsonify({
+        "message": "Website generation queued",
+        "job": jobs.serialize_job(job),
+        "status_url": status_url
+    })
+    response.headers['Location'] = status_url
+    return response, 202
+
+
+@websites_bp.route('/generate/batch', methods=['POST'])
+@permission_required('websites:create')
+def generate_websites_batch():
+    """
+    Generates a website for each {business_type, industry} profile in
+    "profiles" and returns a result per profile in the same order. Items
+    fail independently: successful sites are created even when others fail.
+    Accepts "fresh" like /generate.
+    """
+    data = request.get_json(silent=True)
+    try:
+        profiles = batch.parse_profiles(data, current_app.config.get('GENERATION_BATCH_MAX_ITEMS', 50))
+    except batch.BatchError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Each profile is one generation against the 'generate' rate limit.
+    refused = ratelimit.check('generate', len(profiles))
+    if refused is not None:
+        return refused
+
+    # Every profile counts against the quota; those that produce no website are refunded.
+    try:
+        quota_day = quotas.consume(g.current_user, g.current_user_role, len(profiles))
+    except quotas.QuotaExceeded as e:
+        return quota_exceeded(e)
+
+    results = batch.generate_batch(
+        current_app._get_current_object(), g.current_user['_id'], profiles, fresh=bool(data.get('fresh', False))
+    )
+    for result in results:
+        if "website" in result:
+            serialize_website(result["website"])
+    summary = batch.summarize(results)
+    quotas.refund(g.current_user['_id'], quota_day, len(profiles) - summary[batch.ITEM_CREATED])
+    return jsonify({"summary": summary, "results": results}), 200
+
+
+def new_website(owner_id, content):
+    """The document stored for a newly generated website."""
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return {"owner_id": owner_id, "created_at": now, "updated_at": now, "version": 1, "content": content}
+
+
+def quota_exceeded(error):
+    """The 429 response for quotas.QuotaExceeded."""
+    response = jsonify({
+        "error": "Daily generation quota exceeded",
+        "daily_limit": error.limit,
+        "used": error.used,
+    })
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, 429
+
+
+# --- Streamed generation ---
+# generate_website_stream and its coroutine version (async_views) build
+# their events and responses with these helpers, so both send the same stream.
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {current_app.json.dumps(data)}\n\n"
+
+
+def section_event(section, value):
+    """A "section" event; section is a name, or ('services', index) for one service."""
+    if isinstance(section, tuple):
+        return sse_event('section', {"section": section[0], "index": section[1], "value": value})
+    return sse_event('section', {"section": section, "value": value})
+
+
+def content_events(content):
+    """The "section" events for content that is already complete, e.g. from the generation cache."""
+    for section, value in content.items():
+        if section == 'services' and isinstance(value, list):
+            for index, service in enumerate(value):
+                yield section_event(('services', index), service)
+        else:
+            yield section_event(section, value)
+
+
+def stream_done(website, cached):
+    return sse_event('done', {"website": serialize_website(website), "cached": cached})
+
+
+def stream_failed(owner_id, quota_day, error):
+    """Refunds a streamed generation that failed and returns its "error" event."""
+    quotas.refund(owner_id, quota_day)
+    return sse_event('error', {"error": str(error)})
+
+
+def event_stream(response):
+    """Sets the headers of a text/event-stream response."""
+    response.headers['Cache-Control'] = 'no-cache'
+    # Tell nginx not to buffer the stream.
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@websites_bp.route('/generate/stream', methods=['POST'])
+@permission_required('websites:create')
+@rate_limit('generate')
+def generate_website_stream():
+    """
+    Generates a website and streams it as server-sent events. Each content
+    section (title, hero, about, every service) is sent as a "section" event
+    as soon as the model has produced it; a final "done" event carries the
+    stored website, or an "error" event explains what went wrong.
+    Accepts the same body as /generate, including "fresh".
+    """
+    data = request.get_json(silent=True)
+
+    if not data or not data.get('business_type') or not data.get('industry'):
+        return jsonify({"error": "business_type and industry are required"}), 400
+
+    business_type = data.get('business_type')
+    industry = data.get('industry')
+    fresh = bool(data.get('fresh', False))
+    owner_id = g.current_user['_id']
+    client = ai.get_model_client()
+
+    try:
+        quota_day = quotas.consume(g.current_user, g.current_user_role)
+    except quotas.QuotaExceeded as e:
+        return quota_exceeded(e)
+
+    def store(content):
+        website_doc = new_website(owner_id, content)
+        get_db().websites.insert_one(website_doc)
+        publish.schedule(website_doc['_id'])
+        return website_doc
+
+    def events():
+        cached_content = None if fresh else ai_cache.lookup(business_type, industry, client)
+        if cached_content is not None:
+            yield from content_events(cached_content)
+            yield stream_done(store(cached_content), cached=True)
+            return
+
+        parser = ai.SectionParser()
+        try:
+            for chunk in ai.stream_generation(client, business_type, industry):
+                for section, value in parser.feed(chunk):
+                    yield section_event(section, value)
+            content = ai.complete_content(client, business_type, industry, parser.buffer)
+        except ai.GenerationError as e:
+            yield stream_failed(owner_id, quota_day, e)
+            return
+        ai_cache.remember(business_type, industry, content, client)
+        yield stream_done(store(content), cached=False)
+
+    return event_stream(Response(stream_with_context(events()), mimetype='text/event-stream'))
+
+
+@websites_bp.route('/jobs/<job_id>', methods=['GET'])
+@permission_required('websites:create', ownership=READ_POLICY)
+def get_generation_job(job_id):
+    """Returns the status of a generation job. Users only see their own jobs."""
+    try:
+        job = jobs.get_job(job_id, g.ownership_filter)
+    except Exception:
+        return jsonify({"error": "Invalid job_id format"}), 400
+
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(jobs.serialize_job(job)), 200
 
 
 # --- Standard CRUD Operations ---
 
+# Fields returned by ?view=summary (enough to render a dashboard card).
+SUMMARY_PROJECTION = {
+    "owner_id": 1,
+    "created_at": 1,
+    "updated_at": 1,
+    "content.title": 1,
+    "content.hero.headline": 1,
+}
+
+
 @websites_bp.route('/', methods=['GET'])
 @permission_required('websites:read_all', 'websites:read_own')
+@rate_limit('read')
 def get_websites():
     """
-    Returns a list of all websites. The permission decorator ensures
+    Returns websites, newest first. The permission decorator ensures
     only authenticated users (Viewer, Editor, Admin) can access this.
+    Query parameters (all optional):
+    - limit / cursor: Keyset pagination. The response becomes
+      {"items": [...], "next_cursor": ...}; pass next_cursor back for the next page.
+    - view=summary: Only title, hero headline, owner and timestamps.
+    - owner: An owner id, or "me".
+    - created_after / created_before: ISO 8601 bounds on created_at.
+    Without limit/cursor all matching websites are returned as a JSON array.
+    The response is streamed either way.
     """
     db = get_db()
-    
-    # The query is empty ({}) to fetch ALL documents from the collection.
-    websites_cursor = db.websites.find({})
-    websites_list = [serialize_website(doc) for doc in websites_cursor]
-    
-    return jsonify(websites_list), 200
+    args = request.args
+
+    try:
+        limit = parse_limit(args.get('limit'))
+        cursor_key = decode_cursor(args.get('cursor'), 'created_at')
+        if cursor_key is not None and limit is None:
+            limit = current_app.config.get('PAGINATION_DEFAULT_LIMIT', DEFAULT_PAGE_SIZE)
+
+        filters = {}
+        owner = args.get('owner')
+        if owner:
+            filters["owner_id"] = g.current_user['_id'] if owner == 'me' else parse_object_id(owner, 'owner')
+        created_range = {}
+        created_after = parse_datetime(args.get('created_after'), 'created_after')
+        created_before = parse_datetime(args.get('created_before'), 'created_before')
+        if created_after:
+            created_range["$gte"] = created_after
+        if created_before:
+            created_range["$lt"] = created_before
+        if created_range:
+            filters["created_at"] = created_range
+    except PaginationError as e:
+        return jsonify({"error": str(e)}), 400
+
+    view = args.get('view', 'full')
+    if view not in ('full', 'summary'):
+        return jsonify({"error": "view must be 'full' or 'summary'"}), 400
+    projection = SUMMARY_PROJECTION if view == 'summary' else None
+
+    query = combine_filters(filters, keyset_filter(cursor_key, 'created_at'))
+    websites_cursor = raw_collection(db.websites).find(query, projection).sort(sort_spec('created_at'))
+    if limit is not None:
+        websites_cursor = websites_cursor.limit(limit)
+        return stream_json_page(websites_cursor, serialize_website, limit, 'created_at')
+
+    websites_cursor = websites_cursor.batch_size(current_app.config.get('PAGINATION_DEFAULT_LIMIT', DEFAULT_PAGE_SIZE))
+    return stream_json_array(websites_cursor, serialize_website)
 
 @websites_bp.route('/<website_id>', methods=['GET'])
 @permission_required('websites:read_all', 'websites:read_own')
+@rate_limit('read')
 def get_website_by_id(website_id):
     """
     Returns a single website by its ID. Accessible by any authenticated user.
+    The ETag header carries the website version for use with If-Match.
     """
     db = get_db()
     try:
         website = db.websites.find_one({"_id": ObjectId(website_id)})
         if not website:
             return jsonify({"error": "Website not found"}), 404
-        return jsonify(serialize_website(website)), 200
+        return with_version_etag(jsonify(serialize_website(website)), website), 200
+    except Exception:
+        return jsonify({"error": "Invalid website_id format"}), 400
+
+
+# --- Atomic, version-checked writes ---
+# Updates and deletes are single find_one_and_* calls whose filter carries
+# the route's ownership policy and, when the client sends If-Match (or
+# "version" in the body), the expected version. Only when nothing matched do
+# we read the document again to tell 404, 403 and 409 apart.
+
+def with_version_etag(response, website):
+    response.set_etag(f"v{website.get('version', 0)}")
+    return response
+
+
+def _expected_versions(data):
+    """Versions the client expects from If-Match or the body; None means unconditional."""
+    if request.if_match and not request.if_match.star_tag:
+        tags = request.if_match.as_set(include_weak=True)
+    elif data and data.get('version') is not None:
+        tags = {str(data['version'])}
+    else:
+        return None
+    try:
+        return [int(tag.lstrip('v')) for tag in tags]
+    except ValueError:
+        raise ValueError("If-Match must be a version ETag returned by this API")
+
+
+def _write_filter(website_id, ownership_filter, expected_versions):
+    query = {"_id": website_id, **ownership_filter}
+    if expected_versions is not None:
+        # Documents created before versioning have no version field (= 0).
+        values = expected_versions + ([None] if 0 in expected_versions else [])
+        query["version"] = {"$in": values}
+    return query
+
+
+def _write_failed(db, website_id, action, policy):
+    website = db.websites.find_one({"_id": website_id}, {"owner_id": 1, "version": 1})
+    if not website:
+        return jsonify({"error": "Website not found"}), 404
+    if not policy.allows(website, g.current_user, g.current_user_role):
+        return jsonify({"error": f"Forbidden: You can only {action} your own websites"}), 403
+    response = jsonify({
+        "error": "Website was modified by someone else. Reload it and try again.",
+        "current_version": website.get('version', 0)
+    })
+    return with_version_etag(response, website), 409
+
+
+def _apply_update(website_id, data, changes):
+    db = get_db()
+    try:
+        oid = ObjectId(website_id)
     except Exception:
         return jsonify({"error": "Invalid website_id format"}), 400
+    try:
+        expected = _expected_versions(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    changes["updated_at"] = datetime.datetime.now(datetime.timezone.utc)
+    try:
+        updated_website = db.websites.find_one_and_update(
+            _write_filter(oid, g.ownership_filter, expected),
+            {"$set": changes, "$inc": {"version": 1}},
+            return_document=ReturnDocument.AFTER
+        )
+    except OperationFailure as e:
+        # e.g. overlapping patch paths such as "hero" and "hero.headline"
+        return jsonify({"error": f"Invalid update: {e.details.get('errmsg', str(e)) if e.details else e}"}), 400
+    if not updated_website:
+        return _write_failed(db, oid, 'edit', EDIT_POLICY)
+
+    invalidate_preview(website_id)
+    publish.schedule(oid)
+    return with_version_etag(jsonify(serialize_website(updated_website)), updated_website), 200
+
 
 @websites_bp.route('/<website_id>', methods=['PUT'])
-@permission_required('websites:edit_all', 'websites:edit_own')
+@permission_required('websites:edit_all', 'websites:edit_own', ownership=EDIT_POLICY)
+@rate_limit('write')
 def update_website(website_id):
     """
-    Updates a website. Admins can update any site.
+    Replaces a website's content. Admins can update any site.
     Editors can only update sites they own.
+    Send If-Match with the ETag from GET to get 409 instead of overwriting
+    someone else's changes.
     """
-    db = get_db()
-    data = request.get_json()
+    data = request.get_json(silent=True)
 
-    if 'content' not in data:
+    if not data or 'content' not in data:
         return jsonify({"error": "Request body must contain 'content' field"}), 400
 
-    try:
-        website_to_update = db.websites.find_one({"_id": ObjectId(website_id)})
-        if not website_to_update:
-            return jsonify({"error": "Website not found"}), 404
-        
-        # Check permissions
-        user_role = g.current_user_role['name']
-        is_owner = str(website_to_update.get('owner_id')) == str(g.current_user['_id'])
-        
-        if user_role == 'Editor' and not is_owner:
-            return jsonify({"error": "Forbidden: You can only edit your own websites"}), 403
-
-        db.websites.update_one(
-            {"_id": ObjectId(website_id)},
-            {"$set": {"content": data['content'], "updated_at": datetime.datetime.now(datetime.timezone.utc)}}
-        )
-        updated_website = db.websites.find_one({"_id": ObjectId(website_id)})
-        return jsonify(serialize_website(updated_website)), 200
-    except Exception:
-        return jsonify({"error": "Invalid website_id format"}), 400
+    return _apply_update(website_id, data, {"content": data['content']})
+
+
+@websites_bp.route('/<website_id>', methods=['PATCH'])
+@permission_required('websites:edit_all', 'websites:edit_own', ownership=EDIT_POLICY)
+@rate_limit('write')
+def patch_website(website_id):
+    """
+    Updates only the given parts of a website's content, e.g.
+    {"content": {"hero": {...}}} or {"content": {"hero.headline": "..."}}.
+    Every key is written with $set under content; other sections are kept.
+    """
+    data = request.get_json(silent=True)
+
+    if not data or not isinstance(data.get('content'), dict) or not data['content']:
+        return jsonify({"error": "Request body must contain a non-empty 'content' object"}), 400
+
+    changes = {}
+    for path, value in data['content'].items():
+        if not path or path.startswith('$') or '' in path.split('.'):
+            return jsonify({"error": f"Invalid content path: '{path}'"}), 400
+        changes[f"content.{path}"] = value
+
+    return _apply_update(website_id, data, changes)
+
 
 @websites_bp.route('/<website_id>', methods=['DELETE'])
-@permission_required('websites:delete_all', 'websites:delete_own')
+@permission_required('websites:delete_all', 'websites:delete_own', ownership=DELETE_POLICY)
+@rate_limit('write')
 def delete_website(website_id):
     """
     Deletes a website. Admins can delete any site.
@@ -168,18 +480,300 @@ def delete_website(website_id):
     """
     db = get_db()
     try:
-        website_to_delete = db.websites.find_one({"_id": ObjectId(website_id)})
-        if not website_to_delete:
-            return jsonify({"error": "Website not found"}), 404
+        oid = ObjectId(website_id)
+    except Exception:
+        return jsonify({"error": "Invalid website_id format"}), 400
+    try:
+        expected = _expected_versions(None)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    deleted = db.websites.find_one_and_delete(_write_filter(oid, g.ownership_filter, expected), projection={"_id": 1})
+    if not deleted:
+        return _write_failed(db, oid, 'delete', DELETE_POLICY)
+
+    invalidate_preview(website_id)
+    publish.schedule(oid)
+    return jsonify({"message": "Website deleted successfully"}), 200
+
 
-        # Check permissions
-        user_role = g.current_user_role['name']
-        is_owner = str(website_to_delete.get('owner_id')) == str(g.current_user['_id'])
-        
-        if user_role == 'Editor' and not is_owner:
-            return jsonify({"error": "Forbidden: You can only delete your own websites"}), 403
+# --- Bulk operations ---
+# One request carries many create/update/patch/delete operations. The
+# caller's permissions are resolved once by the decorator, the documents
+# involved are read in one query to report per-item 403/404/409, and all
+# writes go out in a single bulk_write whose filters still carry the
+# ownership guard and are pinned to the version that was read. The write
+# result says whether every guarded write matched; only when some did not
+# (another request changed a site in between) are those sites checked again.
 
-        db.websites.delete_one({"_id": ObjectId(website_id)})
-        return jsonify({"message": "Website deleted successfully"}), 200
+BULK_OPERATION_PERMISSIONS = {
+    "create": ("websites:create",),
+    "update": ("websites:edit_all", "websites:edit_own"),
+    "patch": ("websites:edit_all", "websites:edit_own"),
+    "delete": ("websites:delete_all", "websites:delete_own"),
+}
+BULK_OPERATION_MASKS = {op: permissions.mask(*names) for op, names in BULK_OPERATION_PERMISSIONS.items()}
+BULK_OPERATION_POLICIES = {"update": EDIT_POLICY, "patch": EDIT_POLICY, "delete": DELETE_POLICY}
+
+
+def _bulk_error(index, op, code, message, website_id=None):
+    return {"index": index, "op": op, "id": website_id, "status": "error", "code": code, "error": message}
+
+
+def _prepare_bulk_operation(index, item, now):
+    """
+    Validates one operation. Returns (result, check, payload) where result is
+    an error dict (or None), check the (id, action, expected_versions) tuple
+    to verify against stored documents, and payload the new document for a
+    create or the $set changes for an update or patch.
+    """
+    op = item.get('op') if isinstance(item, dict) else None
+    if op not in BULK_OPERATION_PERMISSIONS:
+        return _bulk_error(index, op, 400, "op must be one of create, update, patch, delete"), None, None
+    if not g.current_user_role['permission_mask'] & BULK_OPERATION_MASKS[op]:
+        return _bulk_error(index, op, 403, f"Forbidden: you are not allowed to {op} websites"), None, None
+
+    if op == 'create':
+        if not isinstance(item.get('content'), dict):
+            return _bulk_error(index, op, 400, "create requires a 'content' object"), None, None
+        website_doc = {
+            "_id": ObjectId(),
+            "owner_id": g.current_user['_id'],
+            "created_at": now,
+            "updated_at": now,
+            "version": 1,
+            "content": item['content']
+        }
+        return None, (website_doc['_id'], op, None), website_doc
+
+    try:
+        # ObjectId(None) would mint a new id, so require a string.
+        if not isinstance(item.get('id'), str):
+            raise ValueError()
+        oid = ObjectId(item['id'])
     except Exception:
-        return jsonify({"error": "Invalid website_id format"}), 400
\ No newline at end of file
+        return _bulk_error(index, op, 400, "Invalid website id format", item.get('id')), None, None
+    version = item.get('version')
+    if version is not None and not isinstance(version, int):
+        return _bulk_error(index, op, 400, "version must be an integer", str(oid)), None, None
+    expected = [version] if version is not None else None
+
+    if op == 'delete':
+        return None, (oid, op, expected), None
+
+    content = item.get('content')
+    if not isinstance(content, dict) or (op == 'patch' and not content):
+        return _bulk_error(index, op, 400, f"{op} requires a 'content' object", str(oid)), None, None
+    if op == 'update':
+        changes = {"content": content}
+    else:
+        changes = {}
+        for path in content:
+            if not path or path.startswith('$') or '' in path.split('.'):
+                return _bulk_error(index, op, 400, f"Invalid content path: '{path}'", str(oid)), None, None
+            changes[f"content.{path}"] = content[path]
+    changes["updated_at"] = now
+    return None, (oid, op, expected), changes
+
+
+def _check_against_stored(check, stored):
+    """Returns (code, message) if the operation cannot apply to the stored document."""
+    oid, op, expected = check
+    if op == 'create':
+        return None
+    website = stored.get(oid)
+    if website is None:
+        return 404, "Website not found"
+    action = 'edit' if op in ('update', 'patch') else 'delete'
+    if not BULK_OPERATION_POLICIES[op].allows(website, g.current_user, g.current_user_role):
+        return 403, f"Forbidden: You can only {action} your own websites"
+    if expected is not None and website.get('version', 0) not in expected:
+        return 409, f"Version mismatch (current version is {website.get('version', 0)})"
+    return None
+
+
+def _bulk_request(check, payload, website):
+    """The pymongo write for a checked operation, pinned to the version read for it."""
+    oid, op, _ = check
+    if op == 'create':
+        return InsertOne(payload)
+    ownership_filter = BULK_OPERATION_POLICIES[op].filter(g.current_user, g.current_user_role)
+    query = _write_filter(oid, ownership_filter, [website.get('version', 0)])
+    if op == 'delete':
+        return DeleteOne(query)
+    return UpdateOne(query, {"$set": payload, "$inc": {"version": 1}})
+
+
+def _applied_writes(db, checks, stored, now):
+    """
+    Which of the executed updates and deletes applied, for when the write
+    result shows that some guarded filters missed. An update applied if the
+    site is at the version after the one that was read and carries this
+    request's timestamp; another writer would have set its own. A delete
+    applied if the site is gone.
+    """
+    current = {w['_id']: w for w in db.websites.find(
+        {"_id": {"$in": [oid for oid, _, _ in checks]}}, {"version": 1, "updated_at": 1}
+    )}
+    applied = {}
+    for oid, op, _ in checks:
+        website = current.get(oid)
+        if op == 'delete':
+            applied[oid] = website is None
+            continue
+        updated_at = website.get('updated_at') if website else None
+        if updated_at is not None and updated_at.tzinfo is None:
+            # PyMongo returns naive datetimes that are in UTC.
+            updated_at = updated_at.replace(tzinfo=datetime.timezone.utc)
+        applied[oid] = (
+            website is not None
+            and website.get('version') == stored[oid].get('version', 0) + 1
+            and updated_at == now
+        )
+    return applied
+
+
+@websites_bp.route('/bulk', methods=['POST'])
+@permission_required('websites:create', 'websites:edit_all', 'websites:edit_own',
+                     'websites:delete_all', 'websites:delete_own')
+@rate_limit('write')
+def bulk_websites():
+    """
+    Runs many website operations in one request:
+    {"ordered": true, "operations": [
+        {"op": "create", "content": {...}},
+        {"op": "update", "id": "...", "content": {...}, "version": 3},
+        {"op": "patch", "id": "...", "content": {"hero.headline": "..."}},
+        {"op": "delete", "id": "..."}]}
+    Ordered mode stops at the first failing operation; unordered mode applies
+    every valid operation. Returns one result per operation.
+    """
+    db = get_db()
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data.get('operations'), list) or not data['operations']:
+        return jsonify({"error": "Request body must contain a non-empty 'operations' list"}), 400
+
+    operations = data['operations']
+    max_operations = current_app.config.get('BULK_MAX_OPERATIONS', 500)
+    if len(operations) > max_operations:
+        return jsonify({"error": f"At most {max_operations} operations are allowed per request"}), 400
+    ordered = bool(data.get('ordered', True))
+    # MongoDB stores milliseconds; _applied_writes compares this value.
+    now = datetime.datetime.now(datetime.timezone.utc)
+    now = now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+    results = [None] * len(operations)
+    prepared = []  # (index, check, payload)
+    seen_ids = set()
+    for index, item in enumerate(operations):
+        error, check, payload = _prepare_bulk_operation(index, item, now)
+        if not error and check[1] != 'create':
+            if check[0] in seen_ids:
+                error = _bulk_error(index, check[1], 400, "Each website may appear only once per request", str(check[0]))
+            seen_ids.add(check[0])
+        if error:
+            results[index] = error
+        else:
+            prepared.append((index, check, payload))
+
+    # One read for every document the operations touch.
+    ids = [check[0] for _, check, _ in prepared if check[1] != 'create']
+    stored = {}
+    if ids:
+        for website in db.websites.find({"_id": {"$in": ids}}, {"owner_id": 1, "version": 1}):
+            stored[website['_id']] = website
+
+    writes = []  # (index, request, check)
+    for index, check, payload in prepared:
+        problem = _check_against_stored(check, stored)
+        if problem:
+            results[index] = _bulk_error(index, check[1], problem[0], problem[1], str(check[0]))
+        else:
+            writes.append((index, _bulk_request(check, payload, stored.get(check[0])), check))
+
+    if ordered:
+        # Nothing after the first failed operation may run.
+        first_error = next((i for i, r in enumerate(results) if r is not None), None)
+        if first_error is not None:
+            writes = [w for w in writes if w[0] < first_error]
+
+    write_errors = {}
+    matched = deleted = 0
+    if writes:
+        try:
+            outcome = db.websites.bulk_write([write for _, write, _ in writes], ordered=ordered)
+            matched, deleted = outcome.matched_count, outcome.deleted_count
+        except BulkWriteError as e:
+            matched, deleted = e.details.get('nMatched', 0), e.details.get('nRemoved', 0)
+            for error in e.details.get('writeErrors', []):
+                write_errors[error['index']] = error.get('errmsg', 'Write failed')
+            if ordered:
+                # Operations after the failing one were not executed.
+                failed_at = min(write_errors) if write_errors else len(writes)
+                for position in range(failed_at + 1, len(writes)):
+                    write_errors.setdefault(position, None)
+
+    # Every executed update and delete should have matched its pinned filter.
+    executed = [check for position, (_, _, check) in enumerate(writes)
+                if position not in write_errors and check[1] != 'create']
+    deletes = sum(1 for _, op, _ in executed if op == 'delete')
+    applied = None  # id -> whether its write applied; None when all did
+    if (matched, deleted) != (len(executed) - deletes, deletes):
+        applied = _applied_writes(db, executed, stored, now)
+
+    applied_ids = []
+    for position, (index, write, check) in enumerate(writes):
+        oid, op, expected = check
+        if position in write_errors:
+            message = write_errors[position]
+            results[index] = {"index": index, "op": op, "id": str(oid), "status": "skipped"} if message is None \
+                else _bulk_error(index, op, 500, message, str(oid))
+            continue
+        if applied is not None and op != 'create' and not applied[oid]:
+            action = 'deleted' if op == 'delete' else 'updated'
+            results[index] = _bulk_error(index, op, 409, f"Website changed before it could be {action}", str(oid))
+            continue
+        if op != 'create':
+            invalidate_preview(oid)
+        applied_ids.append(oid)
+        status = {"create": "created", "update": "updated", "patch": "updated", "delete": "deleted"}[op]
+        results[index] = {"index": index, "op": op, "id": str(oid), "status": status}
+
+    publish.schedule(*applied_ids)
+
+    for index, result in enumerate(results):
+        if result is None:
+            item = operations[index] if isinstance(operations[index], dict) else {}
+            results[index] = {"index": index, "op": item.get('op'), "id": item.get('id'), "status": "skipped"}
+
+    summary = {}
+    for result in results:
+        summary[result['status']] = summary.get(result['status'], 0) + 1
+    return jsonify({"ordered": ordered, "summary": summary, "results": results}), 200
+
+
+@websites_bp.route('/export', methods=['GET'])
+@permission_required('websites:read_all', 'websites:read_own', ownership=READ_POLICY)
+@rate_limit('read')
+def export_websites():
+    """
+    Streams every website the caller can see as NDJSON (one JSON document
+    per line). Users without websites:read_all only get their own sites.
+    Accepts view=summary like the list endpoint.
+    """
+    db = get_db()
+    query = g.ownership_filter
+    projection = SUMMARY_PROJECTION if request.args.get('view') == 'summary' else None
+
+    websites_cursor = raw_collection(db.websites).find(query, projection).sort("_id", 1).batch_size(
+        current_app.config.get('EXPORT_BATCH_SIZE', 500)
+    )
+    dumps = current_app.json.dumps
+
+    def generate():
+        for website in websites_cursor:
+            yield dumps(serialize_website(website)) + '\n'
+
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    response.headers['Content-Disposition'] = 'attachment; filename="websites.ndjson"'
+    return response
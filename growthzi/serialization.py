@@ -0,0 +1,170 @@
+import datetime
+import json
+from bson import ObjectId, decode
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+from flask import current_app
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date
+from .utils.cache import SizedLRUCache
+
+try:
+    import orjson
+except ImportError:  # Optional: the stdlib encoder is used instead.
+    orjson = None
+
+# --- JSON encoding for MongoDB documents ---
+# The app's JSON provider encodes ObjectId (as its hex string) and datetimes
+# directly, so views can return documents as they come from PyMongo. orjson
+# encodes responses when it is installed. Request bodies are always parsed
+# by the standard library, which accepts input orjson rejects (integers
+# wider than 64 bits, NaN and Infinity), so what a client may send does not
+# depend on whether orjson is installed.
+#
+# Documents read with RAW_CODEC_OPTIONS arrive as RawBSONDocument: only the
+# top-level fields are decoded, and each embedded document (e.g. a website's
+# `content`) is encoded once and cached by its BSON bytes. A list response
+# therefore only decodes and encodes content that changed since it was
+# last served.
+
+DATETIME_HTTP = 'http'
+DATETIME_ISO = 'iso'
+
+RAW_CODEC_OPTIONS = CodecOptions(document_class=RawBSONDocument)
+_DECODE_OPTIONS = CodecOptions(document_class=dict)
+
+# (format options, BSON bytes of an embedded document) -> its JSON encoding.
+# Entries are sized by both the BSON and the JSON bytes.
+_fragments = SizedLRUCache(maxsize=8192, max_bytes=32 * 1024 * 1024, sizeof=len, name='json_fragments')
+
+
+def init_cache(app):
+    _fragments.maxsize = app.config.get('JSON_FRAGMENT_CACHE_ENTRIES', _fragments.maxsize)
+    _fragments.max_bytes = app.config.get('JSON_FRAGMENT_CACHE_BYTES', _fragments.max_bytes)
+    _fragments.clear()
+
+
+def cache_stats():
+    return _fragments.stats()
+
+
+_DAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+_MONTHS = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+
+
+def _utc(value):
+    # PyMongo returns naive datetimes that are in UTC.
+    return value.replace(tzinfo=datetime.timezone.utc) if value.tzinfo is None else value
+
+
+def _http_date(value):
+    """Same output as werkzeug's http_date for datetimes, without going through email.utils."""
+    if value.tzinfo is not None:
+        value = value.astimezone(datetime.timezone.utc)
+    return (
+        f"{_DAYS[value.weekday()]}, {value.day:02d} {_MONTHS[value.month - 1]} {value.year:04d} "
+        f"{value.hour:02d}:{value.minute:02d}:{value.second:02d} GMT"
+    )
+
+
+class MongoJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider that understands ObjectId, datetime and
+    RawBSONDocument. datetime_format is "http" (Flask's default RFC 822
+    dates) or "iso" (ISO 8601, faster with orjson).
+    """
+
+    datetime_format = DATETIME_HTTP
+
+    def _default(self, value):
+        if isinstance(value, ObjectId):
+            return str(value)
+        if isinstance(value, datetime.datetime):
+            return _http_date(value) if self.datetime_format == DATETIME_HTTP else _utc(value).isoformat()
+        if isinstance(value, datetime.date):
+            return http_date(value) if self.datetime_format == DATETIME_HTTP else value.isoformat()
+        if isinstance(value, RawBSONDocument):
+            return _inflate(value)
+        return DefaultJSONProvider.default(value)
+
+    def _options(self):
+        options = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if self.datetime_format == DATETIME_HTTP:
+            # Hand datetimes to _default so they keep Flask's format.
+            options |= orjson.OPT_PASSTHROUGH_DATETIME
+        else:
+            options |= orjson.OPT_NAIVE_UTC
+        return options
+
+    def dumps_bytes(self, obj):
+        """Encodes obj as compact UTF-8 JSON."""
+        if isinstance(obj, RawBSONDocument):
+            return self._encode_raw(obj)
+        if orjson is not None:
+            return orjson.dumps(obj, default=self._default, option=self._options())
+        return json.dumps(
+            obj, default=self._default, ensure_ascii=self.ensure_ascii,
+            sort_keys=self.sort_keys, separators=(',', ':')
+        ).encode('utf-8')
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            # Formatting options (e.g. indent) go through the stdlib encoder.
+            kwargs.setdefault("default", self._default)
+            return super().dumps(obj, **kwargs)
+        return self.dumps_bytes(obj).decode('utf-8')
+
+    def response(self, *args, **kwargs):
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj) + b"\n", mimetype=self.mimetype)
+
+    def _encode_raw(self, document):
+        # Embedded documents come from the fragment cache. The top-level
+        # values are encoded in one call and the fragments spliced in after
+        # them, or member by member when keys are sorted.
+        scalars = {}
+        fragments = []
+        for key, value in document.items():
+            if isinstance(value, RawBSONDocument):
+                cache_key = (self.datetime_format, self.sort_keys, value.raw)
+                fragment = _fragments.get(cache_key)
+                if fragment is None:
+                    fragment = self.dumps_bytes(_inflate(value))
+                    # The key holds the BSON bytes, so they count against the byte limit too.
+                    _fragments.set(cache_key, fragment, size=len(fragment) + len(value.raw))
+                fragments.append((key, fragment))
+            else:
+                scalars[key] = value
+        if not fragments:
+            return self.dumps_bytes(scalars)
+        if self.sort_keys:
+            # Members go out in key order, like the same document as a dict.
+            members = sorted([(key, self.dumps_bytes(value)) for key, value in scalars.items()] + fragments)
+            return b'{' + b','.join(self.dumps_bytes(key) + b':' + encoded for key, encoded in members) + b'}'
+        encoded = self.dumps_bytes(scalars)
+        spliced = b','.join(self.dumps_bytes(key) + b':' + fragment for key, fragment in fragments)
+        return encoded[:-1] + (b',' if scalars else b'') + spliced + b'}'
+
+
+def _inflate(document):
+    """Decodes a RawBSONDocument (including embedded documents) to a dict."""
+    return decode(document.raw, _DECODE_OPTIONS)
+
+
+def raw_collection(collection):
+    """The collection, read as RawBSONDocument when JSON_RAW_BSON is enabled."""
+    if not current_app.config.get('JSON_RAW_BSON', True):
+        return collection
+    return collection.with_options(codec_options=RAW_CODEC_OPTIONS)
+
+
+def init_app(app):
+    """Installs MongoJSONProvider as the app's JSON provider."""
+    provider = MongoJSONProvider(app)
+    provider.datetime_format = app.config.get('JSON_DATETIME_FORMAT', DATETIME_HTTP)
+    app.json = provider
+    init_cache(app)
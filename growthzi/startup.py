@@ -0,0 +1,147 @@
+"""
+Startup cost accounting and preloading.
+
+create_app() times each initialization step with timed(); the results are
+kept in app.extensions['growthzi_startup'] and logged once at INFO level.
+
+Running this module prints a per-module breakdown of import cost (from
+`python -X importtime`) next to the initialization steps, measured in a
+fresh interpreter so nothing is already imported:
+
+    python -m growthzi.startup
+    python -m growthzi.startup --json
+"""
+import argparse
+import contextlib
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+
+logger = logging.getLogger('growthzi.startup')
+
+_CHILD_ENV = 'GROWTHZI_STARTUP_REPORT_CHILD'
+
+
+class StartupTimer:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = []  # (name, seconds)
+
+    @contextlib.contextmanager
+    def timed(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - started))
+
+    def total(self):
+        return time.perf_counter() - self.started
+
+    def as_dict(self):
+        return {
+            "total_ms": round(self.total() * 1000, 2),
+            "phases": [{"name": name, "ms": round(seconds * 1000, 2)} for name, seconds in self.phases],
+        }
+
+
+# --- Preloading ---
+# With gunicorn --preload the app is created once in the master and workers
+# are forked from it. Anything built here is shared copy-on-write instead of
+# being rebuilt by every worker. Only read-only state belongs here: pools,
+# threads and MongoDB connections are per process and are (re)created lazily
+# after the fork.
+
+def preload(app):
+    from . import ai, db
+    from .utils import principals
+    with app.app_context():
+        client = ai.get_model_client(app)
+        if hasattr(client, 'preload'):
+            client.preload()
+        for name in app.jinja_env.list_templates():
+            app.jinja_env.get_template(name)
+        principals.get_role_table(db.get_db())
+    # The master must not hand its sockets to the workers.
+    db.close_client()
+
+
+# --- Import cost report ---
+
+def _parse_importtime(stderr):
+    """Returns {module: (self_us, cumulative_us)} from -X importtime output."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|')
+            modules[name.strip()] = (int(self_us), int(cumulative_us))
+        except ValueError:
+            continue
+    return modules
+
+
+def _group(name):
+    if name == 'growthzi' or name.startswith('growthzi.'):
+        return name
+    parts = name.split('.')
+    return '.'.join(parts[:2]) if parts[0] == 'google' else parts[0]
+
+
+def import_costs(modules):
+    """Sums self time by growthzi module and by top-level third-party package."""
+    groups = {}
+    for name, (self_us, _) in modules.items():
+        key = _group(name)
+        groups[key] = groups.get(key, 0) + self_us
+    return sorted(groups.items(), key=lambda item: item[1], reverse=True)
+
+
+def measure():
+    """Creates the app in a fresh interpreter and returns the startup report."""
+    env = dict(os.environ, **{_CHILD_ENV: '1'})
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-m', 'growthzi.startup'],
+        env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"create_app() failed:\n{result.stderr[-4000:]}")
+    init = json.loads(result.stdout.strip().splitlines()[-1])
+    costs = import_costs(_parse_importtime(result.stderr))
+    return {
+        "imports": [{"module": name, "ms": round(us / 1000, 2)} for name, us in costs],
+        "import_total_ms": round(sum(us for _, us in costs) / 1000, 2),
+        "init": init,
+    }
+
+
+def main(argv=None):
+    if os.environ.get(_CHILD_ENV):
+        from . import create_app
+        app = create_app()
+        print(json.dumps(app.extensions['growthzi_startup'].as_dict()))
+        return
+
+    parser = argparse.ArgumentParser(description="Report import and initialization cost of create_app().")
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON.')
+    parser.add_argument('--top', type=int, default=20, help='Number of modules to list.')
+    args = parser.parse_args(argv)
+
+    report = measure()
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print(f"Imports: {report['import_total_ms']:.1f} ms")
+    for item in report['imports'][:args.top]:
+        print(f"  {item['module']:<40}{item['ms']:>10.1f} ms")
+    print(f"create_app(): {report['init']['total_ms']:.1f} ms")
+    for phase in report['init']['phases']:
+        print(f"  {phase['name']:<40}{phase['ms']:>10.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    A small thread-safe LRU cache with per-entry expiry.
+    - maxsize: Maximum number of entries kept; the least recently used is evicted first.
+    - ttl: Seconds an entry stays valid. None keeps entries until evicted.
+    """
+
+    def __init__(self, maxsize=1024, ttl=None, name=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.name = name
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= now:
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=_MISSING):
+        ttl = self.ttl if ttl is _MISSING else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+        return default if entry is _MISSING else entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+
+class SizedLRUCache:
+    """
+    A thread-safe LRU cache bounded by both entry count and total byte size.
+    - sizeof: Callable returning the size in bytes of a stored value.
+      set() also takes an explicit size, e.g. to count a large key.
+    """
+
+    def __init__(self, maxsize=1024, max_bytes=64 * 1024 * 1024, sizeof=len, name=None):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.name = name
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, size=None):
+        if size is None:
+            size = self.sizeof(value)
+        if size > self.max_bytes:
+            # Never let one oversized value flush the whole cache.
+            return
+        with self._lock:
+            old = self._data.pop(key, _MISSING)
+            if old is not _MISSING:
+                self.current_bytes -= old[1]
+            self._data[key] = (value, size)
+            self.current_bytes += size
+            while len(self._data) > self.maxsize or self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._data.popitem(last=False)
+                self.current_bytes -= evicted_size
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            self.current_bytes -= entry[1]
+            return entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.current_bytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
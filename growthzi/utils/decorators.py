@@ -1,65 +1,163 @@
+import asyncio
 from functools import wraps
+import logging
 import jwt
 from flask import request, jsonify, current_app, g
-from bson import ObjectId
 from ..db import get_db
+from .principals import resolve_principal, cached_principal, principal_from_claims, has_any_permission
+from . import permissions as permission_registry
+from .. import ratelimit
 
-def permission_required(*permissions):
+logger = logging.getLogger('growthzi.auth')
+
+class _Denied(Exception):
+    """The request may not proceed; answered with {"error": message} and status."""
+
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+
+def _token_payload():
+    """Returns the verified JWT payload from the Authorization header."""
+    auth_header = request.headers.get('Authorization')
+
+    if not auth_header or not auth_header.startswith('Bearer '):
+        logger.debug("permission check failed", extra={"reason": "missing_authorization", "path": request.path})
+        raise _Denied("Authorization header is missing or invalid", 401)
+
+    try:
+        token = auth_header.split(" ")[1]
+        payload = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=["HS256"])
+        payload['user_id']
+        return payload
+    except jwt.ExpiredSignatureError:
+        logger.debug("permission check failed", extra={"reason": "token_expired"})
+        raise _Denied("Token has expired", 401)
+    except (jwt.InvalidTokenError, KeyError, Exception) as e:
+        raise _invalid_token(e)
+
+
+def _invalid_token(error):
+    logger.debug("permission check failed", extra={"reason": "invalid_token", "error": str(error)})
+    return _Denied("Invalid token", 401)
+
+
+def _claims_principal(payload):
+    if current_app.config.get('JWT_EMBED_PERMISSIONS'):
+        return principal_from_claims(payload)
+    return None, None
+
+
+def _resolve(payload):
+    user, role = _claims_principal(payload)
+    if user is None:
+        user, role = resolve_principal(get_db(), payload['user_id'])
+    return user, role
+
+
+def _admit(payload, user, role, required_mask, permissions, ownership):
+    """Checks the principal against the route's requirement and records it in g."""
+    user_id = payload['user_id']
+    if not user:
+        logger.debug("permission check failed", extra={"reason": "user_not_found", "user_id": user_id})
+        raise _Denied("User not found", 401)
+
+    if not role:
+        logger.warning("user has no valid role", extra={"user_id": user_id, "role_id": str(user.get('role_id'))})
+        raise _Denied("User role not found. Data integrity issue.", 500)
+
+    # Check if the user has ANY of the required permissions
+    if not has_any_permission(role, required_mask):
+        logger.debug("permission denied", extra={"user_id": user_id, "role": role['name'], "required": permissions})
+        raise _Denied("Forbidden: You don't have the required permission for this action", 403)
+
+    g.current_user = user
+    g.current_user_role = role
+    g.ownership_filter = ownership.filter(user, role) if ownership else {}
+
+
+def permission_required(*permissions, ownership=None):
     """
     A decorator to protect routes with role-based permissions.
     - permissions: A list of permission strings. The user must have at least ONE.
+    - ownership: Optional permissions.Ownership policy. Its Mongo filter for
+      the current user is stored in g.ownership_filter for the view to merge
+      into its query.
+    The requirement is compiled to a bitmask once, when the route is decorated.
     """
+    required_mask = permission_registry.mask(*permissions)
+
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
-            print("\n--- PERMISSION CHECK INITIATED ---") # DEBUG
-            db = get_db()
-            auth_header = request.headers.get('Authorization')
-            
-            if not auth_header or not auth_header.startswith('Bearer '):
-                print("DEBUG: No or invalid Authorization header.")
-                return jsonify({"error": "Authorization header is missing or invalid"}), 401
+            try:
+                payload = _token_payload()
+                try:
+                    user, role = _resolve(payload)
+                except Exception as e:
+                    raise _invalid_token(e)
+                _admit(payload, user, role, required_mask, permissions, ownership)
+            except _Denied as e:
+                return jsonify({"error": str(e)}), e.status
+
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
 
+def async_permission_required(*permissions, ownership=None):
+    """
+    permission_required for coroutine views (see growthzi.asgi), with the
+    same checks and responses. Users already in the principal cache are
+    admitted without I/O; otherwise the lookup runs on a worker thread so
+    the event loop never waits on MongoDB.
+    """
+    required_mask = permission_registry.mask(*permissions)
+
+    def decorator(f):
+        @wraps(f)
+        async def decorated_function(*args, **kwargs):
             try:
-                token = auth_header.split(" ")[1]
-                payload = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=["HS256"])
-                user_id = payload['user_id']
-                print(f"DEBUG: Token decoded. User ID: {user_id}")
-
-                user = db.users.find_one({"_id": ObjectId(user_id)})
-                if not user:
-                    print(f"DEBUG: User with ID {user_id} NOT FOUND in database.")
-                    return jsonify({"error": "User not found"}), 401
-
-                print(f"DEBUG: User found: {user['email']}")
-
-                role = db.roles.find_one({"_id": user.get('role_id')})
-                if not role:
-                    print(f"DEBUG: Role NOT FOUND for user {user['email']}. Role ID was: {user.get('role_id')}")
-                    return jsonify({"error": "User role not found. Data integrity issue."}), 500
-                
-                print(f"DEBUG: User role found: {role['name']}")
-
-                user_permissions = role.get('permissions', [])
-                print(f"DEBUG: User permissions: {user_permissions}")
-                print(f"DEBUG: Required permissions (any of): {permissions}")
-                
-                # Check if the user has ANY of the required permissions
-                if not any(p in user_permissions for p in permissions):
-                    print("DEBUG: PERMISSION DENIED. User does not have any of the required permissions.")
-                    return jsonify({"error": "Forbidden: You don't have the required permission for this action"}), 403
-
-                print("DEBUG: PERMISSION GRANTED.")
-                g.current_user = user
-                g.current_user_role = role
-
-            except jwt.ExpiredSignatureError:
-                print("DEBUG: Token has expired.")
-                return jsonify({"error": "Token has expired"}), 401
-            except (jwt.InvalidTokenError, KeyError, Exception) as e:
-                print(f"DEBUG: Invalid token or other error: {e}")
-                return jsonify({"error": "Invalid token"}), 401
-            
+                payload = _token_payload()
+                try:
+                    user, role = _claims_principal(payload)
+                    if user is None:
+                        user, role = cached_principal(payload['user_id'])
+                    if user is None:
+                        user, role = await asyncio.to_thread(_resolve, payload)
+                except Exception as e:
+                    raise _invalid_token(e)
+                _admit(payload, user, role, required_mask, permissions, ownership)
+            except _Denied as e:
+                return jsonify({"error": str(e)}), e.status
+
+            return await f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+
+def rate_limit(group, cost=1):
+    """
+    Applies the RATE_LIMIT_<GROUP> token buckets (per user, role and/or IP)
+    to a route; see growthzi.ratelimit. Place it under permission_required
+    so the user is known. Works for sync and coroutine views.
+    """
+    def decorator(f):
+        if asyncio.iscoroutinefunction(f):
+            @wraps(f)
+            async def decorated_coroutine(*args, **kwargs):
+                refused = ratelimit.check(group, cost)
+                if refused is not None:
+                    return refused
+                return await f(*args, **kwargs)
+            return decorated_coroutine
+
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            refused = ratelimit.check(group, cost)
+            if refused is not None:
+                return refused
             return f(*args, **kwargs)
         return decorated_function
-    return decorator
\ No newline at end of file
+    return decorator
@@ -0,0 +1,147 @@
+import base64
+import datetime
+import json
+from bson import ObjectId
+from flask import Response, current_app, stream_with_context
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+class PaginationError(ValueError):
+    """A pagination or filter query parameter could not be parsed."""
+
+
+def parse_limit(value):
+    """Returns the page size from a query value; None means 'not paginated'."""
+    if value in (None, ''):
+        return None
+    try:
+        limit = int(value)
+    except ValueError:
+        raise PaginationError("limit must be an integer")
+    if limit < 1:
+        raise PaginationError("limit must be positive")
+    return min(limit, current_app.config.get('PAGINATION_MAX_LIMIT', MAX_PAGE_SIZE))
+
+
+def parse_datetime(value, name):
+    if value in (None, ''):
+        return None
+    try:
+        return datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise PaginationError(f"{name} must be an ISO 8601 date or datetime")
+
+
+def parse_object_id(value, name):
+    try:
+        return ObjectId(value)
+    except Exception:
+        raise PaginationError(f"{name} is not a valid id")
+
+
+# --- Opaque keyset cursors ---
+# A cursor holds the sort key of the last item on a page. Pages are ordered
+# newest first, so the next page is everything strictly "before" that key.
+
+def encode_cursor(doc, time_field=None):
+    payload = {"i": str(doc['_id'])}
+    if time_field:
+        value = doc.get(time_field)
+        payload["t"] = value.isoformat() if value else None
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, time_field=None):
+    """
+    Returns the key in a cursor from encode_cursor(doc, time_field). A
+    cursor made for a different ordering (e.g. another endpoint's) is
+    rejected with PaginationError like a malformed one.
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        key = {"_id": ObjectId(payload["i"])}
+        if bool(time_field) != ("t" in payload):
+            raise ValueError("cursor does not match the sort order")
+        if time_field:
+            key["t"] = datetime.datetime.fromisoformat(payload["t"]) if payload["t"] else None
+        return key
+    except Exception:
+        raise PaginationError("cursor is invalid")
+
+
+def keyset_filter(key, time_field=None):
+    """Mongo filter selecting documents after the cursor key in newest-first order."""
+    if key is None:
+        return {}
+    if not time_field:
+        return {"_id": {"$lt": key["_id"]}}
+    return {"$or": [
+        {time_field: {"$lt": key["t"]}},
+        {time_field: key["t"], "_id": {"$lt": key["_id"]}},
+    ]}
+
+
+def sort_spec(time_field=None):
+    if time_field:
+        return [(time_field, -1), ("_id", -1)]
+    return [("_id", -1)]
+
+
+def combine_filters(*filters):
+    filters = [f for f in filters if f]
+    if not filters:
+        return {}
+    if len(filters) == 1:
+        return filters[0]
+    return {"$and": filters}
+
+
+# --- Streamed JSON responses ---
+# Items are encoded one at a time with the app's JSON provider, so a worker
+# never holds a whole result set in memory.
+
+def stream_json_array(items, serialize):
+    """Streams a JSON array of serialize(item) for each item."""
+    dumps = current_app.json.dumps
+
+    def generate():
+        yield '['
+        first = True
+        for item in items:
+            if not first:
+                yield ','
+            first = False
+            yield dumps(serialize(item))
+        yield ']'
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
+
+def stream_json_page(items, serialize, limit, time_field=None):
+    """
+    Streams {"items": [...], "next_cursor": ..., "limit": n}. The cursor is
+    computed from the last item, so it is written after the items.
+    """
+    dumps = current_app.json.dumps
+
+    def generate():
+        yield '{"items":['
+        count = 0
+        cursor = None
+        for item in items:
+            if count:
+                yield ','
+            count += 1
+            # Capture the cursor before serialize() may rewrite the item.
+            cursor = encode_cursor(item, time_field)
+            yield dumps(serialize(item))
+        next_cursor = cursor if count == limit else None
+        yield '],"next_cursor":' + dumps(next_cursor) + ',"limit":' + str(limit) + '}'
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
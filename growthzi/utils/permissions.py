@@ -0,0 +1,76 @@
+import threading
+
+# --- Permission registry ---
+# Every permission name is interned once and given a bit. Roles are compiled
+# to an integer mask when the role table is loaded, and each route compiles
+# its requirement when it is decorated, so an authorization check is a single
+# bitwise AND. Names found in the database that are not listed here are
+# registered the first time they are seen.
+
+KNOWN_PERMISSIONS = (
+    "users:manage",
+    "roles:manage",
+    "websites:create",
+    "websites:read_all",
+    "websites:read_own",
+    "websites:edit_all",
+    "websites:edit_own",
+    "websites:delete_all",
+    "websites:delete_own",
+)
+
+_bits = {}
+_lock = threading.Lock()
+
+
+def register(name):
+    """Returns the bit for a permission name, assigning one if it is new."""
+    bit = _bits.get(name)
+    if bit is None:
+        with _lock:
+            bit = _bits.get(name)
+            if bit is None:
+                bit = _bits[name] = 1 << len(_bits)
+    return bit
+
+
+def mask(*names):
+    """Compiles permission names to a bitmask."""
+    result = 0
+    for name in names:
+        result |= register(name)
+    return result
+
+
+def names(value):
+    """The permission names set in a mask (for logs and error messages)."""
+    return [name for name, bit in _bits.items() if value & bit]
+
+
+for _name in KNOWN_PERMISSIONS:
+    register(_name)
+
+
+class Ownership:
+    """
+    A declarative "*_all or *_own" rule. Holders of the all permission may
+    act on every document; everyone else only on documents whose `field`
+    is their user id. filter() returns that restriction as a Mongo filter
+    so it can be merged into the query that does the work.
+    """
+
+    def __init__(self, all_permission, own_permission, field='owner_id'):
+        self.all_permission = all_permission
+        self.own_permission = own_permission
+        self.all_mask = mask(all_permission)
+        self.own_mask = mask(own_permission)
+        self.field = field
+
+    def filter(self, user, role):
+        if role['permission_mask'] & self.all_mask:
+            return {}
+        return {self.field: user['_id']}
+
+    def allows(self, document, user, role):
+        """The same rule applied to a document already in memory."""
+        return bool(role['permission_mask'] & self.all_mask) or document.get(self.field) == user['_id']
@@ -0,0 +1,152 @@
+import threading
+import time
+from bson import ObjectId
+from .cache import TTLCache
+from . import permissions
+from .. import invalidation
+
+# --- Principal resolution cache ---
+# permission_required needs the user document and its role on every call.
+# Users are cached by id for a short TTL and roles are held in an in-memory
+# table (role _id -> role) that is reloaded in a single query when stale.
+# Both are per-process; call the invalidate_* helpers after a write.
+
+_principals = TTLCache(maxsize=10000, ttl=60, name='principals')
+
+_roles_lock = threading.Lock()
+_roles_by_id = {}
+_roles_loaded_at = None
+_roles_ttl = 300
+
+# The password hash is never needed after login, so it is not cached.
+USER_PROJECTION = {"password": 0}
+
+
+def init_app(app):
+    """Applies cache sizing from the app config."""
+    global _roles_ttl
+    _principals.maxsize = app.config.get('PRINCIPAL_CACHE_SIZE', _principals.maxsize)
+    _principals.ttl = app.config.get('PRINCIPAL_CACHE_TTL', _principals.ttl)
+    _roles_ttl = app.config.get('ROLE_CACHE_TTL', _roles_ttl)
+    _principals.clear()
+    invalidate_roles()
+    # Evict on writes made by other processes too.
+    invalidation.register('users', invalidate_user, _principals.clear)
+    invalidation.register('roles', _role_changed, invalidate_roles)
+
+
+def _compile_role(role):
+    role = dict(role)
+    role['permission_mask'] = permissions.mask(*role.get('permissions', []))
+    return role
+
+
+def get_role_table(db):
+    """Returns the cached {role _id: role} table, reloading it when stale."""
+    global _roles_by_id, _roles_loaded_at
+    now = time.monotonic()
+    if _roles_loaded_at is not None and now - _roles_loaded_at < _roles_ttl:
+        return _roles_by_id
+    with _roles_lock:
+        if _roles_loaded_at is None or now - _roles_loaded_at >= _roles_ttl:
+            _roles_by_id = {role['_id']: _compile_role(role) for role in db.roles.find({})}
+            _roles_loaded_at = now
+    return _roles_by_id
+
+
+def get_role(db, role_id):
+    """Looks up a role by _id, reloading the table once on a miss."""
+    role = get_role_table(db).get(role_id)
+    if role is None and role_id is not None:
+        invalidate_roles()
+        role = get_role_table(db).get(role_id)
+    return role
+
+
+def resolve_principal(db, user_id):
+    """
+    Returns (user, role) for a user id. user is None if the user does not
+    exist; role is None if the user's role is missing.
+    """
+    key = str(user_id)
+    user = _principals.get(key)
+    if user is None:
+        user = db.users.find_one({"_id": ObjectId(user_id)}, USER_PROJECTION)
+        if not user:
+            return None, None
+        _principals.set(key, user)
+    return user, get_role(db, user.get('role_id'))
+
+
+def cached_principal(user_id):
+    """
+    Returns (user, role) if both are already in memory, else (None, None).
+    Never queries the database.
+    """
+    user = _principals.get(str(user_id))
+    if user is None or _roles_loaded_at is None or time.monotonic() - _roles_loaded_at >= _roles_ttl:
+        return None, None
+    role = _roles_by_id.get(user.get('role_id'))
+    return (user, role) if role is not None else (None, None)
+
+
+def invalidate_user(user_id):
+    """Drops a cached user, e.g. after its role changed."""
+    _principals.pop(str(user_id))
+
+
+def invalidate_roles():
+    """Forces the role table to be reloaded on next use."""
+    global _roles_loaded_at
+    with _roles_lock:
+        _roles_loaded_at = None
+
+
+def _role_changed(role_id):
+    invalidate_roles()
+
+
+def has_any_permission(role, required_mask):
+    """True if the role grants at least one permission in the compiled mask."""
+    return bool(role['permission_mask'] & required_mask)
+
+
+# --- Signed permission claims ---
+# When JWT_EMBED_PERMISSIONS is on, login puts the user's role and permissions
+# in the (HS256-signed) token so most requests need no database lookup.
+# Role changes then take effect when the user next logs in.
+
+def permission_claims(user, role):
+    """Returns the extra JWT claims describing a user's role."""
+    return {
+        'email': user['email'],
+        'role': {
+            'id': str(role['_id']),
+            'name': role['name'],
+            'permissions': list(role.get('permissions', [])),
+        },
+    }
+
+
+def principal_from_claims(payload):
+    """Builds (user, role) from embedded token claims, or (None, None) if absent."""
+    role_claim = payload.get('role')
+    if not isinstance(role_claim, dict) or 'email' not in payload:
+        return None, None
+    role = _compile_role({
+        '_id': ObjectId(role_claim['id']),
+        'name': role_claim['name'],
+        'permissions': role_claim.get('permissions', []),
+    })
+    user = {
+        '_id': ObjectId(payload['user_id']),
+        'email': payload['email'],
+        'role_id': role['_id'],
+    }
+    return user, role
+
+
+def cache_stats():
+    stats = _principals.stats()
+    stats['roles'] = len(_roles_by_id)
+    return stats
@@ -0,0 +1,126 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class AttemptLimiter:
+    """
+    Counts events per key in fixed windows and reports when a key is over
+    its limit. Thread-safe and bounded; the oldest keys are dropped first.
+    - limit: Events allowed per key within one window.
+    - window: Window length in seconds, starting at the key's first event.
+    """
+
+    def __init__(self, limit, window, maxsize=100000, name=None):
+        self.limit = limit
+        self.window = window
+        self.maxsize = maxsize
+        self.name = name
+        self._data = OrderedDict()  # key -> (window_ends_at, count)
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def retry_after(self, key):
+        """Seconds until key may try again, or 0 if it is under the limit."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return 0
+            ends_at, count = entry
+            if ends_at <= now:
+                del self._data[key]
+                return 0
+            if count < self.limit:
+                return 0
+            self.rejected += 1
+            return max(1, int(ends_at - now + 0.999))
+
+    def hit(self, key):
+        now = time.monotonic()
+        with self._lock:
+            ends_at, count = self._data.get(key, (0, 0))
+            if ends_at <= now:
+                ends_at, count = now + self.window, 0
+            self._data[key] = (ends_at, count + 1)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def reset(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._data), "limit": self.limit, "window": self.window, "rejected": self.rejected}
+
+
+class TokenBucketLimiter:
+    """
+    A token bucket per key: up to `capacity` requests at once, refilled at
+    capacity / period tokens per second. Thread-safe and bounded like
+    AttemptLimiter; a dropped key simply starts again with a full bucket.
+    """
+
+    def __init__(self, capacity, period, maxsize=100000, name=None):
+        self.capacity = capacity
+        self.period = period
+        self.maxsize = maxsize
+        self.name = name
+        self._data = OrderedDict()  # key -> (tokens, updated_at)
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    @property
+    def rate(self):
+        return self.capacity / self.period
+
+    def _tokens(self, key, now):
+        tokens, updated_at = self._data.get(key, (self.capacity, now))
+        return min(self.capacity, tokens + (now - updated_at) * self.rate)
+
+    def take(self, key, cost=1):
+        """
+        Takes `cost` tokens if the bucket has them. Returns (allowed,
+        remaining, reset): the whole requests left and the seconds until
+        the bucket is full again, or, when refused, until `cost` tokens are.
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens = self._tokens(key, now)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            else:
+                self.rejected += 1
+            self._data[key] = (tokens, now)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        if not allowed:
+            return False, int(tokens), max(1, int((cost - tokens) / self.rate + 0.999))
+        return True, int(tokens), int((self.capacity - tokens) / self.rate + 0.999)
+
+    def put_back(self, key, cost=1):
+        """Returns tokens taken for a request that was refused elsewhere after all."""
+        now = time.monotonic()
+        with self._lock:
+            if key in self._data:
+                self._data[key] = (min(self.capacity, self._tokens(key, now) + cost), now)
+
+    def reset(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._data), "capacity": self.capacity, "period": self.period, "rejected": self.rejected}
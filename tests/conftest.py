@@ -0,0 +1,100 @@
+import datetime
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Configuration must be in the environment before growthzi.config is imported.
+os.environ.setdefault('JWT_SECRET_KEY', 'test-secret-key-that-is-long-enough-for-hs256')
+os.environ.setdefault('MONGO_URI', 'mongodb://localhost:27017/growthzi_test')
+os.environ.setdefault('MONGO_TLS', 'false')
+os.environ.setdefault('AI_PROVIDER', 'fake')
+os.environ.setdefault('PASSWORD_HASH_WORKERS', '0')
+os.environ.setdefault('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:1000')
+os.environ.setdefault('INVALIDATION_ENABLED', 'false')
+os.environ.setdefault('JSON_RAW_BSON', 'false')
+os.environ.setdefault('LOG_LEVEL', 'CRITICAL')
+
+mongomock = pytest.importorskip('mongomock')
+
+from werkzeug.security import generate_password_hash  # noqa: E402
+from growthzi import create_app  # noqa: E402
+from growthzi import db as growthzi_db  # noqa: E402
+from growthzi.config import Config  # noqa: E402
+
+PASSWORD = 'test-password'
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'app_config(**settings): Config overrides for the app fixture')
+
+
+@pytest.fixture
+def make_app(monkeypatch):
+    """
+    Builds an app on a fresh in-memory MongoDB. Keyword arguments override
+    Config settings, since some are read when create_app() runs.
+    """
+    def make(**config):
+        for name, value in config.items():
+            monkeypatch.setattr(Config, name, value, raising=False)
+        growthzi_db.set_client(mongomock.MongoClient(os.environ['MONGO_URI']))
+        app = create_app()
+        app.config['TESTING'] = True
+        return app
+    return make
+
+
+@pytest.fixture
+def app(request, make_app):
+    # No generation worker threads: tests run queued jobs with jobs.run_job().
+    config = {"GENERATION_WORKERS": 0}
+    # Markers closer to the test take precedence over module-level ones.
+    for marker in reversed(list(request.node.iter_markers('app_config'))):
+        config.update(marker.kwargs)
+    return make_app(**config)
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_user(app, client):
+    """Creates a user with the given role and returns (user document, auth headers)."""
+    created = []
+
+    def make(role='Editor'):
+        with app.app_context():
+            database = growthzi_db.get_db()
+            role_id = database.roles.find_one({"name": role})['_id']
+            email = f"user{len(created)}-{role.lower()}@example.com"
+            user = {"email": email, "password": generate_password_hash(PASSWORD), "role_id": role_id}
+            user['_id'] = database.users.insert_one(user).inserted_id
+        response = client.post('/api/auth/login', json={"email": email, "password": PASSWORD})
+        assert response.status_code == 200, response.get_json()
+        created.append(user)
+        return user, {"Authorization": f"Bearer {response.get_json()['token']}"}
+    return make
+
+
+@pytest.fixture
+def make_website(app):
+    """Stores a website owned by `owner` (a user document) and returns its id as a string."""
+    def make(owner, title='Cafe Bakery', **fields):
+        now = datetime.datetime.now(datetime.timezone.utc)
+        website = {
+            "owner_id": owner['_id'],
+            "created_at": now,
+            "updated_at": now,
+            "version": 1,
+            "content": {"title": title, "hero": {"headline": f"Welcome to {title}"}},
+            **fields,
+        }
+        with app.app_context():
+            return str(growthzi_db.get_db().websites.insert_one(website).inserted_id)
+    return make
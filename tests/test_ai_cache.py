@@ -0,0 +1,97 @@
+import threading
+
+import pytest
+
+from growthzi import ai, ai_cache
+
+
+class CountingClient(ai.FakeClient):
+    """The offline model, counting its calls."""
+
+    def __init__(self, latency=0.0, error=None):
+        super().__init__(latency)
+        self.error = error
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate(self, prompt):
+        with self._lock:
+            self.calls += 1
+        content = super().generate(prompt)
+        if self.error is not None:
+            raise self.error
+        return content
+
+
+def generate_concurrently(app, client, count, **kwargs):
+    results, errors = [], []
+    start = threading.Barrier(count)
+
+    def run():
+        with app.app_context():
+            start.wait()
+            try:
+                results.append(ai_cache.get_or_generate(client, "Cafe", "Bakery", **kwargs))
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=run) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def test_concurrent_misses_share_one_model_call(app):
+    client = CountingClient(latency=0.2)
+    shared_before = ai_cache.stats()['shared']
+
+    results, errors = generate_concurrently(app, client, 8)
+
+    assert not errors
+    assert client.calls == 1
+    assert len(results) == 8
+    assert all(result == results[0] for result in results)
+    assert ai_cache.stats()['shared'] - shared_before == 7
+    # Every caller gets its own copy.
+    results[0]['title'] = 'Changed'
+    assert results[1]['title'] == 'Cafe Bakery'
+
+
+def test_leader_failure_reaches_every_waiter(app):
+    client = CountingClient(latency=0.2, error=TimeoutError("upstream timed out"))
+
+    results, errors = generate_concurrently(app, client, 4)
+
+    assert not results
+    assert len(errors) == 4
+    assert all(isinstance(error, ai.GenerationError) for error in errors)
+    assert client.calls == 1
+    with app.app_context():
+        assert ai_cache.lookup("Cafe", "Bakery", client) is None
+
+
+def test_cached_content_is_reused_across_processes(app):
+    client = CountingClient()
+    with app.app_context():
+        first = ai_cache.get_or_generate(client, "Cafe", "Bakery")
+        # Inputs are compared after normalizing case and whitespace.
+        assert ai_cache.get_or_generate(client, "  cafe ", "BAKERY") == first
+        assert client.calls == 1
+
+        # Another worker has an empty local cache but shares the collection.
+        ai_cache._local.clear()
+        db_hits = ai_cache.stats()['db_hits']
+        assert ai_cache.get_or_generate(client, "Cafe", "Bakery") == first
+        assert ai_cache.stats()['db_hits'] == db_hits + 1
+        assert client.calls == 1
+
+
+@pytest.mark.parametrize('fresh, calls', [(False, 1), (True, 2)])
+def test_fresh_bypasses_the_cache(app, fresh, calls):
+    client = CountingClient()
+    with app.app_context():
+        ai_cache.get_or_generate(client, "Cafe", "Bakery")
+        ai_cache.get_or_generate(client, "Cafe", "Bakery", fresh=fresh)
+    assert client.calls == calls
@@ -0,0 +1,95 @@
+import json
+import random
+
+import pytest
+
+from growthzi import ai
+
+# Strings holding JSON punctuation and escapes must not confuse the scanner.
+TRICKY = {
+    "title": "Braces {}, brackets [] and \"quotes\"",
+    "hero": {"headline": "Fast, friendly: always", "subheading": "C:\\path\\to\\{it}", "cta_button_text": "Go ]"},
+    "about": {"title": "About Us", "text": "Line one\nline two, with a comma \u00e9"},
+    "services": [
+        {"name": "One, two", "description": "{not: an object}"},
+        {"name": "[3]", "description": "Escaped \\\" quote"},
+    ],
+}
+
+
+def model_output(document=None, indent=None):
+    if document is None:
+        return ai.FakeClient().generate(ai.build_prompt("Cafe", "Bakery"))
+    return json.dumps(document, indent=indent)
+
+
+def expected_events(document):
+    # "services" is the last member, and each service is reported on its own.
+    events = [(name, value) for name, value in document.items() if name != 'services']
+    events += [(("services", index), service) for index, service in enumerate(document['services'])]
+    return events
+
+
+def feed(chunks):
+    parser = ai.SectionParser()
+    events = []
+    for chunk in chunks:
+        events.extend(parser.feed(chunk))
+    return parser, events
+
+
+def split_at(text, positions):
+    bounds = [0, *positions, len(text)]
+    return [text[start:end] for start, end in zip(bounds, bounds[1:])]
+
+
+def check(text, chunks):
+    document = json.loads(text[text.index('{'):text.rindex('}') + 1])
+    parser, events = feed(chunks)
+    assert events == expected_events(document)
+    assert parser.document() == document
+
+
+@pytest.mark.parametrize('text', [
+    model_output(),
+    model_output(TRICKY),
+    model_output(TRICKY, indent=2),
+])
+def test_every_single_split_point(text):
+    for position in range(len(text) + 1):
+        check(text, split_at(text, [position]))
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_random_chunk_sizes(seed):
+    rng = random.Random(seed)
+    text = model_output(TRICKY, indent=rng.choice([None, 2]))
+    positions = sorted(rng.sample(range(1, len(text)), rng.randint(1, len(text) // 3)))
+    check(text, split_at(text, positions))
+
+
+def test_one_character_at_a_time():
+    text = model_output(TRICKY, indent=2)
+    check(text, list(text))
+
+
+def test_sections_are_reported_as_soon_as_they_close():
+    text = model_output()
+    parser = ai.SectionParser()
+    cut = text.index('"about"')
+    events = parser.feed(text[:cut])
+    assert [name for name, _ in events] == ['title', 'hero']
+    assert parser.document() is None
+
+    events = parser.feed(text[cut:])
+    assert [name for name, _ in events] == ['about', ('services', 0), ('services', 1), ('services', 2)]
+    assert parser.document() == json.loads(text)
+
+
+def test_markdown_fence_and_trailing_text_are_ignored():
+    text = model_output(TRICKY)
+    fenced = f"Here is your site:\n```json\n{text}\n```\nEnjoy!"
+    parser, events = feed(split_at(fenced, [5, 14, 40, len(fenced) - 6]))
+    assert parser.document_text() == text
+    assert parser.document() == TRICKY
+    assert len(events) == len(expected_events(TRICKY))
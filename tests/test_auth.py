@@ -0,0 +1,143 @@
+import pytest
+from werkzeug.security import generate_password_hash
+
+from growthzi import passwords
+from growthzi.db import get_db
+
+# The password make_user gives its users.
+PASSWORD = 'test-password'
+
+
+def login(client, email, password=PASSWORD, ip='10.0.0.1'):
+    return client.post('/api/auth/login', json={"email": email, "password": password},
+                       environ_base={"REMOTE_ADDR": ip})
+
+
+def signup(client, email, password=PASSWORD):
+    return client.post('/api/auth/signup', json={"email": email, "password": password})
+
+
+def stored_hash(app, email):
+    with app.app_context():
+        return get_db().users.find_one({"email": email})['password']
+
+
+@pytest.mark.app_config(LOGIN_MAX_FAILURES_PER_EMAIL=3, LOGIN_THROTTLE_WINDOW=600)
+def test_failures_per_email_are_throttled(client, make_user):
+    user, _ = make_user()
+    email = user['email']
+    for _ in range(3):
+        assert login(client, email, 'wrong').status_code == 401
+
+    # Refused before the password is checked, even a correct one and from
+    # another address; the email is compared case-insensitively.
+    response = login(client, email.upper(), ip='10.0.0.2')
+    assert response.status_code == 429
+    assert 0 < int(response.headers['Retry-After']) <= 600
+    assert login(client, email).status_code == 429
+
+    other, _ = make_user()
+    assert login(client, other['email']).status_code == 200
+
+
+@pytest.mark.app_config(LOGIN_MAX_FAILURES_PER_EMAIL=3)
+def test_successful_login_resets_the_email_count(client, make_user):
+    user, _ = make_user()
+    for _ in range(2):
+        login(client, user['email'], 'wrong')
+    assert login(client, user['email']).status_code == 200
+    for _ in range(2):
+        login(client, user['email'], 'wrong')
+    assert login(client, user['email']).status_code == 200
+
+
+@pytest.mark.app_config(LOGIN_MAX_FAILURES_PER_IP=3)
+def test_failures_per_ip_are_throttled(client, make_user):
+    user, _ = make_user()
+    for index in range(3):
+        assert login(client, f"nobody{index}@example.com", ip='10.0.0.9').status_code == 401
+
+    response = login(client, user['email'], ip='10.0.0.9')
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) > 0
+    assert login(client, user['email'], ip='10.0.0.10').status_code == 200
+
+
+def test_login_rehashes_outdated_hashes(app, client):
+    email = 'legacy@example.com'
+    with app.app_context():
+        database = get_db()
+        database.users.insert_one({
+            "email": email,
+            "password": generate_password_hash(PASSWORD, 'pbkdf2:sha256:500'),
+            "role_id": database.roles.find_one({"name": "Viewer"})['_id'],
+        })
+
+    assert login(client, email).status_code == 200
+    upgraded = stored_hash(app, email)
+    assert upgraded.startswith('pbkdf2:sha256:1000$')
+
+    # A current hash is left alone.
+    assert login(client, email).status_code == 200
+    assert stored_hash(app, email) == upgraded
+
+
+def test_wrong_password_keeps_the_old_hash(app, client, make_user):
+    user, _ = make_user()
+    with app.app_context():
+        get_db().users.update_one({"_id": user['_id']},
+                                  {"$set": {"password": generate_password_hash(PASSWORD, 'pbkdf2:sha256:500')}})
+    assert login(client, user['email'], 'wrong').status_code == 401
+    assert stored_hash(app, user['email']).startswith('pbkdf2:sha256:500$')
+
+
+def test_signup_creates_a_viewer(app, client):
+    response = signup(client, 'new@example.com')
+    assert response.status_code == 201
+    with app.app_context():
+        database = get_db()
+        user = database.users.find_one({"email": 'new@example.com'})
+        assert database.roles.find_one({"_id": user['role_id']})['name'] == 'Viewer'
+    assert user['password'] != PASSWORD
+    assert login(client, 'new@example.com').status_code == 200
+
+
+def test_duplicate_signup_is_a_conflict(client):
+    assert signup(client, 'twice@example.com').status_code == 201
+    response = signup(client, 'twice@example.com', 'another-password')
+    assert response.status_code == 409
+    assert response.get_json()['error'] == "User with this email already exists"
+
+
+def test_concurrent_duplicate_signup_is_a_conflict(app, client, monkeypatch):
+    hash_password = passwords.hash_password
+
+    def hash_while_another_signup_lands(password):
+        # The other request inserts the same email between our check and insert.
+        get_db().users.insert_one({"email": 'race@example.com', "password": 'x'})
+        return hash_password(password)
+
+    monkeypatch.setattr(passwords, 'hash_password', hash_while_another_signup_lands)
+    response = signup(client, 'race@example.com')
+
+    assert response.status_code == 409
+    with app.app_context():
+        assert get_db().users.count_documents({"email": 'race@example.com'}) == 1
+
+
+@pytest.mark.parametrize('body', [{}, {"email": 'a@example.com'}, {"password": PASSWORD}])
+def test_email_and_password_are_required(client, body):
+    assert client.post('/api/auth/signup', json=body).status_code == 400
+    assert client.post('/api/auth/login', json=body).status_code == 400
+
+
+def test_busy_hashing_is_a_503(client, make_user, monkeypatch):
+    user, _ = make_user()
+
+    def busy(*args):
+        raise passwords.HashingBusyError()
+
+    monkeypatch.setattr(passwords, 'verify_password', busy)
+    response = login(client, user['email'])
+    assert response.status_code == 503
+    assert response.headers['Retry-After']
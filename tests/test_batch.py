@@ -0,0 +1,119 @@
+import threading
+
+import pytest
+
+from growthzi import ai, batch
+from growthzi.db import get_db
+
+pytestmark = pytest.mark.app_config(GENERATION_BATCH_RETRIES=1, GENERATION_BATCH_BACKOFF_MS=0)
+
+
+class IndustryClient(ai.FakeClient):
+    """
+    The offline model, except that "Broken" industries always fail and
+    "Flaky" ones fail on their first call.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.calls = {}
+        self._lock = threading.Lock()
+
+    def generate(self, prompt):
+        industry = next(line.split(': ', 1)[1] for line in prompt.splitlines() if 'Industry:' in line)
+        with self._lock:
+            self.calls[industry] = self.calls.get(industry, 0) + 1
+            calls = self.calls[industry]
+        if industry.startswith('Broken') or (industry.startswith('Flaky') and calls == 1):
+            raise TimeoutError("upstream timed out")
+        return super().generate(prompt)
+
+
+def post_batch(client, headers, profiles):
+    return client.post('/api/websites/generate/batch', headers=headers, json={"profiles": profiles, "fresh": True})
+
+
+def quota_used(app, user):
+    with app.app_context():
+        usage = get_db().generation_usage.find_one({"user_id": user['_id']})
+    return usage['count'] if usage else 0
+
+
+def websites_of(app, user):
+    with app.app_context():
+        return get_db().websites.count_documents({"owner_id": user['_id']})
+
+
+def test_items_fail_independently(app, client, make_user):
+    user, headers = make_user()
+    model = IndustryClient()
+    ai.set_model_client(app, model)
+    profiles = [
+        {"business_type": "Cafe", "industry": "Bakery"},
+        {"business_type": "Cafe", "industry": "Broken oven"},
+        {"business_type": "Cafe"},
+        "Cafe, Bakery",
+        {"business_type": "Cafe", "industry": "Flaky supplier"},
+        {"business_type": "Shop", "industry": "Books"},
+    ]
+
+    response = post_batch(client, headers, profiles)
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['summary'] == {batch.ITEM_CREATED: 3, batch.ITEM_FAILED: 1, batch.ITEM_INVALID: 2}
+    results = body['results']
+    assert [result['index'] for result in results] == list(range(len(profiles)))
+    assert [result['status'] for result in results] == [
+        batch.ITEM_CREATED, batch.ITEM_FAILED, batch.ITEM_INVALID,
+        batch.ITEM_INVALID, batch.ITEM_CREATED, batch.ITEM_CREATED,
+    ]
+    assert results[0]['website']['content']['title'] == 'Cafe Bakery'
+    assert results[2]['error'] == 'industry is required'
+    # Retryable failures are retried up to GENERATION_BATCH_RETRIES times.
+    assert results[1]['attempts'] == 2
+    assert results[4]['attempts'] == 2
+    assert model.calls['Broken oven'] == 2
+    # Only the created websites are stored and charged to the quota.
+    assert websites_of(app, user) == 3
+    assert quota_used(app, user) == 3
+
+
+@pytest.mark.app_config(GENERATION_BATCH_RETRIES=0)
+def test_retries_can_be_disabled(app, client, make_user):
+    user, headers = make_user()
+    ai.set_model_client(app, IndustryClient())
+
+    body = post_batch(client, headers, [{"business_type": "Cafe", "industry": "Flaky supplier"}]).get_json()
+
+    assert body['summary'][batch.ITEM_FAILED] == 1
+    assert body['results'][0]['attempts'] == 1
+    assert quota_used(app, user) == 0
+
+
+@pytest.mark.parametrize('body', [
+    {},
+    {"profiles": []},
+    {"profiles": {"business_type": "Cafe", "industry": "Bakery"}},
+    {"profiles": [{"business_type": "Cafe", "industry": "Bakery"}] * 4},
+])
+@pytest.mark.app_config(GENERATION_BATCH_MAX_ITEMS=3)
+def test_malformed_batch_is_refused(app, client, make_user, body):
+    user, headers = make_user()
+
+    response = client.post('/api/websites/generate/batch', headers=headers, json=body)
+
+    assert response.status_code == 400
+    assert quota_used(app, user) == 0
+
+
+@pytest.mark.app_config(GENERATION_DAILY_QUOTA=2)
+def test_batch_larger_than_the_quota_is_refused(app, client, make_user):
+    user, headers = make_user()
+
+    response = post_batch(client, headers, [{"business_type": "Cafe", "industry": "Bakery"}] * 3)
+
+    assert response.status_code == 429
+    assert response.headers['Retry-After']
+    assert websites_of(app, user) == 0
+    assert quota_used(app, user) == 0
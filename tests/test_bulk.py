@@ -0,0 +1,202 @@
+import json
+
+import pytest
+from bson import ObjectId
+
+from growthzi.db import get_db
+from growthzi.routes import websites
+
+MISSING_ID = str(ObjectId())
+
+
+def bulk(client, headers, operations, ordered=True):
+    response = client.post('/api/websites/bulk', headers=headers, json={"ordered": ordered, "operations": operations})
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def stored(app, website_id):
+    with app.app_context():
+        return get_db().websites.find_one({"_id": ObjectId(website_id)})
+
+
+def outcomes(body):
+    return [(result['status'], result.get('code')) for result in body['results']]
+
+
+def test_unordered_applies_every_valid_operation(app, client, make_user, make_website):
+    editor, headers = make_user()
+    other, _ = make_user()
+    own = make_website(editor)
+    own_stale = make_website(editor)
+    foreign = make_website(other)
+    to_delete = make_website(editor)
+
+    body = bulk(client, headers, [
+        {"op": "create", "content": {"title": "New"}},
+        {"op": "patch", "id": own, "content": {"hero.headline": "Patched"}, "version": 1},
+        {"op": "update", "id": own_stale, "content": {"title": "Stale"}, "version": 7},
+        {"op": "update", "id": foreign, "content": {"title": "Not mine"}},
+        {"op": "delete", "id": MISSING_ID},
+        {"op": "delete", "id": to_delete},
+        {"op": "rename", "id": own},
+    ], ordered=False)
+
+    assert outcomes(body) == [
+        ("created", None), ("updated", None), ("error", 409), ("error", 403),
+        ("error", 404), ("deleted", None), ("error", 400),
+    ]
+    assert body['summary'] == {"created": 1, "updated": 1, "deleted": 1, "error": 4}
+    assert "current version is 1" in body['results'][2]['error']
+
+    patched = stored(app, own)
+    assert patched['content']['hero']['headline'] == 'Patched'
+    assert patched['content']['title'] == 'Cafe Bakery'
+    assert patched['version'] == 2
+    assert stored(app, own_stale)['version'] == 1
+    assert stored(app, foreign)['content']['title'] == 'Cafe Bakery'
+    assert stored(app, to_delete) is None
+    created = stored(app, body['results'][0]['id'])
+    assert created['owner_id'] == editor['_id'] and created['version'] == 1
+
+
+def test_ordered_stops_at_the_first_failure(app, client, make_user, make_website):
+    editor, headers = make_user()
+    first, second = make_website(editor), make_website(editor)
+
+    body = bulk(client, headers, [
+        {"op": "patch", "id": first, "content": {"title": "First"}},
+        {"op": "delete", "id": MISSING_ID},
+        {"op": "patch", "id": second, "content": {"title": "Second"}},
+    ])
+
+    assert outcomes(body) == [("updated", None), ("error", 404), ("skipped", None)]
+    assert stored(app, first)['content']['title'] == 'First'
+    assert stored(app, second)['content']['title'] == 'Cafe Bakery'
+
+
+def test_operation_permissions(app, client, make_user, make_website):
+    # A role that may edit its own sites but not create or delete any.
+    with app.app_context():
+        get_db().roles.insert_one({"name": "Reviser", "permissions": ["websites:read_own", "websites:edit_own"]})
+    reviser, headers = make_user('Reviser')
+    website = make_website(reviser)
+
+    body = bulk(client, headers, [
+        {"op": "create", "content": {"title": "New"}},
+        {"op": "patch", "id": website, "content": {"title": "Revised"}},
+        {"op": "delete", "id": website},
+    ], ordered=False)
+
+    assert outcomes(body) == [("error", 403), ("updated", None), ("error", 403)]
+    assert stored(app, website)['content']['title'] == 'Revised'
+
+
+def test_request_needs_a_write_permission(client, make_user):
+    _, headers = make_user('Viewer')
+    response = client.post('/api/websites/bulk', headers=headers, json={"operations": [{"op": "create", "content": {}}]})
+    assert response.status_code == 403
+
+
+def test_admin_edits_any_website(app, client, make_user, make_website):
+    _, headers = make_user('Admin')
+    owner, _ = make_user()
+    website = make_website(owner)
+
+    body = bulk(client, headers, [{"op": "update", "id": website, "content": {"title": "By admin"}}])
+
+    assert outcomes(body) == [("updated", None)]
+    assert stored(app, website)['owner_id'] == owner['_id']
+
+
+@pytest.mark.parametrize('operation, message', [
+    ({"op": "patch", "id": None, "content": {"title": "x"}}, "Invalid website id"),
+    ({"op": "patch", "id": "not-an-id", "content": {"title": "x"}}, "Invalid website id"),
+    ({"op": "patch", "id": MISSING_ID, "content": {}}, "requires a 'content' object"),
+    ({"op": "patch", "id": MISSING_ID, "content": {"$set": 1}}, "Invalid content path"),
+    ({"op": "patch", "id": MISSING_ID, "content": {"hero..x": 1}}, "Invalid content path"),
+    ({"op": "update", "id": MISSING_ID, "content": {"title": "x"}, "version": "2"}, "version must be an integer"),
+    ({"op": "create"}, "requires a 'content' object"),
+    ("delete", "op must be one of"),
+])
+def test_invalid_operations(client, make_user, operation, message):
+    _, headers = make_user()
+    [result] = bulk(client, headers, [operation])['results']
+    assert result['code'] == 400
+    assert message in result['error']
+
+
+def test_each_website_once_per_request(client, make_user, make_website):
+    editor, headers = make_user()
+    website = make_website(editor)
+
+    body = bulk(client, headers, [
+        {"op": "patch", "id": website, "content": {"title": "One"}},
+        {"op": "delete", "id": website},
+    ], ordered=False)
+
+    assert outcomes(body) == [("updated", None), ("error", 400)]
+
+
+@pytest.mark.app_config(BULK_MAX_OPERATIONS=2)
+@pytest.mark.parametrize('body', [
+    {},
+    {"operations": []},
+    {"operations": {"op": "create"}},
+    {"operations": [{"op": "create", "content": {}}] * 3},
+])
+def test_malformed_request(app, client, make_user, body):
+    _, headers = make_user()
+    response = client.post('/api/websites/bulk', headers=headers, json=body)
+    assert response.status_code == 400
+    with app.app_context():
+        assert get_db().websites.count_documents({}) == 0
+
+
+def test_concurrent_change_is_reported_as_conflict(app, client, make_user, make_website, monkeypatch):
+    editor, headers = make_user()
+    raced, untouched = make_website(editor), make_website(editor)
+
+    # Another request updates one site after the bulk request read it.
+    build = websites._bulk_request
+
+    def racing(check, payload, website):
+        if str(check[0]) == raced:
+            get_db().websites.update_one({"_id": check[0]}, {"$set": {"content.title": "Theirs"}, "$inc": {"version": 1}})
+        return build(check, payload, website)
+    monkeypatch.setattr(websites, '_bulk_request', racing)
+
+    body = bulk(client, headers, [
+        {"op": "patch", "id": raced, "content": {"title": "Ours"}},
+        {"op": "patch", "id": untouched, "content": {"title": "Ours"}},
+    ], ordered=False)
+
+    assert outcomes(body) == [("error", 409), ("updated", None)]
+    assert stored(app, raced)['content']['title'] == 'Theirs'
+    assert stored(app, raced)['version'] == 2
+    assert stored(app, untouched)['content']['title'] == 'Ours'
+
+
+def export(client, headers, **params):
+    response = client.get('/api/websites/export', headers=headers, query_string=params)
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def test_export_streams_ndjson(client, make_user, make_website):
+    editor, headers = make_user()
+    other, _ = make_user()
+    _, viewer_headers = make_user('Viewer')
+    own = [make_website(editor, title=f"Own {i}") for i in range(3)]
+    make_website(other)
+
+    # Editors only export their own sites, in id order.
+    documents = export(client, headers)
+    assert [document['_id'] for document in documents] == own
+    assert documents[0]['content']['title'] == 'Own 0'
+
+    assert len(export(client, viewer_headers)) == 4
+    summary = export(client, viewer_headers, view='summary')[0]
+    assert 'about' not in summary.get('content', {})
+    assert summary['content']['title']
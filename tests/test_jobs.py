@@ -0,0 +1,163 @@
+import datetime
+
+import pytest
+
+from growthzi import ai, ai_cache, jobs, publish
+from growthzi.db import get_db
+
+
+class FailingClient:
+    model_name = 'failing'
+
+    def generate(self, prompt):
+        raise TimeoutError("upstream timed out")
+
+
+def generate(client, headers, industry='Bakery'):
+    return client.post('/api/websites/generate', headers=headers,
+                       json={"business_type": "Cafe", "industry": industry, "fresh": True})
+
+
+def run_queued(app):
+    with app.app_context():
+        for job in list(get_db().generation_jobs.find({"status": jobs.JOB_QUEUED})):
+            jobs.run_job(job['_id'])
+
+
+def quota_used(app, user):
+    with app.app_context():
+        usage = get_db().generation_usage.find_one({"user_id": user['_id']})
+    return usage['count'] if usage else 0
+
+
+def active_slots(app, user):
+    with app.app_context():
+        slots = get_db().generation_slots.find_one({"_id": user['_id']})
+    return len(slots['jobs']) if slots else 0
+
+
+def test_job_runs_to_success(app, client, make_user):
+    user, headers = make_user()
+    response = generate(client, headers)
+    assert response.status_code == 202
+    status_url = response.headers['Location']
+    assert client.get(status_url, headers=headers).get_json()['status'] == jobs.JOB_QUEUED
+
+    run_queued(app)
+
+    job = client.get(status_url, headers=headers).get_json()
+    assert job['status'] == jobs.JOB_SUCCEEDED
+    website = client.get(f"/api/websites/{job['website_id']}", headers=headers).get_json()
+    assert website['content']['title'] == 'Cafe Bakery'
+    assert quota_used(app, user) == 1
+    assert active_slots(app, user) == 0
+
+
+def test_per_user_job_limit(app, client, make_user):
+    user, headers = make_user()
+    limit = app.config['GENERATION_MAX_JOBS_PER_USER']
+    for index in range(limit):
+        assert generate(client, headers, f"Industry {index}").status_code == 202
+
+    response = generate(client, headers, "One too many")
+    assert response.status_code == 429
+    # The refused request is not charged to the quota.
+    assert quota_used(app, user) == limit
+
+    run_queued(app)
+    assert active_slots(app, user) == 0
+    assert generate(client, headers, "After the others").status_code == 202
+
+
+def test_generation_error_fails_job_and_refunds(app, client, make_user):
+    user, headers = make_user()
+    ai.set_model_client(app, FailingClient())
+    status_url = generate(client, headers).headers['Location']
+
+    run_queued(app)
+
+    job = client.get(status_url, headers=headers).get_json()
+    assert job['status'] == jobs.JOB_FAILED
+    assert job['error']
+    assert quota_used(app, user) == 0
+    assert active_slots(app, user) == 0
+
+
+def test_unexpected_error_fails_job_and_refunds(app, client, make_user, monkeypatch):
+    user, headers = make_user()
+    status_url = generate(client, headers).headers['Location']
+
+    def broken(*args, **kwargs):
+        raise KeyError('content')
+    monkeypatch.setattr(ai_cache, 'get_or_generate', broken)
+    run_queued(app)
+
+    job = client.get(status_url, headers=headers).get_json()
+    assert job['status'] == jobs.JOB_FAILED
+    assert job['error'] == 'Website generation failed'
+    assert quota_used(app, user) == 0
+    assert active_slots(app, user) == 0
+
+
+@pytest.mark.parametrize('status', [jobs.JOB_QUEUED, jobs.JOB_RUNNING])
+def test_stale_job_is_failed_on_read(app, client, make_user, status):
+    user, headers = make_user()
+    status_url = generate(client, headers).headers['Location']
+    # As if the worker holding the job had been restarted long ago.
+    created_at = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(
+        seconds=app.config['GENERATION_JOB_TIMEOUT'] + 60
+    )
+    with app.app_context():
+        get_db().generation_jobs.update_many({}, {"$set": {"status": status, "created_at": created_at}})
+
+    job = client.get(status_url, headers=headers).get_json()
+    assert job['status'] == jobs.JOB_FAILED
+    assert job['error'] == 'Generation timed out'
+    assert quota_used(app, user) == 0
+    assert active_slots(app, user) == 0
+    # A later run of the lost job does nothing.
+    run_queued(app)
+    assert client.get(status_url, headers=headers).get_json()['status'] == jobs.JOB_FAILED
+
+
+def test_full_queue_refuses_and_refunds(app, client, make_user):
+    user, headers = make_user()
+    # The queue is created on the first submit.
+    jobs.get_job_queue(app).max_queue = 1
+    assert generate(client, headers, "Queued").status_code == 202
+
+    response = generate(client, headers, "Refused")
+    assert response.status_code == 503
+    assert response.headers['Retry-After']
+    assert quota_used(app, user) == 1
+    assert active_slots(app, user) == 1
+    with app.app_context():
+        assert get_db().generation_jobs.count_documents({}) == 1
+
+
+def test_job_expired_during_generation_keeps_no_website(app, client, make_user, monkeypatch):
+    user, headers = make_user()
+    status_url = generate(client, headers).headers['Location']
+    generate_content = ai_cache.get_or_generate
+    published = []
+
+    def slow(*args, **kwargs):
+        # The job times out while the model is still running.
+        created_at = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(
+            seconds=app.config['GENERATION_JOB_TIMEOUT'] + 60
+        )
+        get_db().generation_jobs.update_many({}, {"$set": {"created_at": created_at}})
+        jobs.expire_stale_jobs(user['_id'])
+        return generate_content(*args, **kwargs)
+    monkeypatch.setattr(ai_cache, 'get_or_generate', slow)
+    monkeypatch.setattr(publish, 'schedule', lambda *ids: published.extend(ids))
+    run_queued(app)
+
+    job = client.get(status_url, headers=headers).get_json()
+    assert job['status'] == jobs.JOB_FAILED
+    assert job['website_id'] is None
+    assert quota_used(app, user) == 0
+    assert active_slots(app, user) == 0
+    assert published == []
+    with app.app_context():
+        assert get_db().websites.count_documents({}) == 0
@@ -0,0 +1,40 @@
+import re
+
+
+def scrape(client):
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    text = response.get_data(as_text=True)
+    types = dict(re.findall(r'^# TYPE (\S+) (\S+)$', text, re.MULTILINE))
+    return text, types
+
+
+def sample(text, name, **labels):
+    label_text = ','.join(f'{key}="{value}"' for key, value in labels.items())
+    match = re.search(rf'^{re.escape(name)}\{{{re.escape(label_text)}\}} (\S+)$', text, re.MULTILINE)
+    return float(match.group(1)) if match else None
+
+
+def test_totals_are_counters_and_sizes_are_gauges(client):
+    _, types = scrape(client)
+    assert types['growthzi_cache_events_total'] == 'counter'
+    assert types['growthzi_cache_size'] == 'gauge'
+    assert types['growthzi_cache_hit_ratio'] == 'gauge'
+    assert 'growthzi_cache_events' not in types
+    for name, kind in types.items():
+        if kind == 'counter':
+            assert name.endswith('_total'), name
+
+
+def test_cache_events_count_lookups(client, make_user, make_website):
+    editor, _ = make_user()
+    website_id = make_website(editor)
+    text, _ = scrape(client)
+    hits = sample(text, 'growthzi_cache_events_total', cache='preview', kind='hits') or 0
+
+    client.get(f'/preview/{website_id}')
+    client.get(f'/preview/{website_id}')
+
+    text, _ = scrape(client)
+    assert sample(text, 'growthzi_cache_events_total', cache='preview', kind='hits') == hits + 1
+    assert sample(text, 'growthzi_cache_size', cache='preview') >= 1
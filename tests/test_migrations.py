@@ -0,0 +1,139 @@
+import datetime
+
+import pytest
+
+from growthzi import migrations
+from growthzi.db import get_db
+
+
+def index_keys(collection):
+    return {tuple(info['key']): info for info in collection.index_information().values()}
+
+
+@pytest.fixture
+def database(app):
+    with app.app_context():
+        yield get_db()
+
+
+def behind(database, version=2):
+    database.schema_migrations.update_one({"_id": migrations.MARKER_ID}, {"$set": {"version": version}})
+
+
+def test_new_database_is_migrated_on_startup(database):
+    assert migrations.current_version(database) == migrations.SCHEMA_VERSION
+    assert sorted(role['name'] for role in database.roles.find()) == ['Admin', 'Editor', 'Viewer']
+    assert database.users.count_documents({"email": "admin@growthzi.com"}) == 1
+    # The lock is released once the work is done.
+    assert database.schema_migrations.find_one({"_id": migrations.LOCK_ID}) is None
+
+
+def test_indexes_are_created(database):
+    users = index_keys(database.users)
+    assert users[(('email', 1),)]['unique'] is True
+    assert (('created_at', -1), ('_id', -1)) in users
+    assert index_keys(database.roles)[(('name', 1),)]['unique'] is True
+
+    websites = index_keys(database.websites)
+    assert (('owner_id', 1), ('created_at', -1)) in websites
+    assert (('updated_at', 1),) in websites
+
+    assert index_keys(database.generation_cache)[(('expires_at', 1),)]['expireAfterSeconds'] == 0
+    assert index_keys(database.generation_jobs)[(('created_at', 1),)]['expireAfterSeconds'] == 7 * 24 * 3600
+    usage = index_keys(database.generation_usage)
+    assert usage[(('expires_at', 1),)]['expireAfterSeconds'] == 0
+    assert (('day', 1), ('count', -1)) in usage
+
+
+def test_rerunning_is_a_no_op(app, database, monkeypatch):
+    marker = database.schema_migrations.find_one({"_id": migrations.MARKER_ID})
+
+    assert migrations.upgrade(database) == []
+    assert database.schema_migrations.find_one({"_id": migrations.MARKER_ID}) == marker
+    assert database.roles.count_documents({}) == 3
+    assert database.users.count_documents({}) == 1
+
+    # Startup against a current schema only reads the marker.
+    monkeypatch.setattr(migrations, 'upgrade', lambda *args: pytest.fail("upgrade() was called"))
+    migrations.ensure_schema(app)
+
+
+def test_pending_migrations_are_applied_in_order(database):
+    behind(database, 2)
+    assert migrations.upgrade(database, target=3) == [3]
+    assert migrations.current_version(database) == 3
+    assert migrations.upgrade(database) == [4]
+    # Seeding again would not duplicate anything either.
+    migrations.seed_database(database)
+    assert database.roles.count_documents({}) == 3
+    assert database.users.count_documents({}) == 1
+
+
+def test_only_one_process_migrates_at_a_time(database):
+    owner = migrations._acquire_lock(database)
+    assert owner
+    behind(database)
+
+    assert migrations._acquire_lock(database) is None
+    assert migrations.upgrade(database) is None
+    assert migrations.current_version(database) == 2
+
+    migrations._release_lock(database, owner)
+    assert migrations.upgrade(database) == [3, 4]
+
+
+def test_an_expired_lock_is_taken_over(database):
+    migrations._acquire_lock(database)
+    expired = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=1)
+    database.schema_migrations.update_one({"_id": migrations.LOCK_ID},
+                                          {"$set": {"owner": "crashed:1", "expires_at": expired}})
+    behind(database)
+
+    assert migrations.upgrade(database) == [3, 4]
+
+
+def test_startup_waits_for_another_process(app, database, monkeypatch):
+    migrations._acquire_lock(database)
+    behind(database)
+    applied = []
+    monkeypatch.setattr(migrations, 'MIGRATIONS', [
+        (number, description, lambda db, number=number: applied.append(number))
+        for number, description, _ in migrations.MIGRATIONS
+    ])
+    # While this worker waits, the lock holder finishes the migration.
+    monkeypatch.setattr(migrations.time, 'sleep', lambda seconds: behind(database, migrations.SCHEMA_VERSION))
+
+    migrations.ensure_schema(app)
+
+    assert applied == []
+    assert migrations.current_version(database) == migrations.SCHEMA_VERSION
+
+
+@pytest.mark.parametrize('settings', [{"AUTO_MIGRATE": False}, {"MIGRATION_WAIT_SECONDS": 0}])
+def test_startup_does_not_migrate_when_it_may_not(app, database, settings):
+    app.config.update(settings)
+    if 'MIGRATION_WAIT_SECONDS' in settings:
+        migrations._acquire_lock(database)
+    behind(database)
+
+    migrations.ensure_schema(app)
+
+    assert migrations.current_version(database) == 2
+
+
+def test_cli_commands(app, database):
+    runner = app.test_cli_runner()
+    assert 'Schema is up to date.' in runner.invoke(args=['db', 'upgrade']).output
+
+    behind(database)
+    output = runner.invoke(args=['db', 'status']).output
+    assert 'Applied schema version: 2' in output
+    assert '3: Index updated_at for cache invalidation polling [pending]' in output
+
+    owner = migrations._acquire_lock(database)
+    result = runner.invoke(args=['db', 'upgrade'])
+    assert result.exit_code != 0
+    assert 'Another process is running migrations' in result.output
+    migrations._release_lock(database, owner)
+
+    assert 'Applied migrations: 3, 4' in runner.invoke(args=['db', 'upgrade']).output
@@ -0,0 +1,120 @@
+import datetime
+
+import pytest
+from bson import ObjectId
+
+from growthzi.utils import pagination
+
+START = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def get_json(client, url, headers, **params):
+    # Lists are streamed; read them so the request context is closed in order.
+    with client.get(url, headers=headers, query_string=params) as response:
+        return response.status_code, response.get_json()
+
+
+@pytest.fixture
+def sites(make_user, make_website):
+    """Seven websites of one editor, a day apart, and two of another user."""
+    editor, headers = make_user()
+    other, _ = make_user()
+    ids = [
+        make_website(editor, title=f"Site {day}", created_at=START + datetime.timedelta(days=day))
+        for day in range(7)
+    ]
+    # Two sites created at the same moment are ordered by id.
+    ids += [make_website(other, title=f"Other {i}", created_at=START + datetime.timedelta(days=10)) for i in range(2)]
+    return editor, headers, ids
+
+
+def titles(items):
+    return [item['content']['title'] for item in items]
+
+
+def test_pages_follow_the_cursor_to_the_end(client, sites):
+    _, headers, _ = sites
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 4, **({"cursor": cursor} if cursor else {})}
+        status, page = get_json(client, '/api/websites/', headers, **params)
+        assert status == 200
+        assert page['limit'] == 4
+        seen += titles(page['items'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+
+    assert seen == ['Other 1', 'Other 0'] + [f"Site {day}" for day in range(6, -1, -1)]
+
+
+def test_unpaginated_list_is_an_array(client, sites):
+    _, headers, ids = sites
+    status, items = get_json(client, '/api/websites/', headers)
+    assert status == 200
+    assert len(items) == len(ids)
+
+
+@pytest.mark.app_config(PAGINATION_DEFAULT_LIMIT=3, PAGINATION_MAX_LIMIT=5)
+def test_page_size_defaults_and_bounds(client, sites):
+    _, headers, _ = sites
+    _, first = get_json(client, '/api/websites/', headers, limit=2)
+    # A cursor alone uses the default page size.
+    _, page = get_json(client, '/api/websites/', headers, cursor=first['next_cursor'])
+    assert page['limit'] == 3
+    assert len(page['items']) == 3
+    _, page = get_json(client, '/api/websites/', headers, limit=100)
+    assert page['limit'] == 5
+
+
+def test_summary_view(client, sites):
+    _, headers, _ = sites
+    _, page = get_json(client, '/api/websites/', headers, limit=1, view='summary')
+    [item] = page['items']
+    assert set(item) == {'_id', 'owner_id', 'created_at', 'updated_at', 'content'}
+    assert item['content'] == {"title": "Other 1", "hero": {"headline": "Welcome to Other 1"}}
+
+
+def test_owner_and_date_filters(client, sites):
+    editor, headers, _ = sites
+    _, items = get_json(client, '/api/websites/', headers, owner='me')
+    assert len(items) == 7
+    _, items = get_json(client, '/api/websites/', headers, owner=str(editor['_id']),
+                        created_after='2026-01-03', created_before='2026-01-05T00:00:00Z')
+    assert titles(items) == ['Site 3', 'Site 2']
+
+
+@pytest.mark.parametrize('params', [
+    {"limit": "ten"},
+    {"limit": "0"},
+    {"cursor": "not-a-cursor"},
+    {"owner": "nobody"},
+    {"created_after": "yesterday"},
+    {"view": "everything"},
+])
+def test_bad_input_is_a_400(client, sites, params):
+    _, headers, _ = sites
+    status, body = get_json(client, '/api/websites/', headers, **params)
+    assert status == 400
+    assert body['error']
+
+
+def test_cursor_from_another_list_is_a_400(client, make_user, sites):
+    _, headers, _ = sites
+    _, admin_headers = make_user('Admin')
+    _, users = get_json(client, '/api/admin/users', admin_headers, limit=1)
+    _, websites = get_json(client, '/api/websites/', headers, limit=1)
+
+    status, body = get_json(client, '/api/websites/', headers, cursor=users['next_cursor'])
+    assert (status, body['error']) == (400, "cursor is invalid")
+    status, _ = get_json(client, '/api/admin/users', admin_headers, cursor=websites['next_cursor'])
+    assert status == 400
+
+
+def test_cursor_round_trip():
+    doc = {"_id": ObjectId(), "created_at": START}
+    key = pagination.decode_cursor(pagination.encode_cursor(doc, 'created_at'), 'created_at')
+    assert key == {"_id": doc['_id'], "t": START}
+    assert pagination.decode_cursor(pagination.encode_cursor(doc)) == {"_id": doc['_id']}
+    assert pagination.decode_cursor('') is None
@@ -0,0 +1,107 @@
+import pytest
+from bson import ObjectId
+
+from growthzi.db import get_db
+
+
+def url(website_id):
+    return f'/api/websites/{website_id}'
+
+
+def exists(app, website_id):
+    with app.app_context():
+        return get_db().websites.count_documents({"_id": ObjectId(website_id)}) == 1
+
+
+@pytest.fixture
+def sites(make_user, make_website):
+    """An editor's own site and a site of another editor."""
+    editor, headers = make_user()
+    other, _ = make_user()
+    return headers, make_website(editor), make_website(other)
+
+
+def write(client, method, website_id, headers):
+    if method == 'delete':
+        return client.delete(url(website_id), headers=headers)
+    return client.open(url(website_id), method=method.upper(), headers=headers, json={"content": {"title": "Changed"}})
+
+
+@pytest.mark.parametrize('role', ['Viewer', 'Editor', 'Admin'])
+def test_every_role_reads_every_site(client, make_user, sites, role):
+    _, own, foreign = sites
+    _, headers = make_user(role)
+    for website_id in (own, foreign):
+        response = client.get(url(website_id), headers=headers)
+        assert response.status_code == 200
+        assert response.get_json()['_id'] == website_id
+    assert client.get(url(ObjectId()), headers=headers).status_code == 404
+
+
+@pytest.mark.parametrize('method', ['put', 'patch', 'delete'])
+def test_editor_writes_only_their_own_sites(app, client, sites, method):
+    headers, own, foreign = sites
+
+    response = write(client, method, foreign, headers)
+    assert response.status_code == 403
+    assert 'your own websites' in response.get_json()['error']
+    assert exists(app, foreign)
+
+    assert write(client, method, own, headers).status_code == 200
+    # A missing site is a 404, not a 403.
+    assert write(client, method, ObjectId(), headers).status_code == 404
+
+
+@pytest.mark.parametrize('method', ['put', 'patch', 'delete'])
+def test_viewer_cannot_write(client, make_user, make_website, method):
+    viewer, headers = make_user('Viewer')
+    # Refused by the permission check, even for a site the viewer owns.
+    for website_id in (make_website(viewer), str(ObjectId())):
+        response = write(client, method, website_id, headers)
+        assert response.status_code == 403
+        assert response.get_json()['error'].startswith("Forbidden: You don't have the required permission")
+
+
+@pytest.mark.parametrize('method', ['put', 'patch', 'delete'])
+def test_admin_writes_any_site(app, client, make_user, sites, method):
+    _, own, foreign = sites
+    _, headers = make_user('Admin')
+    for website_id in (own, foreign):
+        assert write(client, method, website_id, headers).status_code == 200
+    assert exists(app, foreign) is (method != 'delete')
+
+
+def test_any_of_the_listed_permissions_is_enough(app, client, make_user, make_website):
+    # Holds only the *_all variants; the routes accept either.
+    with app.app_context():
+        get_db().roles.insert_one({"name": "Moderator", "permissions": ["websites:read_all", "websites:delete_all"]})
+    editor, _ = make_user()
+    website_id = make_website(editor)
+    _, headers = make_user('Moderator')
+
+    assert client.get(url(website_id), headers=headers).status_code == 200
+    assert write(client, 'patch', website_id, headers).status_code == 403
+    assert write(client, 'delete', website_id, headers).status_code == 200
+
+
+def test_missing_or_invalid_tokens_are_401(client, sites):
+    _, own, _ = sites
+    assert client.get(url(own)).status_code == 401
+    assert client.get(url(own), headers={"Authorization": "Bearer not-a-token"}).status_code == 401
+    assert client.delete(url(own), headers={"Authorization": "Token abc"}).status_code == 401
+
+
+def test_job_status_is_owner_only(client, make_user):
+    _, headers = make_user()
+    _, other_headers = make_user()
+    _, admin_headers = make_user('Admin')
+    response = client.post('/api/websites/generate', headers=headers,
+                           json={"business_type": "Cafe", "industry": "Bakery", "fresh": True})
+    status_url = response.headers['Location']
+
+    assert client.get(status_url, headers=headers).status_code == 200
+    assert client.get(status_url, headers=other_headers).status_code == 404
+    assert client.get(status_url, headers=admin_headers).status_code == 200
+    # Viewers cannot create websites, so they have no jobs to look at.
+    _, viewer_headers = make_user('Viewer')
+    assert client.get(status_url, headers=viewer_headers).status_code == 403
@@ -0,0 +1,72 @@
+import pytest
+from bson import ObjectId
+
+from growthzi.routes import preview
+
+
+@pytest.fixture
+def site(make_user, make_website):
+    editor, headers = make_user()
+    return headers, make_website(editor)
+
+
+def test_preview_is_cached_per_version(client, site):
+    _, website_id = site
+    before = preview.cache_stats()
+
+    first = client.get(f'/preview/{website_id}')
+    second = client.get(f'/preview/{website_id}')
+
+    assert first.status_code == second.status_code == 200
+    assert b'Cafe Bakery' in first.data
+    assert second.data == first.data
+    assert first.headers['ETag'] == second.headers['ETag']
+    assert first.headers['Last-Modified']
+    assert first.headers['Cache-Control'] == 'public, max-age=0, must-revalidate'
+    after = preview.cache_stats()
+    assert after['hits'] - before['hits'] == 1
+
+
+def test_conditional_requests_get_304(client, site):
+    _, website_id = site
+    page = client.get(f'/preview/{website_id}')
+
+    response = client.get(f'/preview/{website_id}', headers={"If-None-Match": page.headers['ETag']})
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == page.headers['ETag']
+
+    response = client.get(f'/preview/{website_id}', headers={"If-Modified-Since": page.headers['Last-Modified']})
+    assert response.status_code == 304
+    # If-None-Match wins over If-Modified-Since.
+    response = client.get(f'/preview/{website_id}', headers={
+        "If-None-Match": '"something-else"', "If-Modified-Since": page.headers['Last-Modified'],
+    })
+    assert response.status_code == 200
+
+
+def test_update_changes_the_etag(client, site):
+    headers, website_id = site
+    page = client.get(f'/preview/{website_id}')
+
+    client.patch(f'/api/websites/{website_id}', headers=headers, json={"content": {"title": "Renamed Shop"}})
+
+    response = client.get(f'/preview/{website_id}', headers={"If-None-Match": page.headers['ETag']})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != page.headers['ETag']
+    assert b'Renamed Shop' in response.data
+
+
+def test_delete_drops_the_cached_page(client, site):
+    headers, website_id = site
+    assert client.get(f'/preview/{website_id}').status_code == 200
+
+    client.delete(f'/api/websites/{website_id}', headers=headers)
+
+    assert client.get(f'/preview/{website_id}').status_code == 404
+    assert preview._rendered_pages.get(website_id) is None
+
+
+def test_missing_or_invalid_website(client):
+    assert client.get(f'/preview/{ObjectId()}').status_code == 404
+    assert client.get('/preview/not-an-id').status_code == 400
@@ -0,0 +1,77 @@
+import os
+
+import pytest
+
+from growthzi import publish
+
+
+class FakeBrotli:
+    def __init__(self):
+        self.qualities = []
+
+    def compress(self, data, quality):
+        self.qualities.append(quality)
+        return data
+
+
+class InlinePool:
+    """Runs the batches in this process and records how the pool was built."""
+    created = []
+
+    def __init__(self, **kwargs):
+        self.created.append(kwargs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def map(self, fn, *iterables):
+        return map(fn, *iterables)
+
+
+@pytest.fixture
+def fake_brotli(monkeypatch):
+    fake = FakeBrotli()
+    monkeypatch.setattr(publish, 'brotli', fake)
+    return fake
+
+
+@pytest.fixture
+def publish_dir(app, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'PUBLISH_DIR', str(tmp_path))
+    monkeypatch.setitem(app.config, 'PUBLISH_ON_SAVE', False)
+    return tmp_path
+
+
+@pytest.mark.app_config(PUBLISH_BROTLI_QUALITY=4, PUBLISH_CLI_BROTLI_QUALITY=10)
+def test_saves_use_the_lower_brotli_quality(app, make_user, make_website, publish_dir, fake_brotli):
+    editor, _ = make_user()
+    website_id = make_website(editor)
+    with app.app_context():
+        published = publish.publish_ids([website_id])
+
+    assert published == 1
+    assert os.path.exists(publish_dir / 'sites' / website_id / 'index.html.br')
+    assert set(fake_brotli.qualities) == {4}
+
+
+@pytest.mark.app_config(PUBLISH_BROTLI_QUALITY=4, PUBLISH_CLI_BROTLI_QUALITY=10)
+def test_publish_all_spawns_workers_and_uses_the_cli_quality(app, make_user, make_website, publish_dir,
+                                                             fake_brotli, monkeypatch):
+    editor, _ = make_user()
+    ids = [make_website(editor, title=f"Site {i}") for i in range(3)]
+    InlinePool.created = []
+    monkeypatch.setattr(publish, 'ProcessPoolExecutor', InlinePool)
+    monkeypatch.setattr(publish, '_worker_app', app)
+
+    result = app.test_cli_runner().invoke(args=['publish', 'all', '--workers', '2', '--batch-size', '2'])
+
+    assert result.exit_code == 0, result.output
+    assert f"Published 3 websites to {publish_dir} with 2 workers." in result.output
+    [pool] = InlinePool.created
+    assert pool['mp_context'].get_start_method() == 'spawn'
+    for website_id in ids:
+        assert os.path.exists(publish_dir / 'sites' / website_id / 'index.html.gz')
+    assert set(fake_brotli.qualities) == {10}
@@ -0,0 +1,107 @@
+import pytest
+
+from growthzi import quotas
+from growthzi.db import get_db
+
+pytestmark = pytest.mark.app_config(GENERATION_DAILY_QUOTA=3, GENERATION_MAX_JOBS_PER_USER=10)
+
+
+def role(name):
+    return get_db().roles.find_one({"name": name})
+
+
+def used(user):
+    return quotas.status(user, role('Editor'))['used']
+
+
+def test_consume_up_to_the_limit(app, make_user):
+    user, _ = make_user()
+    with app.app_context():
+        editor = role('Editor')
+        day = quotas.consume(user, editor, 2)
+        assert day == quotas.today()
+        assert quotas.consume(user, editor) == day
+
+        with pytest.raises(quotas.QuotaExceeded) as refused:
+            quotas.consume(user, editor)
+        assert (refused.value.limit, refused.value.used) == (3, 3)
+        assert 1 <= refused.value.retry_after <= 24 * 3600
+        assert used(user) == 3
+
+
+def test_a_request_larger_than_what_is_left_takes_nothing(app, make_user):
+    user, _ = make_user()
+    with app.app_context():
+        quotas.consume(user, role('Editor'), 2)
+        with pytest.raises(quotas.QuotaExceeded):
+            quotas.consume(user, role('Editor'), 2)
+        assert used(user) == 2
+
+
+def test_refund_returns_generations(app, make_user):
+    user, _ = make_user()
+    with app.app_context():
+        day = quotas.consume(user, role('Editor'), 3)
+        quotas.refund(user['_id'], day, 2)
+        assert used(user) == 1
+        assert quotas.consume(user, role('Editor'), 2) == day
+
+        # Never below zero, and nothing to do without a charged day.
+        quotas.refund(user['_id'], day, 10)
+        assert used(user) == 3
+        quotas.refund(user['_id'], None)
+        assert used(user) == 3
+
+
+def test_refund_is_seen_by_other_workers(app, make_user):
+    user, _ = make_user()
+    with app.app_context():
+        day = quotas.consume(user, role('Editor'), 3)
+        # Another worker refunds directly in MongoDB; this one still has the
+        # old count cached until it expires or is invalidated.
+        get_db().generation_usage.update_one({"user_id": user['_id']}, {"$inc": {"count": -1}})
+        with pytest.raises(quotas.QuotaExceeded):
+            quotas.consume(user, role('Editor'))
+        quotas.invalidate_user(user['_id'])
+        assert quotas.consume(user, role('Editor')) == day
+
+
+def test_exempt_roles_are_not_counted(app, make_user):
+    admin, _ = make_user('Admin')
+    with app.app_context():
+        assert quotas.consume(admin, role('Admin'), 100) is None
+        assert get_db().generation_usage.count_documents({"user_id": admin['_id']}) == 0
+
+
+def test_per_user_limit(app, make_user):
+    user, _ = make_user()
+    admin, _ = make_user('Admin')
+    with app.app_context():
+        quotas.set_limit(str(user['_id']), 1)
+        quotas.set_limit(str(admin['_id']), 1)
+        quotas.consume(user, role('Editor'))
+        quotas.consume(admin, role('Admin'))
+        # The override also applies to otherwise exempt roles.
+        with pytest.raises(quotas.QuotaExceeded):
+            quotas.consume(admin, role('Admin'))
+
+        quotas.set_limit(str(user['_id']), None, reset_usage=True)
+        assert quotas.status(user, role('Editor'))['daily_limit'] == 3
+        assert quotas.consume(user, role('Editor'), 3) == quotas.today()
+
+
+def test_generate_answers_429_when_the_quota_is_used_up(app, client, make_user):
+    user, headers = make_user()
+    for index in range(3):
+        response = client.post('/api/websites/generate', headers=headers,
+                               json={"business_type": "Cafe", "industry": f"Industry {index}"})
+        assert response.status_code == 202
+
+    response = client.post('/api/websites/generate', headers=headers,
+                           json={"business_type": "Cafe", "industry": "One too many"})
+    assert response.status_code == 429
+    assert response.get_json()['daily_limit'] == 3
+    assert response.get_json()['used'] == 3
+    assert int(response.headers['Retry-After']) >= 1
+    with app.app_context():
+        assert get_db().generation_jobs.count_documents({}) == 3
@@ -0,0 +1,163 @@
+import pytest
+
+from growthzi import ratelimit
+from growthzi.utils import throttle
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def list_websites(client, headers, **kwargs):
+    # The list is streamed; read it so the request context is closed in order.
+    with client.get('/api/websites/', headers=headers, **kwargs) as response:
+        response.get_data()
+    return response
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(throttle.time, 'monotonic', clock)
+    return clock
+
+
+def test_bucket_take_and_refill(clock):
+    bucket = throttle.TokenBucketLimiter(3, 60)
+    assert [bucket.take('key')[:2] for _ in range(3)] == [(True, 2), (True, 1), (True, 0)]
+
+    allowed, remaining, reset = bucket.take('key')
+    assert (allowed, remaining, reset) == (False, 0, 20)
+    assert bucket.stats()['rejected'] == 1
+
+    clock.now += 20
+    assert bucket.take('key')[:2] == (True, 0)
+    # Other keys have their own bucket.
+    assert bucket.take('other')[:2] == (True, 2)
+
+
+def test_bucket_put_back(clock):
+    bucket = throttle.TokenBucketLimiter(3, 60)
+    bucket.take('key', 2)
+    bucket.put_back('key', 1)
+    assert bucket.take('key')[:2] == (True, 1)
+
+    # Never above capacity, and unknown keys are not created.
+    bucket.put_back('key', 10)
+    assert bucket.take('key')[:2] == (True, 2)
+    bucket.put_back('unknown')
+    assert bucket.stats()['size'] == 1
+
+
+def test_bucket_is_bounded(clock):
+    bucket = throttle.TokenBucketLimiter(1, 60, maxsize=2)
+    for key in ('a', 'b', 'c'):
+        bucket.take(key)
+    assert bucket.stats()['size'] == 2
+    # The oldest key was dropped and starts again with a full bucket.
+    assert bucket.take('a')[0] is True
+
+
+@pytest.mark.parametrize('spec, expected', [
+    ("user=10/60,role=100/60,ip=30/60", {"user": (10, 60), "role": (100, 60), "ip": (30, 60)}),
+    (" user = 5 , ", {"user": (5, 1)}),
+    ("", {}),
+])
+def test_parse_spec(spec, expected):
+    assert ratelimit.parse_spec(spec) == expected
+
+
+@pytest.mark.parametrize('spec', ["user=ten/60", "team=10/60", "user=0/60", "ip=10/0"])
+def test_parse_spec_rejects(spec):
+    with pytest.raises(ratelimit.RateLimitConfigError):
+        ratelimit.parse_spec(spec)
+
+
+def test_malformed_setting_fails_at_startup(make_app):
+    with pytest.raises(ratelimit.RateLimitConfigError):
+        make_app(RATE_LIMIT_READ="user=ten/60")
+
+
+@pytest.mark.app_config(RATE_LIMIT_READ="user=2/60,ip=100/60")
+def test_requests_over_the_limit_get_429(client, make_user):
+    _, headers = make_user()
+    first = list_websites(client, headers)
+    second = list_websites(client, headers)
+    assert (first.status_code, second.status_code) == (200, 200)
+    # Headers describe the bucket closest to running out.
+    assert first.headers['RateLimit-Limit'] == '2'
+    assert first.headers['RateLimit-Remaining'] == '1'
+    assert first.headers['RateLimit-Policy'] == '2;w=60'
+    assert second.headers['RateLimit-Remaining'] == '0'
+
+    refused = list_websites(client, headers)
+    assert refused.status_code == 429
+    assert refused.headers['RateLimit-Remaining'] == '0'
+    assert 1 <= int(refused.headers['Retry-After']) <= 30
+
+    # Another user has their own bucket.
+    _, other = make_user()
+    assert list_websites(client, other).status_code == 200
+
+
+@pytest.mark.app_config(RATE_LIMIT_READ="user=3/60,ip=2/60")
+def test_refused_request_does_not_use_other_buckets(client, make_user):
+    _, headers = make_user()
+    for _ in range(2):
+        assert list_websites(client, headers).status_code == 200
+    # The IP bucket is empty; the user token taken before it is put back.
+    assert list_websites(client, headers).status_code == 429
+
+    response = list_websites(client, headers, environ_base={'REMOTE_ADDR': '10.0.0.2'})
+    assert response.status_code == 200
+    assert response.headers['RateLimit-Limit'] == '3'
+    assert response.headers['RateLimit-Remaining'] == '0'
+
+    stats = ratelimit.stats()['read']
+    assert stats['ip']['rejected'] == 1
+    assert stats['user']['rejected'] == 0
+
+
+@pytest.mark.app_config(RATE_LIMIT_READ="user=1/60")
+def test_exempt_roles(client, make_user):
+    _, headers = make_user('Admin')
+    for _ in range(3):
+        response = list_websites(client, headers)
+        assert response.status_code == 200
+        assert 'RateLimit-Limit' not in response.headers
+
+
+@pytest.mark.app_config(RATE_LIMIT_READ="user=1/60", RATE_LIMIT_ENABLED=False)
+def test_disabled(client, make_user):
+    _, headers = make_user()
+    for _ in range(3):
+        assert list_websites(client, headers).status_code == 200
+
+
+@pytest.mark.app_config(RATE_LIMIT_GENERATE="user=5/60,ip=100/60", GENERATION_BATCH_RETRIES=0)
+def test_batch_generation_costs_one_token_per_profile(client, make_user):
+    _, headers = make_user()
+
+    def post_batch(count):
+        profiles = [{"business_type": "Cafe", "industry": f"Industry {i}"} for i in range(count)]
+        return client.post('/api/websites/generate/batch', headers=headers, json={"profiles": profiles})
+
+    response = post_batch(3)
+    assert response.status_code == 200
+    assert response.headers['RateLimit-Remaining'] == '2'
+
+    refused = post_batch(3)
+    assert refused.status_code == 429
+    assert int(refused.headers['Retry-After']) >= 1
+    assert post_batch(2).status_code == 200
+
+    # More profiles than the bucket holds can never be admitted.
+    too_large = post_batch(6)
+    assert too_large.status_code == 429
+    assert 'Retry-After' not in too_large.headers
+    # Malformed batches are refused before any token is taken.
+    assert client.post('/api/websites/generate/batch', headers=headers, json={}).status_code == 400
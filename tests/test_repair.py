@@ -0,0 +1,140 @@
+import json
+
+import pytest
+
+from growthzi import ai, repair
+
+CONTENT = {
+    "title": "Cafe Bakery",
+    "hero": {"headline": "Fresh every morning", "subheading": "Bread and coffee", "cta_button_text": "Visit us"},
+    "about": {"title": "About Us", "text": "A neighbourhood bakery."},
+    "services": [{"name": f"Service {i}", "description": "Baked goods."} for i in range(1, 4)],
+}
+TEXT = json.dumps(CONTENT, indent=2)
+
+
+class ScriptedClient:
+    """Answers each prompt with the next of the given responses."""
+
+    model_name = 'scripted'
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.prompts = []
+
+    def generate(self, prompt):
+        self.prompts.append(prompt)
+        return self.responses.pop(0)
+
+
+def truncated(text, before):
+    """The text cut off part way through the member named `before`."""
+    return text[:text.index(f'"{before}"') + 12]
+
+
+def test_valid_output_needs_no_repair():
+    result = repair.process(TEXT)
+    assert result.content == CONTENT
+    assert result.missing == []
+    assert result.repairs == []
+
+
+def test_markdown_fence():
+    result = repair.process(f"Here you go:\n```json\n{TEXT}\n```")
+    assert result.content == CONTENT
+    assert result.missing == []
+    assert "fence" in result.repairs
+
+
+def test_trailing_commas():
+    text = TEXT.replace('"Visit us"', '"Visit us",').replace('\n  ]', ',\n  ]')
+    result = repair.process(text)
+    assert result.content == CONTENT
+    assert result.repairs == ["trailing_comma"]
+
+
+def test_camel_case_keys_and_wrapper():
+    hero = CONTENT["hero"]
+    document = {"website": {
+        **CONTENT,
+        "hero": {"headline": hero["headline"], "subHeading": hero["subheading"], "ctaButtonText": hero["cta_button_text"]},
+    }}
+    result = repair.process(json.dumps(document))
+    assert result.content == CONTENT
+    assert "key_names" in result.repairs
+    assert "wrapper" in result.repairs
+
+
+def test_defaults_and_coercion():
+    document = json.loads(TEXT)
+    del document["hero"]["cta_button_text"]
+    document["title"] = 1999
+    result = repair.process(json.dumps(document))
+    assert result.missing == []
+    assert result.content["hero"]["cta_button_text"] == "Learn More"
+    assert result.content["title"] == "1999"
+
+
+def test_truncated_output_keeps_complete_sections():
+    result = repair.process(truncated(TEXT, "about"))
+    assert result.content == {"title": CONTENT["title"], "hero": CONTENT["hero"]}
+    assert result.missing == ["about", "services"]
+    assert result.services_needed() == 3
+    assert "partial" in result.repairs
+
+
+def test_truncated_services_are_counted():
+    text = TEXT[:TEXT.index('"Service 3"')]
+    result = repair.process(text)
+    assert result.missing == ["services"]
+    assert result.services_needed() == 1
+
+    # A later response only has to supply the rest.
+    result = repair.process(json.dumps({"services": [CONTENT["services"][2]]}), result.content)
+    assert result.missing == []
+    assert result.content == CONTENT
+
+
+@pytest.mark.parametrize('text', [None, "", "I cannot help with that.", "[1, 2, 3]"])
+def test_unusable_output(text):
+    result = repair.process(text)
+    assert result.content == {}
+    assert result.missing == list(repair.SECTIONS)
+
+
+def test_missing_sections_are_reprompted(app):
+    rest = {name: CONTENT[name] for name in ("about", "services")}
+    client = ScriptedClient(json.dumps(rest))
+    with app.app_context():
+        content = ai.complete_content(client, "Cafe", "Bakery", truncated(TEXT, "about"))
+    assert content == CONTENT
+    # One smaller prompt, asking only for what is missing.
+    [prompt] = client.prompts
+    assert '"about"' in prompt and '"services"' in prompt
+    assert '"hero"' not in prompt.split("only these members")[1]
+
+
+@pytest.mark.app_config(GENERATION_REPROMPT_ATTEMPTS=2)
+def test_reprompting_gives_up_after_the_configured_attempts(app):
+    client = ScriptedClient(json.dumps({"about": CONTENT["about"]}), "still nothing useful")
+    with app.app_context():
+        with pytest.raises(ai.GenerationError, match="missing: services"):
+            ai.complete_content(client, "Cafe", "Bakery", truncated(TEXT, "about"))
+    assert len(client.prompts) == 2
+
+
+def test_no_reprompt_without_usable_content(app):
+    client = ScriptedClient()
+    with app.app_context():
+        with pytest.raises(ai.GenerationError, match="not valid JSON"):
+            ai.complete_content(client, "Cafe", "Bakery", "Sorry, something went wrong.")
+    assert client.prompts == []
+
+
+@pytest.mark.app_config(GENERATION_REPROMPT_ATTEMPTS=0)
+def test_reprompting_disabled(app):
+    client = ScriptedClient()
+    with app.app_context():
+        with pytest.raises(ai.GenerationError, match="incomplete content"):
+            ai.complete_content(client, "Cafe", "Bakery", truncated(TEXT, "about"))
+    assert client.prompts == []
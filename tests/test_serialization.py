@@ -0,0 +1,119 @@
+import datetime
+import json
+
+import bson
+import pytest
+from bson import ObjectId
+from bson.raw_bson import RawBSONDocument
+
+from growthzi import serialization
+
+# BSON keeps milliseconds, so the dict and raw forms hold the same value.
+CREATED = datetime.datetime(2026, 3, 1, 12, 30, 15, 123000, tzinfo=datetime.timezone.utc)
+
+
+def website(**overrides):
+    return {
+        "_id": ObjectId(),
+        "owner_id": ObjectId(),
+        "created_at": CREATED,
+        "updated_at": CREATED,
+        "version": 2,
+        "content": {
+            "title": "Café Bakery",
+            "hero": {"headline": "Fresh", "subheading": "Every morning", "cta_button_text": "Visit"},
+            "services": [{"name": "Bread", "description": "Sourdough"}],
+        },
+        "meta": {"tags": ["a", "b"], "score": 1.5},
+        **overrides,
+    }
+
+
+def raw(document):
+    return RawBSONDocument(bson.encode(document))
+
+
+@pytest.fixture
+def make_provider(app):
+    def make(datetime_format=serialization.DATETIME_HTTP, sort_keys=True):
+        provider = serialization.MongoJSONProvider(app)
+        provider.datetime_format = datetime_format
+        provider.sort_keys = sort_keys
+        return provider
+    return make
+
+
+@pytest.mark.parametrize('datetime_format', [serialization.DATETIME_HTTP, serialization.DATETIME_ISO])
+def test_raw_document_encodes_like_the_dict(make_provider, datetime_format):
+    provider = make_provider(datetime_format)
+    document = website()
+    expected = provider.dumps_bytes(document)
+
+    assert provider.dumps_bytes(raw(document)) == expected
+    # Served from the fragment cache the second time.
+    assert provider.dumps_bytes(raw(document)) == expected
+    assert expected.startswith(b'{"_id":"' + str(document['_id']).encode() + b'","content":{')
+
+
+def test_unsorted_raw_document_has_the_same_members(make_provider):
+    provider = make_provider(sort_keys=False)
+    document = website()
+    assert json.loads(provider.dumps_bytes(raw(document))) == json.loads(provider.dumps_bytes(document))
+
+
+@pytest.mark.parametrize('document', [
+    {"_id": ObjectId(), "version": 1},
+    {"content": {"title": "Only embedded"}},
+    {},
+])
+def test_raw_documents_with_or_without_embedded_documents(make_provider, document):
+    provider = make_provider()
+    assert provider.dumps_bytes(raw(document)) == provider.dumps_bytes(document)
+
+
+def test_raw_documents_inside_other_values(make_provider):
+    provider = make_provider()
+    document = website()
+    # e.g. a list response, or a raw document nested in a plain dict
+    assert provider.dumps_bytes([raw(document)]) == provider.dumps_bytes([document])
+    assert provider.dumps_bytes({"item": raw(document)}) == provider.dumps_bytes({"item": document})
+
+
+def test_fragment_cache_counts_the_bson_key(make_provider):
+    provider = make_provider()
+    document = raw(website())
+    before = serialization.cache_stats()
+    provider.dumps_bytes(document)
+    provider.dumps_bytes(document)
+    after = serialization.cache_stats()
+
+    # "content" and "meta" are cached once and then hit.
+    assert after['misses'] - before['misses'] == 2
+    assert after['hits'] - before['hits'] == 2
+    embedded = [document['content'], document['meta']]
+    encoded = sum(len(provider.dumps_bytes(serialization._inflate(value))) for value in embedded)
+    assert after['bytes'] - before['bytes'] == encoded + sum(len(value.raw) for value in embedded)
+
+
+def test_response_from_raw_document(app):
+    document = website()
+    with app.test_request_context():
+        assert app.json.response(raw(document)).get_data() == app.json.response(document).get_data()
+
+
+def test_raw_collection_follows_the_setting(app, monkeypatch):
+    class Collection:
+        def with_options(self, codec_options):
+            return codec_options
+
+    collection = Collection()
+    with app.app_context():
+        monkeypatch.setitem(app.config, 'JSON_RAW_BSON', True)
+        assert serialization.raw_collection(collection) is serialization.RAW_CODEC_OPTIONS
+        monkeypatch.setitem(app.config, 'JSON_RAW_BSON', False)
+        assert serialization.raw_collection(collection) is collection
+
+
+def test_request_bodies_are_parsed_by_the_standard_library(app):
+    # Values orjson would reject are accepted whether or not it is installed.
+    assert app.json.loads('{"big": 123456789012345678901234567890, "nan": NaN}')['big'] == 123456789012345678901234567890
@@ -0,0 +1,123 @@
+import pytest
+from bson import ObjectId
+
+from growthzi.db import get_db
+
+
+def url(website_id):
+    return f'/api/websites/{website_id}'
+
+
+def if_match(headers, value):
+    return {**headers, "If-Match": value}
+
+
+def stored(app, website_id):
+    with app.app_context():
+        return get_db().websites.find_one({"_id": ObjectId(website_id)})
+
+
+@pytest.fixture
+def site(make_user, make_website):
+    editor, headers = make_user()
+    return headers, make_website(editor)
+
+
+def test_etag_follows_the_version(client, site):
+    headers, website_id = site
+    response = client.get(url(website_id), headers=headers)
+    assert response.headers['ETag'] == '"v1"'
+
+    response = client.put(url(website_id), headers=if_match(headers, '"v1"'), json={"content": {"title": "New"}})
+    assert response.status_code == 200
+    assert response.headers['ETag'] == '"v2"'
+    assert response.get_json()['version'] == 2
+
+
+def test_stale_if_match_is_a_conflict(app, client, site):
+    headers, website_id = site
+    client.put(url(website_id), headers=headers, json={"content": {"title": "Theirs"}})
+
+    response = client.put(url(website_id), headers=if_match(headers, '"v1"'), json={"content": {"title": "Mine"}})
+
+    assert response.status_code == 409
+    assert response.get_json()['current_version'] == 2
+    assert response.headers['ETag'] == '"v2"'
+    assert stored(app, website_id)['content']['title'] == 'Theirs'
+
+
+@pytest.mark.parametrize('value', ['"v1"', 'W/"v1"', '"v7", "v1"', '*'])
+def test_matching_if_match_values(client, site, value):
+    headers, website_id = site
+    response = client.put(url(website_id), headers=if_match(headers, value), json={"content": {"title": "New"}})
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize('value', ['"abc"', '"vx"'])
+def test_malformed_if_match_is_a_400(app, client, site, value):
+    headers, website_id = site
+    response = client.put(url(website_id), headers=if_match(headers, value), json={"content": {"title": "New"}})
+    assert response.status_code == 400
+    assert 'If-Match' in response.get_json()['error']
+    assert stored(app, website_id)['version'] == 1
+
+
+def test_version_in_the_body(client, site):
+    headers, website_id = site
+    assert client.put(url(website_id), headers=headers, json={"content": {}, "version": 1}).status_code == 200
+    response = client.put(url(website_id), headers=headers, json={"content": {}, "version": 1})
+    assert response.status_code == 409
+    assert response.get_json()['current_version'] == 2
+
+
+def test_sites_from_before_versioning_are_version_0(app, client, make_user, make_website):
+    editor, headers = make_user()
+    website_id = make_website(editor)
+    with app.app_context():
+        get_db().websites.update_one({"_id": ObjectId(website_id)}, {"$unset": {"version": 1}})
+
+    assert client.get(url(website_id), headers=headers).headers['ETag'] == '"v0"'
+    response = client.patch(url(website_id), headers=if_match(headers, '"v0"'), json={"content": {"title": "New"}})
+    assert response.status_code == 200
+    assert stored(app, website_id)['version'] == 1
+
+
+def test_patch_sets_only_the_given_paths(app, client, site):
+    headers, website_id = site
+    response = client.patch(url(website_id), headers=headers, json={"content": {
+        "hero.headline": "Patched", "about": {"title": "About Us", "text": "New section"},
+    }})
+
+    assert response.status_code == 200
+    content = stored(app, website_id)['content']
+    assert content == {
+        "title": "Cafe Bakery",
+        "hero": {"headline": "Patched"},
+        "about": {"title": "About Us", "text": "New section"},
+    }
+
+
+@pytest.mark.parametrize('content', [{}, {"": 1}, {"$where": 1}, {"hero..headline": 1}, {"hero.": 1}, "hero"])
+def test_patch_rejects_bad_paths(app, client, site, content):
+    headers, website_id = site
+    response = client.patch(url(website_id), headers=headers, json={"content": content})
+    assert response.status_code == 400
+    assert stored(app, website_id)['version'] == 1
+
+
+def test_delete_preconditions(app, client, site):
+    headers, website_id = site
+    response = client.delete(url(website_id), headers=if_match(headers, '"v3"'))
+    assert response.status_code == 409
+    assert response.get_json()['current_version'] == 1
+    assert client.delete(url(website_id), headers=if_match(headers, '"x"')).status_code == 400
+
+    assert client.delete(url(website_id), headers=if_match(headers, '"v1"')).status_code == 200
+    assert stored(app, website_id) is None
+    assert client.delete(url(website_id), headers=headers).status_code == 404
+
+
+def test_missing_or_invalid_website(client, site):
+    headers, _ = site
+    assert client.put(url(ObjectId()), headers=headers, json={"content": {}}).status_code == 404
+    assert client.patch(url('not-an-id'), headers=headers, json={"content": {"title": "x"}}).status_code == 400